@@ -0,0 +1,73 @@
+"""Population adherence analytics over millions of dose events.
+
+Generates a year of dose history for many patients (columns are filled
+directly, as building millions of entries one by one would dominate the
+run), then times loading it into NumPy and summarising it per patient,
+medication and cohort.
+
+Usage: python benchmarks/bench_analytics.py [patients] [days]
+"""
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.analytics import load_events, summarize  # noqa: E402
+from mediminder.dose_history import DoseHistory  # noqa: E402
+from mediminder.history_segments import SegmentedHistory, month_of  # noqa: E402
+from mediminder.prescriptions import PrescriptionRepository  # noqa: E402
+
+MEDS_PER_PATIENT = 3
+COHORTS = ['0-17', '18-39', '40-64', '65+']
+
+
+def build(patients, days, rng):
+    start = date.today().toordinal() - days
+    users, tracking = {}, {}
+    for p in range(patients):
+        username = f"patient{p}"
+        users[username] = {'type': 'patient', 'medications': []}
+        tracking[username] = {}
+        for m in range(MEDS_PER_PATIENT):
+            time_text = f"{8 + m * 4:02d}:00"
+            users[username]['medications'].append({'name': f"med{m}", 'dosage': '1', 'time': time_text})
+            delay = rng.exponential(8, days).astype(np.int16)
+            statuses = np.where(rng.random(days) < 0.1, 3, np.where(delay <= 10, 1, 2)).astype(np.int8)
+            history = SegmentedHistory()
+            segment = DoseHistory()
+            segment.days.frombytes(np.arange(start, start + days, dtype=np.int32).tobytes())
+            segment.minutes.frombytes((delay + (8 + m * 4) * 60).tobytes())
+            segment.statuses.frombytes(statuses.tobytes())
+            history.hot[month_of(date.fromordinal(start).isoformat())] = segment
+            tracking[username][f"med{m}"] = {'streak': 0, 'history': history}
+    return users, tracking
+
+
+def main():
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    users, tracking = build(patients, days, np.random.default_rng(1))
+    prescriptions = PrescriptionRepository(lambda: users)
+
+    start = time.perf_counter()
+    events = load_events(tracking, prescriptions)
+    load_seconds = time.perf_counter() - start
+    print(f"{len(events):,} dose events from {len(events.keys):,} prescriptions: load {load_seconds:.3f}s")
+
+    # The first summary also computes the per-prescription totals the others reuse
+    for by in ('patient', 'medication', 'cohort'):
+        start = time.perf_counter()
+        summary = summarize(events, by, cohort_of=lambda username: COHORTS[int(username[7:]) % len(COHORTS)])
+        seconds = time.perf_counter() - start
+        sample = summary[next(iter(summary))]
+        print(f"per {by:<10} {len(summary):>6} groups in {seconds:.3f}s  e.g. adherence "
+              f"{sample['adherence']:.2f}, missed {sample['missed_ratio']:.2f}, "
+              f"longest streak {sample['longest_streak']}, lateness {sample['mean_lateness']:.1f} min")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Compare list-of-dicts dose history with DoseHistory for a 5-year history.
+
+Usage: python benchmarks/bench_dose_history.py [doses_per_day]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.dose_history import DoseHistory  # noqa: E402
+
+YEARS = 5
+STATUS_CYCLE = ['on_time'] * 7 + ['late', 'missed', 'on_time']
+
+
+def build_entries(doses_per_day):
+    start = date(2020, 1, 1)
+    entries = []
+    for day in range(365 * YEARS):
+        day_text = (start + timedelta(days=day)).isoformat()
+        for dose in range(doses_per_day):
+            entries.append({
+                'date': day_text,
+                'time': f"{8 + dose * 4:02d}:00",
+                'status': STATUS_CYCLE[(day + dose) % len(STATUS_CYCLE)]
+            })
+    return entries
+
+
+def measure_memory(factory):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    value = factory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return value, size
+
+
+def best_of(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    doses_per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    source = build_entries(doses_per_day)
+    print(f"{len(source)} dose entries ({YEARS} years, {doses_per_day} doses/day)")
+
+    # Fresh copies so string objects are not shared with the source list
+    dict_history, dict_bytes = measure_memory(
+        lambda: [{'date': e['date'][:], 'time': e['time'][:], 'status': e['status'][:]} for e in source])
+    compact_history, compact_bytes = measure_memory(lambda: DoseHistory(source))
+
+    print(f"memory  list of dicts: {dict_bytes / 1024:10.1f} KiB ({dict_bytes / len(source):6.1f} B/dose)")
+    print(f"memory  DoseHistory:   {compact_bytes / 1024:10.1f} KiB ({compact_bytes / len(source):6.1f} B/dose)")
+    print(f"memory reduction: {dict_bytes / max(compact_bytes, 1):.1f}x")
+
+    target_date = source[len(source) // 2]['date']
+    scans = [
+        ('count missed',
+         lambda: sum(1 for e in dict_history if e['status'] == 'missed'),
+         lambda: compact_history.count_status('missed')),
+        ('find date',
+         lambda: next((e for e in dict_history if e['date'] == target_date), None),
+         lambda: compact_history.find_date(target_date)),
+    ]
+    for name, dict_scan, compact_scan in scans:
+        dict_time = best_of(dict_scan)
+        compact_time = best_of(compact_scan)
+        print(f"scan {name:13s} dicts {dict_time * 1000:8.3f} ms  "
+              f"DoseHistory {compact_time * 1000:8.3f} ms  ({dict_time / compact_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
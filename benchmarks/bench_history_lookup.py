@@ -0,0 +1,52 @@
+"""Date lookups in dose history as it grows from a month to years.
+
+For each history length, times finding today's entries (what the
+medication list refreshes), a date in the middle of the history, and the
+old linear scan over a list of dicts. Indexed lookups should stay flat
+while the scan grows with the history.
+
+Usage: python benchmarks/bench_history_lookup.py [doses_per_day]
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.dose_history import DoseHistory  # noqa: E402
+
+LENGTHS_DAYS = [30, 365, 365 * 3, 365 * 10]
+LOOKUPS = 2000
+
+
+def build_entries(days, doses_per_day):
+    start = date.today() - timedelta(days=days - 1)
+    return [{'date': (start + timedelta(days=day)).isoformat(), 'time': f"{8 + dose * 4:02d}:00",
+             'status': 'on_time'}
+            for day in range(days) for dose in range(doses_per_day)]
+
+
+def per_lookup(function):
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        function()
+    return (time.perf_counter() - start) / LOOKUPS * 1e6
+
+
+def main():
+    doses_per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    today = date.today().isoformat()
+    print(f"{'history':>10} {'entries':>8} {'today (us)':>11} {'past day (us)':>14} {'linear scan (us)':>17}")
+    for days in LENGTHS_DAYS:
+        entries = build_entries(days, doses_per_day)
+        history = DoseHistory(entries)
+        middle = entries[len(entries) // 2]['date']
+        indexed_today = per_lookup(lambda: history.entries_on(today))
+        indexed_past = per_lookup(lambda: history.entries_on(middle))
+        scan = per_lookup(lambda: next(entry for entry in entries if entry['date'] == today))
+        print(f"{days:>6} days {len(entries):>8} {indexed_today:>11.2f} {indexed_past:>14.2f} {scan:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
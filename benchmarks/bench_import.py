@@ -0,0 +1,106 @@
+"""Measure import time of the core package and headless startup time.
+
+Each measurement runs in a fresh interpreter (best of several runs). Exits
+with status 1 if a budget is exceeded or if importing the core pulls in a
+GUI module (tkinter, tkcalendar, plyer) or asyncio, which only the
+notification dispatcher needs.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds, measured on top of a bare interpreter start
+IMPORT_BUDGET_MS = 60
+STARTUP_BUDGET_MS = 150
+
+CORE_MODULES = [
+    'mediminder.storage',
+    'mediminder.medication_journal',
+    'mediminder.patient_management',
+    'mediminder.prescriptions',
+    'mediminder.appointments',
+    'mediminder.adherence',
+    'mediminder.reminders',
+    'mediminder.windows',
+    'mediminder.agenda',
+    'mediminder.rolling',
+    'mediminder.analytics',
+    'mediminder.report',
+    'mediminder.schedule',
+    'mediminder.scheduler',
+    'mediminder.sweeper',
+    'mediminder.streaks',
+    'mediminder.event_bridge',
+    'mediminder.reminder_service',
+    'mediminder.clock',
+    'mediminder.simulation',
+    'mediminder.metrics',
+    'mediminder.write_behind',
+]
+# The notification dispatcher (asyncio) is imported by the app and the reminder service only
+GUI_MODULES = ['tkinter', 'tkcalendar', 'plyer', 'asyncio']
+
+IMPORT_SCRIPT = f"""
+import sys, time
+start = time.perf_counter()
+{''.join(f'import {name}; ' for name in CORE_MODULES)}
+elapsed = time.perf_counter() - start
+gui = [name for name in {GUI_MODULES!r} if name in sys.modules]
+print(elapsed * 1000, ','.join(gui))
+"""
+
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from mediminder.storage import JsonBackend
+from mediminder.medication_journal import MedicationJournal
+from mediminder.patient_management import PatientManagement
+from mediminder.prescriptions import PrescriptionRepository
+data_dir = sys.argv[1]
+backend = JsonBackend(data_dir)
+users = backend.load_users()
+backend.load_appointments()
+journal = MedicationJournal(data_dir + '/medication_tracking.json',
+                            data_dir + '/medication_tracking.journal',
+                            archive_dir=data_dir + '/history_archive')
+tracking = journal.load()
+prescriptions = PrescriptionRepository(lambda: users, lambda: tracking)
+PatientManagement(backend, prescriptions=prescriptions)
+print((time.perf_counter() - start) * 1000, '')
+"""
+
+
+def best_of(runs, script, *args):
+    times = []
+    gui = ''
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script, *args], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(output[0]))
+        gui = output[1] if len(output) > 1 else gui
+    return min(times), gui
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    import_ms, gui = best_of(runs, IMPORT_SCRIPT)
+    with tempfile.TemporaryDirectory() as data_dir:
+        startup_ms, _ = best_of(runs, STARTUP_SCRIPT, data_dir)
+
+    print(f"core import:      {import_ms:7.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    print(f"headless startup: {startup_ms:7.1f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    print(f"GUI/asyncio modules imported by core: {gui or 'none'}")
+
+    ok = import_ms <= IMPORT_BUDGET_MS and startup_ms <= STARTUP_BUDGET_MS and not gui
+    print("OK" if ok else "OVER BUDGET")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Arm a large patient population in the reminder service and fire a burst.
+
+Every prescription is scheduled; a share of them is due at BURST_AT and the
+rest at seeded random times outside the window the clock jumps over, so only
+burst doses fire. The service runs on the real clock shifted to a pinned
+date: patients are armed an hour before the burst, then the clock jumps to a
+couple of seconds before it and the real scheduler threads dispatch the
+burst. Reports arm time, peak memory and per-reminder dispatch lag.
+
+Usage: python benchmarks/bench_reminder_service.py [patients] [meds_per_patient] [shards] [seed]
+"""
+import os
+import random
+import sys
+import resource
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.prescriptions import PrescriptionRepository  # noqa: E402
+from mediminder.reminder_service import ReminderService  # noqa: E402
+
+# One in this many prescriptions is due in the burst minute
+BURST_SHARE = 10
+LEAD_SECONDS = 2
+# Pinned simulated times, so runs do not depend on the time of day
+BURST_AT = datetime(2026, 1, 5, 12, 0)
+ARM_AT = BURST_AT - timedelta(hours=1)
+# Background doses stay out of (ARM_AT, BURST_AT + QUIET_AFTER], which covers the jump and the wait
+QUIET_AFTER = timedelta(minutes=5)
+
+
+class CountingReminders:
+    """Stand-in for MedicationReminders that only counts dispatches"""
+
+    def __init__(self):
+        self.burst = 0
+        self.other = 0
+
+    def dose_due(self, username, med, when):
+        if when == BURST_AT:
+            self.burst += 1
+        else:
+            self.other += 1
+
+
+def background_minutes():
+    """Minutes of day a background dose may fall on: outside the jumped window and the wait"""
+    quiet_start = ARM_AT.hour * 60 + ARM_AT.minute
+    quiet_end = (BURST_AT + QUIET_AFTER).hour * 60 + (BURST_AT + QUIET_AFTER).minute
+    return [minute for minute in range(24 * 60) if not quiet_start <= minute <= quiet_end]
+
+
+def build_users(patients, meds_per_patient, seed=1):
+    """Patients whose every BURST_SHARE-th prescription is due at BURST_AT; returns (users, burst count)"""
+    rng = random.Random(seed)
+    minutes = background_minutes()
+    burst_time = BURST_AT.strftime('%H:%M')
+    users = {}
+    burst = 0
+    for p in range(patients):
+        medications = []
+        for m in range(meds_per_patient):
+            n = p * meds_per_patient + m
+            if n % BURST_SHARE == 0:
+                time_text = burst_time
+                burst += 1
+            else:
+                minute = rng.choice(minutes)
+                time_text = f"{minute // 60:02d}:{minute % 60:02d}"
+            medications.append({'name': f"med{m}", 'dosage': '1', 'time': time_text})
+        users[f"patient{p}"] = {'type': 'patient', 'medications': medications}
+    return users, burst
+
+
+def main():
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    meds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    shards = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+    users, expected = build_users(patients, meds, seed)
+    reminders = CountingReminders()
+    service = ReminderService(PrescriptionRepository(lambda: users), reminders, shards)
+
+    # The real clock, shifted to ARM_AT while arming
+    start = time.perf_counter()
+    offset = [ARM_AT - datetime.now()]
+    service.now = lambda: datetime.now() + offset[0]
+    for scheduler in service.schedulers:
+        scheduler.now = service.now
+    service.arm_all(users)
+    arm_seconds = time.perf_counter() - start
+    # Peak RSS in MB (ru_maxrss is in kB on Linux)
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # Jump to LEAD_SECONDS before the burst; nothing else is due in between
+    offset[0] = BURST_AT - datetime.now() - timedelta(seconds=LEAD_SECONDS)
+    cpu_start = time.process_time()
+    service.start()
+    deadline = time.monotonic() + LEAD_SECONDS + 30
+    while reminders.burst < expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    cpu = time.process_time() - cpu_start
+    service.stop()
+
+    stats = service.get_stats()
+    lag = stats['lag']
+    print(f"{patients} patients x {meds} meds, {shards} shards")
+    print(f"arm:   {arm_seconds:.2f}s, peak RSS {memory:.0f} MB, {stats['queued']} queued")
+    print(f"burst: {reminders.burst}/{expected} reminders ({reminders.other} others), CPU {cpu:.2f}s")
+    print(f"lag:   mean {lag['mean'] * 1000:.1f} ms, p50 {lag['p50'] * 1000:.1f} ms, "
+          f"p95 {lag['p95'] * 1000:.1f} ms, p99 {lag['p99'] * 1000:.1f} ms, max {lag['max'] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
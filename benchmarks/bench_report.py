@@ -0,0 +1,65 @@
+"""Clinic-wide adherence report: patients per second at scale.
+
+Generates patients with two prescriptions and two months of dose
+history each (columns filled directly, as in bench_analytics), then
+writes the CSV and JSON report to a temporary directory.
+
+Usage: python benchmarks/bench_report.py [patients] [workers] [chunk_size]
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.dose_history import DoseHistory  # noqa: E402
+from mediminder.history_segments import SegmentedHistory  # noqa: E402
+from mediminder.report import CHUNK_SIZE, write_report  # noqa: E402
+
+DAYS = 60
+TIMES = ('08:00', '20:00')
+
+
+def build(patients, rng):
+    start = date.today().toordinal() - DAYS
+    users, tracking, patient_index = {}, {}, {}
+    for p in range(patients):
+        username, patient_id = f"patient{p}", f"P{p:06d}"
+        users[username] = {'type': 'patient', 'patient_id': patient_id, 'medications': []}
+        patient_index[patient_id] = {'name': f"Patient {p}", 'dob': f"{1940 + p % 70}-06-15", 'contact': ''}
+        tracking[username] = {}
+        for m, time_text in enumerate(TIMES):
+            users[username]['medications'].append({'name': f"med{m}", 'dosage': '1', 'time': time_text})
+            delay = rng.exponential(8, DAYS).astype(np.int16)
+            statuses = np.where(rng.random(DAYS) < 0.1, 3, np.where(delay <= 10, 1, 2)).astype(np.int8)
+            segment = DoseHistory()
+            segment.days.frombytes(np.arange(start, start + DAYS, dtype=np.int32).tobytes())
+            segment.minutes.frombytes((delay + (8 + m * 12) * 60).tobytes())
+            segment.statuses.frombytes(statuses.tobytes())
+            history = SegmentedHistory()
+            history.hot[date.fromordinal(start).strftime('%Y-%m')] = segment
+            tracking[username][f"med{m}"] = {'streak': 0, 'history': history}
+    return users, tracking, patient_index
+
+
+def main():
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else CHUNK_SIZE
+    users, tracking, patient_index = build(patients, np.random.default_rng(1))
+    doses = patients * len(TIMES) * DAYS
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'report.csv')
+        json_path = os.path.join(directory, 'report.json')
+        stats = write_report(users, tracking, patient_index, csv_path, json_path, workers, chunk_size)
+        sizes = os.path.getsize(csv_path) / 1e6, os.path.getsize(json_path) / 1e6
+    print(f"{stats['patients']:,} patients ({doses:,} doses) in {stats['seconds']:.1f}s: "
+          f"{stats['per_second']:,.0f} patients/s, CSV {sizes[0]:.1f} MB, JSON {sizes[1]:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Rolling 7/30/90-day adherence: incremental counters against rescanning history.
+
+For each history length, times reading the three windows from the
+RollingBook counters, counting a new dose into them, and recomputing the
+windows from history (the 90-day slice) and from a full scan of the
+history list. Counter reads and updates should stay flat.
+
+Usage: python benchmarks/bench_rolling.py [doses_per_day]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.history_segments import SegmentedHistory  # noqa: E402
+from mediminder.rolling import WINDOWS, RollingBook, from_history  # noqa: E402
+
+LENGTHS_DAYS = [30, 365, 365 * 3, 365 * 10]
+REPEATS = 2000
+STATUSES = ['on_time'] * 7 + ['late'] * 2 + ['missed']
+
+
+def build_entries(days, doses_per_day, rng):
+    start = date.today() - timedelta(days=days - 1)
+    return [{'date': (start + timedelta(days=day)).isoformat(), 'time': f"{8 + dose * 4:02d}:00",
+             'status': rng.choice(STATUSES)}
+            for day in range(days) for dose in range(doses_per_day)]
+
+
+def per_call(function, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def scan(entries, today):
+    """Windows counted by walking the whole history list"""
+    counts = {days: 0 for days in WINDOWS}
+    for entry in entries:
+        age = (today - date.fromisoformat(entry['date'])).days
+        for days in WINDOWS:
+            if entry['status'] != 'pending' and age < days:
+                counts[days] += 1
+    return counts
+
+
+def main():
+    doses_per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rng = random.Random(1)
+    today = date.today()
+    print(f"{'history':>10} {'entries':>8} {'read (us)':>10} {'update (us)':>12} "
+          f"{'recompute (us)':>15} {'full scan (us)':>15}")
+    for days in LENGTHS_DAYS:
+        entries = build_entries(days, doses_per_day, rng)
+        tracking = {'patient': {'med': {'streak': 0, 'history': SegmentedHistory(entries)}}}
+        book = RollingBook(lambda: tracking)
+        history = tracking['patient']['med']['history']
+
+        read = per_call(lambda: [book.adherence('patient', 'med', window) for window in WINDOWS])
+        update = per_call(lambda: book.dose_event('patient', 'med', 'taken', today.isoformat(), '08:00', 'on_time'))
+        recompute = per_call(lambda: from_history(history, today), 50)
+        full_scan = per_call(lambda: scan(entries, today), 5)
+        print(f"{days:>6} days {len(entries):>8} {read:>10.2f} {update:>12.2f} "
+              f"{recompute:>15.1f} {full_scan:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
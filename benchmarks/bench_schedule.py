@@ -0,0 +1,58 @@
+"""Next-dose lookups: compiled schedules vs re-parsing the time on every call.
+
+Builds prescriptions with a mix of schedule rules (one or several doses a
+day, every N hours, weekdays, tapering) and times next-dose and one-month
+range queries against the old per-call strptime of a single HH:MM time.
+
+Usage: python benchmarks/bench_schedule.py [prescriptions]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.schedule import compile_schedule  # noqa: E402
+
+RULES = [
+    {'time': '08:00'},
+    {'time': '08:00, 14:00, 20:00'},
+    {'time': '06:00', 'every_hours': 8},
+    {'time': '09:00', 'weekdays': ['mon', 'wed', 'fri']},
+    {'time': '08:00, 20:00', 'dosage': '40mg',
+     'taper': [{'from': '2026-01-10', 'dosage': '20mg'}, {'from': '2026-01-20', 'dosage': '10mg', 'time': '08:00'}]},
+]
+
+
+def strptime_next(time_text, after):
+    """The old approach: parse HH:MM on every call"""
+    scheduled = datetime.strptime(time_text, "%H:%M").time()
+    when = datetime.combine(after.date(), scheduled)
+    return when if when >= after else when + timedelta(days=1)
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    print(f"{label:<34} {seconds:8.3f}s  {seconds / count * 1e6:7.2f} us/query")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    meds = [dict(RULES[i % len(RULES)], name=f"med{i}", start_date='2026-01-01', dosage='10mg')
+            for i in range(count)]
+    after = datetime(2026, 1, 15, 12, 30)
+
+    timed("strptime next dose (single time)", count,
+          lambda: [strptime_next('08:00', after) for _ in meds])
+    timed("compiled next dose (mixed rules)", count,
+          lambda: [compile_schedule(med).next_after(after) for med in meds])
+    month = count // 100
+    timed("compiled doses in a month", month,
+          lambda: [compile_schedule(med).between(after, after + timedelta(days=30)) for med in meds[:month]])
+
+
+if __name__ == '__main__':
+    main()
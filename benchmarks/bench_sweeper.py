@@ -0,0 +1,61 @@
+"""Startup catch-up cost: pending-dose index vs scanning dose history.
+
+Builds tracking for many patients with two months of hot history and a
+number of doses left pending while the app was closed, then compares
+finding the expired ones through the snapshot's pending index with a
+full history scan.
+
+Usage: python benchmarks/bench_sweeper.py [patients] [expired_doses]
+"""
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.history_segments import SegmentedHistory  # noqa: E402
+from mediminder.sweeper import PendingIndex  # noqa: E402
+
+DAYS = 60
+MEDS = 3
+
+
+def build(patients, expired):
+    start = date.today() - timedelta(days=DAYS)
+    tracking = {}
+    rows = []
+    for p in range(patients):
+        user_tracking = tracking[f"patient{p}"] = {}
+        for m in range(MEDS):
+            entries = [{'date': (start + timedelta(days=d)).isoformat(), 'time': '08:00', 'status': 'on_time'}
+                       for d in range(DAYS)]
+            if len(rows) < expired:
+                entries.append({'date': date.today().isoformat(), 'time': '00:00', 'status': 'pending'})
+                rows.append([f"patient{p}", f"med{m}", date.today().isoformat(), '00:00'])
+            user_tracking[f"med{m}"] = {'streak': 0, 'history': SegmentedHistory(entries)}
+    return tracking, rows
+
+
+def main():
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    expired = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    tracking, rows = build(patients, expired)
+    now = datetime.now() + timedelta(hours=1)
+
+    start = time.perf_counter()
+    found_index = PendingIndex.from_list(rows).expired(now)
+    index_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found_scan = PendingIndex.from_tracking(tracking).expired(now)
+    scan_seconds = time.perf_counter() - start
+
+    doses = patients * MEDS * DAYS
+    print(f"{patients} patients, {doses} doses of history, {expired} expired pending")
+    print(f"pending index: {len(found_index)} found in {index_seconds * 1000:8.2f} ms")
+    print(f"history scan:  {len(found_scan)} found in {scan_seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Stress test: many processes writing the same data directory at once.
+
+Every worker adds its own users and appointments and records dose events,
+then the final files are checked for lost updates.
+
+Usage: python benchmarks/stress_shared_files.py [workers] [writes_per_worker]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediminder.medication_journal import MedicationJournal  # noqa: E402
+from mediminder.storage import JsonBackend  # noqa: E402
+
+
+def journal_for(data_dir):
+    return MedicationJournal(os.path.join(data_dir, 'medication_tracking.json'),
+                             os.path.join(data_dir, 'medication_tracking.journal'),
+                             compact_every=25,
+                             archive_dir=os.path.join(data_dir, 'history_archive'))
+
+
+def worker(data_dir, worker_id, writes):
+    backend = JsonBackend(data_dir)
+    users = backend.load_users()
+    appointments = backend.load_appointments()
+    journal = journal_for(data_dir)
+    tracking = journal.load()
+    today = time.strftime('%Y-%m-%d')
+
+    for i in range(writes):
+        users[f"worker{worker_id}_{i}"] = {'password': 'x', 'type': 'patient'}
+        backend.save_users(users)
+
+        # Half the workers share a patient so list merging is exercised too
+        patient_appointments = appointments.setdefault(f"patient{worker_id % 2}", {})
+        patient_appointments.setdefault(today, []).append({'time': '09:00', 'id': f"{worker_id}-{i}"})
+        backend.save_appointments(appointments)
+
+        journal.record(tracking, f"worker{worker_id}", 'Aspirin', 'taken', today, '08:00', 'on_time')
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        processes = [multiprocessing.Process(target=worker, args=(data_dir, w, writes))
+                     for w in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        failed_workers = [p.exitcode for p in processes if p.exitcode != 0]
+        backend = JsonBackend(data_dir)
+        users = backend.load_users()
+        appointments = backend.load_appointments()
+        tracking = journal_for(data_dir).load()
+
+        expected = workers * writes
+        user_count = len(users)
+        appointment_count = sum(len(apts) for days in appointments.values() for apts in days.values())
+        dose_count = sum(len(meds['Aspirin']['history']) for meds in tracking.values())
+        streaks_ok = all(meds['Aspirin']['streak'] == writes for meds in tracking.values())
+
+        print(f"{workers} workers x {writes} writes in {elapsed:.2f}s")
+        print(f"users:        {user_count}/{expected}")
+        print(f"appointments: {appointment_count}/{expected}")
+        print(f"dose events:  {dose_count}/{expected} (streaks consistent: {streaks_ok})")
+
+        ok = (not failed_workers and user_count == expected and appointment_count == expected
+              and dose_count == expected and streaks_ok)
+        print("OK" if ok else "LOST UPDATES")
+        return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,27 +1,92 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog
-import json
 import os
-import time
-from patient_management import PatientManagement
-from tkinter import ttk, scrolledtext
 import uuid
-from datetime import datetime, timedelta
-from tkcalendar import Calendar
-from plyer import notification  # For system notifications
+from mediminder.patient_management import PatientManagement
+from mediminder.medication_journal import MedicationJournal
+from mediminder.storage import get_backend
+from mediminder.write_behind import WriteBehind
+from mediminder.prescriptions import PrescriptionRepository
+from mediminder.appointments import AppointmentBook
+from mediminder.adherence import dose_status
+from mediminder.agenda import AgendaBook
+from mediminder.clock import system_clock
+from mediminder.reminders import MedicationReminders
+from mediminder.rolling import WINDOWS as ROLLING_WINDOWS, RollingBook
+from mediminder.schedule import parse_times, schedule_key
+from mediminder.scheduler import DoseScheduler
+from mediminder.event_bridge import EventBridge
+from mediminder.streaks import rebuild_streaks
+from mediminder.sweeper import MissedDoseSweeper
+from mediminder.notifications import NotificationDispatcher, PRIORITY_LOW, default_rate, default_sinks
+from tkinter import ttk, scrolledtext
+from datetime import datetime
 
 # Initialize global variables
 medications = {}  # Dictionary to store patient medications
 medication_tracking = {}  # Dictionary to track medication history
-medication_check_windows = {}  # Dictionary to track medication check windows
 patient_notes = {}  # Dictionary to store patient notes
 appointments = {}  # Dictionary to store appointments: {patient_id: {date: [appointments]}}
 
 # Dictionary to store user credentials and type (username: {'password': password, 'type': user_type})
 users = {}
 
-# Initialize PatientManagement
-patient_manager = PatientManagement()
+# Storage backend for users, medications, appointments and patients
+# (JSON files by default, SQLite when MEDIMINDER_STORAGE=sqlite)
+storage = get_backend()
+
+# Coalesces save_* calls so each store is written at most once per interval
+write_behind = WriteBehind(interval=2.0)
+
+# PatientManagement is created once at startup, after user data is loaded
+patient_manager = None
+
+# Single source of truth for prescriptions (stored in users[...]['medications']);
+# streaks and history come from medication_tracking
+prescriptions = PrescriptionRepository(lambda: users, lambda: medication_tracking,
+                                       on_change=lambda username: save_users(username))
+
+# Append-only journal for dose events (taken/pending/missed)
+medication_journal = MedicationJournal()
+
+# Appointment logic lives in the core package; edits are saved via write-behind
+appointment_book = AppointmentBook(lambda: appointments, on_change=lambda: save_appointments())
+
+# Notifications are delivered by an asyncio dispatcher thread, so a slow or
+# failing backend never blocks the Tk thread or the reminder scheduler
+notifier = NotificationDispatcher(default_sinks(), rate=default_rate())
+
+# Background threads post events here; they are handled on the Tk thread,
+# which is the only thread that writes app state or touches widgets
+ui_events = EventBridge()
+
+# Clock for everything dose-related (a SimulatedClock can be swapped in for testing)
+clock = system_clock
+
+# Reminders for the logged-in patient: the scheduler sleeps until the next
+# dose is due and is re-armed whenever their prescriptions change. It only
+# posts events; recording doses and refreshing the display happen on the Tk thread
+reminders = MedicationReminders(lambda *event: record_dose_event(*event),
+                                notify=notifier.submit)
+reminder_scheduler = DoseScheduler(prescriptions,
+                                   lambda *event: ui_events.post('dose_due', *event),
+                                   clock=clock)
+prescriptions.add_listener(reminder_scheduler.prescriptions_changed)
+ui_events.subscribe('dose_due', reminders.dose_due)
+
+# Pending doses are marked missed at their deadline, on the Tk thread
+missed_sweeper = MissedDoseSweeper(medication_journal, lambda *event: record_dose_event(*event), clock=clock,
+                                   record_many=lambda events: record_dose_events(events))
+SWEEP_MAX_DELAY_MS = 60000
+# With MEDIMINDER_REMINDERS=service the reminder daemon reminds (and catches up) every patient
+REMINDERS_IN_APP = os.environ.get('MEDIMINDER_REMINDERS', 'app') != 'service'
+
+# Each patient's doses for today with their status, updated as doses are recorded
+agenda_book = AgendaBook(prescriptions, lambda: medication_tracking, clock=clock)
+prescriptions.add_listener(agenda_book.prescriptions_changed)
+
+# Dose counts over the last 7/30/90 days per patient and medication, updated as doses are recorded
+rolling_book = RollingBook(lambda: medication_tracking, clock=clock)
 
 # Global variables for physician view widgets
 modify_patient_var = None
@@ -35,126 +100,149 @@ med_entries = {}
 past_notes_text = None
 new_note_text = None
 search_entry = None
+adherence_tree = None
+adherence_group_var = None
 modify_patient_frame = None
 medications_text = None
 notes_text = None
 password_entry = None
+medication_display = None
+medication_refresh_job = None  # pending 60-second refresh of the medication list
 
 def load_users():
     """Load user data from file if it exists."""
     global users
     try:
-        if os.path.exists('users.json'):
-            with open('users.json', 'r') as file:
-                users = json.load(file)
+        users = storage.load_users()
     except Exception as e:
         messagebox.showerror("Error", f"Failed to load user data: {str(e)}")
 
-def save_users():
-    """Save user data to file."""
+# Usernames edited since the last save; None means every user must be checked
+dirty_users = set()
+
+def save_users(username=None):
+    """Mark a user (or every user) for saving by the write-behind flusher."""
+    dirty_users.add(username)
+    write_behind.mark_dirty('users')
+
+def write_users():
+    """Save the users edited since the last save."""
+    pending = set(dirty_users)
+    keys = None if None in pending else sorted(pending)
     try:
-        with open('users.json', 'w') as file:
-            json.dump(users, file)
+        storage.save_users(users, keys)
+        dirty_users.difference_update(pending)
+        return True
     except Exception as e:
         messagebox.showerror("Error", f"Failed to save user data: {str(e)}")
+        return False
+
+def load_medication_tracking():
+    """Load medication tracking snapshot and replay the dose journal."""
+    global medication_tracking
+    try:
+        medication_tracking = medication_journal.load()
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to load medication tracking: {str(e)}")
+        return
+
+    # Streaks are derived from history; repair any that drifted (e.g. older data files)
+    drift = rebuild_streaks(medication_tracking)
+    if drift:
+        print(f"Rebuilt {len(drift)} medication streaks from dose history")
+        medication_journal.compact(medication_tracking)
 
 def save_medication_tracking():
-    """Save medication tracking data to file."""
+    """Mark medication tracking for snapshot compaction by the write-behind flusher."""
+    write_behind.mark_dirty('medication_tracking')
+
+def write_medication_tracking():
+    """Compact medication tracking data into a snapshot file."""
     try:
-        with open('medication_tracking.json', 'w') as file:
-            json.dump(medication_tracking, file)
+        medication_journal.compact(medication_tracking)
+        return True
     except Exception as e:
         messagebox.showerror("Error", f"Failed to save medication tracking: {str(e)}")
+        return False
+
+def record_dose_event(user, med_name, event, date, time=None, status=None):
+    """Append a dose event to the journal and apply it to medication tracking; returns the entry."""
+    try:
+        entry = medication_journal.record(medication_tracking, user, med_name, event, date, time, status)
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to record medication event: {str(e)}")
+        return None
+    if entry is not None:
+        # The journal may file a dose taken after midnight under the day it was due
+        agenda_book.dose_event(user, med_name, event, entry['date'], entry['time'], entry['status'])
+        rolling_book.dose_event(user, med_name, event, entry['date'], entry['time'], entry['status'])
+    return entry
+
+def record_dose_events(events):
+    """Journal several dose events with one append (e.g. a missed-dose sweep) and apply them."""
+    try:
+        entries = medication_journal.record_many(medication_tracking, events)
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to record medication events: {str(e)}")
+        return []
+    for entry in entries:
+        if entry is not None:
+            event = (entry['user'], entry['med'], entry['event'], entry['date'], entry['time'], entry['status'])
+            agenda_book.dose_event(*event)
+            rolling_book.dose_event(*event)
+    return entries
 
 def save_medications():
+    """Mark medications data for saving by the write-behind flusher."""
+    write_behind.mark_dirty('medications')
+
+def write_medications():
     """Save medications data to file."""
     try:
-        with open('medications.json', 'w') as file:
-            json.dump(medications, file)
+        storage.save_medications(medications)
+        return True
     except Exception as e:
         messagebox.showerror("Error", f"Failed to save medications: {str(e)}")
+        return False
 
 def load_appointments():
     """Load appointments from file if it exists."""
     global appointments
     try:
-        if os.path.exists('appointments.json'):
-            with open('appointments.json', 'r') as file:
-                appointments = json.load(file)
-                print(f"Loaded appointments: {appointments}")  # Debug log
-        else:
-            print("No appointments.json file found, starting with empty appointments")
-            appointments = {}
+        appointments = storage.load_appointments()
+        print(f"Loaded appointments: {appointments}")  # Debug log
     except Exception as e:
         print(f"Error loading appointments: {str(e)}")
         messagebox.showerror("Error", f"Failed to load appointments: {str(e)}")
         appointments = {}
 
 def save_appointments():
+    """Mark appointments for saving by the write-behind flusher."""
+    write_behind.mark_dirty('appointments')
+
+def write_appointments():
     """Save appointments to file."""
     try:
-        with open('appointments.json', 'w') as file:
-            json.dump(appointments, file)
-            print(f"Saved appointments: {appointments}")  # Debug log
+        storage.save_appointments(appointments)
+        print(f"Saved appointments: {appointments}")  # Debug log
+        return True
     except Exception as e:
         print(f"Error saving appointments: {str(e)}")
         messagebox.showerror("Error", f"Failed to save appointments: {str(e)}")
+        return False
 
 def add_appointment(patient_id, date, time, description, duration="30"):
     """Add an appointment for a patient."""
-    global appointments  # Ensure we're modifying the global dictionary
-    
-    if patient_id not in appointments:
-        appointments[patient_id] = {}
-    
-    if date not in appointments[patient_id]:
-        appointments[patient_id][date] = []
-    
-    # Create appointment entry
-    appointment = {
-        'time': time,
-        'description': description,
-        'duration': duration,
-        'id': str(uuid.uuid4())[:8]  # Generate unique ID for the appointment
-    }
-    
-    # Add appointment
-    appointments[patient_id][date].append(appointment)
-    
-    # Sort appointments by time
-    appointments[patient_id][date].sort(key=lambda x: x['time'])
-    
-    # Save appointments immediately after adding
-    save_appointments()
-    print(f"Added appointment for patient {patient_id} on {date}: {appointment}")  # Debug log
+    appointment_book.add(patient_id, date, time, description, duration)
     return True
 
 def get_patient_appointments(patient_id, date=None):
     """Get appointments for a patient, optionally filtered by date."""
-    if patient_id not in appointments:
-        print(f"No appointments found for patient {patient_id}")  # Debug log
-        return []
-    
-    if date:
-        appointments_for_date = appointments[patient_id].get(date, [])
-        print(f"Found {len(appointments_for_date)} appointments for patient {patient_id} on {date}")  # Debug log
-        return appointments_for_date
-    
-    print(f"All appointments for patient {patient_id}: {appointments[patient_id]}")  # Debug log
-    return appointments[patient_id]
+    return appointment_book.for_patient(patient_id, date)
 
 def delete_appointment(patient_id, date, appointment_id):
     """Delete an appointment."""
-    if patient_id in appointments and date in appointments[patient_id]:
-        appointments[patient_id][date] = [
-            apt for apt in appointments[patient_id][date]
-            if apt['id'] != appointment_id
-        ]
-        if not appointments[patient_id][date]:
-            del appointments[patient_id][date]
-        save_appointments()
-        return True
-    return False
+    return appointment_book.delete(patient_id, date, appointment_id)
 
 def show_frame(frame):
     """Brings the given frame to the front."""
@@ -167,6 +255,9 @@ def login():
     
     if username in users and users[username]['password'] == password:
         if users[username]['type'] == 'patient':
+            reminder_scheduler.arm(username)
+            if REMINDERS_IN_APP:
+                catch_up_missed_doses(username)
             show_frame(patient_landing_frame)
             setup_patient_view()  # Set up patient view with calendar and theme support
         else:
@@ -238,10 +329,10 @@ def signup():
                 'patient_id': patient_id  # Store patient ID in user data
             }
 
-            # Add patient to patient management system
-            patient_manager.add_patient(patient_id, name, dob, contact)
-            
-            save_users()
+            # Add patient to patient management system and save both stores together
+            with write_behind.batch():
+                patient_manager.add_patient(patient_id, name, dob, contact)
+                save_users(username)
             messagebox.showinfo("Success", "Account created successfully!")
             patient_details.destroy()
             show_frame(login_frame)
@@ -254,7 +345,7 @@ def signup():
             'password': password,
             'type': user_type
         }
-        save_users()
+        save_users(username)
         messagebox.showinfo("Success", "Account created successfully!")
         show_frame(login_frame)
 
@@ -265,6 +356,7 @@ def signup():
 
 def go_to_login():
     """Clears login fields and shows the login frame."""
+    reminder_scheduler.disarm(username_entry.get())
     username_entry.delete(0, tk.END)
     password_entry.delete(0, tk.END)
     show_frame(login_frame)
@@ -278,8 +370,8 @@ def update_patient_list():
         for item in patient_tree.get_children():
             patient_tree.delete(item)
         
-        # Get patients from patient manager
-        patients = patient_manager.get_all_patients()
+        # Get patient summaries (name/dob/contact) without loading full records
+        patients = patient_manager.get_patient_summaries()
         if patients is None:
             patients = {}  # Initialize empty dictionary if None
             
@@ -337,8 +429,9 @@ def save_modified_patient():
                                 'dosage': dosage,
                                 'time': time
                             })
-            users[selected_username]['medications'] = medications
+            prescriptions.replace_all(selected_username, medications)
         
+        save_users(selected_username)
         messagebox.showinfo("Success", "Patient data updated successfully")
         show_frame(physician_landing_frame)
     else:
@@ -372,8 +465,7 @@ def load_patient_data(event=None):
     # Update medications
     if medications_text:
         medications_text.delete("1.0", tk.END)
-        if 'medications' in patient_data:
-            for med in patient_data['medications']:
+        for med in prescriptions.for_user(selected_username):
                 medications_text.insert(tk.END, f"{med['name']} - {med['dosage']} at {med['time']}\n")
 
 def save_medical_note():
@@ -395,6 +487,7 @@ def save_medical_note():
         if 'notes' not in users[selected_username]:
             users[selected_username]['notes'] = ""
         users[selected_username]['notes'] += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M')}: {new_note}"
+        save_users(selected_username)
         new_note_text.delete("1.0", tk.END)
         load_patient_data()
         messagebox.showinfo("Success", "Note saved successfully")
@@ -411,16 +504,22 @@ def load_patient_medications(event=None):
     for item in med_tree.get_children():
         med_tree.delete(item)
     
+    def percent(window):
+        adherence = window['adherence']
+        return f"{adherence * 100:.0f}%" if adherence is not None else "-"
+    
     # Add medications to tree view
-    if 'medications' in users[selected_username]:
-        for med in users[selected_username]['medications']:
-            med_tree.insert('', 'end', values=(
-                med['name'],
-                med['dosage'],
-                med['time'],
-                'Active',
-                datetime.now().strftime('%Y-%m-%d')
-            ))
+    for med in prescriptions.for_user(selected_username):
+        recent = " / ".join(percent(rolling_book.adherence(selected_username, med['name'], days))
+                            for days in ROLLING_WINDOWS)
+        med_tree.insert('', 'end', values=(
+            med['name'],
+            med['dosage'],
+            med['time'],
+            med.get('status') or 'Active',
+            med.get('start_date', ''),
+            recent
+        ))
 
 def clear_med_form():
     """Clear all medication form fields."""
@@ -438,6 +537,45 @@ def update_med_patient_list():
         patient_list = [username for username, data in users.items() if data.get('type') == 'patient']
         med_patient_select['values'] = patient_list
 
+def update_adherence_view():
+    """Fill the physician's adherence tab, grouped by patient, medication or cohort."""
+    if not adherence_tree:
+        return
+    try:
+        from mediminder.analytics import adherence_report, age_band  # needs numpy, imported when first used
+    except ImportError:
+        messagebox.showerror("Error", "Adherence analytics need numpy (pip install numpy)")
+        return
+
+    by = adherence_group_var.get().lower()
+    cohorts = {}
+    if by == 'cohort':
+        for patient_id, data in patient_manager.get_patient_summaries().items():
+            username = prescriptions.username_for_patient(patient_id)
+            if username:
+                cohorts[username] = age_band(data.get('dob', ''))
+    report = adherence_report(medication_tracking, prescriptions, by,
+                              cohort_of=lambda username: cohorts.get(username, 'Unknown'))
+
+    def percent(value):
+        return f"{value * 100:.0f}%" if value is not None else "-"
+
+    for item in adherence_tree.get_children():
+        adherence_tree.delete(item)
+    for label, row in report.items():
+        lateness = row['mean_lateness']
+        adherence_tree.insert('', 'end', values=(
+            label,
+            row['doses'],
+            percent(row['adherence']),
+            percent(row['on_time_ratio']),
+            percent(row['late_ratio']),
+            percent(row['missed_ratio']),
+            row['longest_streak'],
+            row['current_streak'],
+            f"{lateness:.1f}" if lateness is not None else "-"
+        ))
+
 def add_medication():
     """Add or update a medication reminder."""
     selected_username = med_patient_select.get()
@@ -456,13 +594,13 @@ def add_medication():
         messagebox.showerror("Error", "Please fill in all required fields")
         return
     
-    # Validate and format time
+    # Validate and format the dose time(s)
     try:
-        # Try to parse the time to ensure it's valid
-        time_obj = datetime.strptime(schedule, "%H:%M")
-        formatted_time = time_obj.strftime("%H:%M")  # Ensure consistent format
+        # One or more HH:MM times, e.g. "09:00" or "09:00, 21:00"
+        formatted_time = ", ".join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in parse_times(schedule))
     except ValueError:
-        messagebox.showerror("Error", "Invalid time format. Please use HH:MM format (e.g., 09:00)")
+        messagebox.showerror("Error", "Invalid time format. Please use HH:MM format (e.g., 09:00), "
+                                      "separating several doses with commas (e.g., 09:00, 21:00)")
         return
     
     # Create medication entry
@@ -472,33 +610,20 @@ def add_medication():
         'time': formatted_time,
         'instructions': instructions,
         'status': status,
-        'start_date': datetime.now().strftime('%Y-%m-%d'),
-        'streak': 0,
-        'history': []
+        'start_date': datetime.now().strftime('%Y-%m-%d')
     }
     
     # Add or update user's medications
     if selected_username in users:
-        if 'medications' not in users[selected_username]:
-            users[selected_username]['medications'] = []
+        # Keep the original start date when updating an existing medication
+        existing = prescriptions.get(selected_username, name)
+        if existing is not None:
+            medication['start_date'] = existing.get('start_date', medication['start_date'])
         
-        # Check if medication already exists
-        existing_med_index = None
-        for i, med in enumerate(users[selected_username]['medications']):
-            if med['name'] == name:
-                existing_med_index = i
-                break
-        
-        if existing_med_index is not None:
-            # Update existing medication
-            # Preserve streak and history from existing medication
-            medication['streak'] = users[selected_username]['medications'][existing_med_index].get('streak', 0)
-            medication['history'] = users[selected_username]['medications'][existing_med_index].get('history', [])
-            users[selected_username]['medications'][existing_med_index] = medication
+        # Streak and history live in medication tracking, so they are preserved
+        if prescriptions.upsert(selected_username, medication) == 'updated':
             message = "Medication updated successfully"
         else:
-            # Add new medication
-            users[selected_username]['medications'].append(medication)
             message = "Medication added successfully"
         
         # Initialize tracking for new medications
@@ -507,25 +632,9 @@ def add_medication():
         if name not in medication_tracking[selected_username]:
             medication_tracking[selected_username][name] = {
                 'streak': 0,
-                'history': []
+                'history': medication_journal.new_history(selected_username, name)
             }
         
-        # Save all data
-        save_users()
-        save_medication_tracking()
-        
-        # Add to patient management system
-        if 'patient_id' in users[selected_username]:
-            patient_id = users[selected_username]['patient_id']
-            patient_manager.add_medication(patient_id, {
-                'medication_name': name,
-                'dosage': dosage,
-                'schedule': formatted_time,
-                'instructions': instructions,
-                'status': status,
-                'start_date': datetime.now().strftime('%Y-%m-%d')
-            })
-        
         messagebox.showinfo("Success", message)
         clear_med_form()
         load_patient_medications()
@@ -552,11 +661,7 @@ def delete_medication():
         return
     
     # Remove medication from patient's record
-    if selected_username in users and 'medications' in users[selected_username]:
-        users[selected_username]['medications'] = [
-            med for med in users[selected_username]['medications']
-            if med['name'] != medication_name
-        ]
+    if selected_username in users and prescriptions.delete(selected_username, medication_name):
         messagebox.showinfo("Success", "Medication deleted successfully")
         load_patient_medications()
     else:
@@ -565,7 +670,8 @@ def delete_medication():
 def setup_physician_view():
     """Set up the physician's view with tabs for different functionalities."""
     global patient_tree, patient_select, med_patient_select, med_patient_var, med_tree, med_entries
-    global past_notes_text, new_note_text, search_entry
+    global past_notes_text, new_note_text, search_entry, adherence_tree, adherence_group_var
+    from tkcalendar import Calendar  # GUI-only dependency, imported when first needed
     
     # Clear existing widgets in physician_landing_frame
     for widget in physician_landing_frame.winfo_children():
@@ -686,7 +792,7 @@ def setup_physician_view():
     tree_frame.grid_columnconfigure(0, weight=1)
 
     # Medication list view
-    med_columns = ('Medication', 'Dose', 'Schedule', 'Status', 'Start Date')
+    med_columns = ('Medication', 'Dose', 'Schedule', 'Status', 'Start Date', 'Adherence 7/30/90d')
     med_tree = ttk.Treeview(tree_frame, columns=med_columns, show='headings', height=6)
     
     # Add vertical scrollbar
@@ -758,6 +864,33 @@ def setup_physician_view():
     
     # Bind events
     med_patient_select.bind('<<ComboboxSelected>>', load_patient_medications)
+
+    # Adherence Tab: population statistics over every patient's dose history
+    adherence_frame = ttk.Frame(notebook)
+    notebook.add(adherence_frame, text='Adherence')
+    adherence_frame.grid_rowconfigure(1, weight=1)
+    adherence_frame.grid_columnconfigure(0, weight=1)
+
+    adherence_controls = ttk.Frame(adherence_frame)
+    adherence_controls.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
+    ttk.Label(adherence_controls, text="Group by:").pack(side="left", padx=5)
+    adherence_group_var = tk.StringVar(value="Patient")
+    adherence_group = ttk.Combobox(adherence_controls, textvariable=adherence_group_var, state="readonly",
+                                   values=["Patient", "Medication", "Cohort"], width=15)
+    adherence_group.pack(side="left", padx=5)
+    adherence_group.bind('<<ComboboxSelected>>', lambda e: update_adherence_view())
+    ttk.Button(adherence_controls, text="Refresh", command=update_adherence_view).pack(side="right", padx=5)
+
+    adherence_columns = ('Group', 'Doses', 'Adherence', 'On Time', 'Late', 'Missed',
+                         'Longest Streak', 'Current Streak', 'Mean Lateness (min)')
+    adherence_tree = ttk.Treeview(adherence_frame, columns=adherence_columns, show='headings')
+    for col in adherence_columns:
+        adherence_tree.heading(col, text=col)
+        adherence_tree.column(col, width=90, minwidth=50)
+    adherence_scroll = ttk.Scrollbar(adherence_frame, orient="vertical", command=adherence_tree.yview)
+    adherence_tree.configure(yscrollcommand=adherence_scroll.set)
+    adherence_tree.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+    adherence_scroll.grid(row=1, column=1, sticky="ns", pady=5)
     
     # Initialize the patient list after all widgets are created
     update_patient_list()
@@ -994,11 +1127,11 @@ def show_appointments():
                     font=("Arial", 10)).pack(pady=5)
     
     # Get current user's medications
-    if current_user in users and 'medications' in users[current_user]:
-        medications = users[current_user]['medications']
-        
-        # Filter medications for selected date
-        date_medications = [med for med in medications if med.get('start_date') <= selected_date]
+    medications = prescriptions.for_user(current_user)
+    if medications:
+        # Doses on the selected date with their status (today's agenda is kept up to date)
+        day = datetime.strptime(selected_date, "%Y-%m-%d").date()
+        date_medications = agenda_book.for_user(current_user, day).slots
         
         if date_medications:
             # Create label for medications
@@ -1007,35 +1140,35 @@ def show_appointments():
                                font=("Arial", 10, "bold"))
             med_label.pack(pady=5)
             
-            # Display each medication
-            for med in sorted(date_medications, key=lambda x: x['time']):
+            # Display each dose
+            for slot in date_medications:
                 med_frame = tk.Frame(appointments_frame)
                 med_frame.pack(fill="x", padx=10, pady=2)
                 
                 # Medication name and dosage
                 tk.Label(med_frame,
-                        text=f"{med['name']} - {med['dosage']}",
+                        text=f"{slot.med_name} - {slot.dosage}",
                         font=("Arial", 10)).pack(side="left")
                 
                 # Time
                 tk.Label(med_frame,
-                        text=f"at {med['time']}",
+                        text=f"at {slot.time_text}",
                         font=("Arial", 10)).pack(side="left", padx=10)
                 
                 # Status
-                current_time = datetime.now()
-                if current_time.strftime("%Y-%m-%d") == selected_date:
-                    med_history = medication_tracking.get(current_user, {}).get(med['name'], {}).get('history', [])
-                    today_entry = next((entry for entry in med_history if entry['date'] == selected_date), None)
+                current_time = clock.now()
+                if selected_date <= current_time.strftime("%Y-%m-%d"):
+                    # Past months are read from the history archive on demand
+                    day_status = slot.status
                     
-                    if today_entry:
-                        if today_entry['status'] == 'on_time':
+                    if day_status:
+                        if day_status == 'on_time':
                             status_text = "✓ Taken on time"
                             status_color = "green"
-                        elif today_entry['status'] == 'late':
+                        elif day_status == 'late':
                             status_text = "⚠ Taken late"
                             status_color = "orange"
-                        elif today_entry['status'] == 'missed':
+                        elif day_status == 'missed':
                             status_text = "✗ Missed"
                             status_color = "red"
                         else:
@@ -1054,6 +1187,13 @@ def show_appointments():
 
 def update_patient_medications():
     """Update the medication display for the current patient."""
+    global medication_refresh_job
+    
+    # Replace the pending periodic refresh instead of starting a second one
+    if medication_refresh_job is not None:
+        root.after_cancel(medication_refresh_job)
+        medication_refresh_job = None
+    
     # Clear existing medications
     for widget in medication_display.winfo_children():
         widget.destroy()
@@ -1071,9 +1211,8 @@ def update_patient_medications():
             font=("Arial", 12, "bold")).grid(row=0, column=0, columnspan=3, pady=10)
     
     # Check if user has medications
-    if current_user in users and 'medications' in users[current_user]:
-        medications = users[current_user]['medications']
-        
+    medications = prescriptions.for_user(current_user)
+    if medications:
         # Add headers
         headers = ["Medication", "Time", "Status", "Take"]
         for i, header in enumerate(headers):
@@ -1081,35 +1220,36 @@ def update_patient_medications():
                     text=header,
                     font=("Arial", 10, "bold")).grid(row=1, column=i, padx=5, pady=5)
         
-        # Get current time
-        current_time = datetime.now()
-        current_date = current_time.strftime("%Y-%m-%d")
+        # Get current time and today's agenda
+        current_time = clock.now()
+        agenda = agenda_book.for_user(current_user)
         
         # Add each medication
         for i, med in enumerate(medications, 2):
-            # Medication name and dosage
+            slots = agenda.for_med(med['name'])
+            
+            # Medication name and today's dosage (tapering may change it)
             tk.Label(med_list_frame,
-                    text=f"{med['name']} - {med['dosage']}",
+                    text=f"{med['name']} - {slots[0].dosage if slots else med['dosage']}",
                     font=("Arial", 10)).grid(row=i, column=0, sticky="w", padx=5, pady=2)
             
-            # Scheduled time
+            # Scheduled time(s) today
             tk.Label(med_list_frame,
-                    text=med['time'],
+                    text=", ".join(slot.time_text for slot in slots) or "-",
                     font=("Arial", 10)).grid(row=i, column=1, padx=5, pady=2)
             
-            # Calculate time difference
-            med_time = datetime.strptime(med['time'], "%H:%M").time()
-            current_time_only = current_time.time()
-            time_diff = (current_time_only.hour * 60 + current_time_only.minute) - \
-                       (med_time.hour * 60 + med_time.minute)
-            
-            # Check medication history for today
-            med_history = medication_tracking.get(current_user, {}).get(med['name'], {}).get('history', [])
-            today_entry = next((entry for entry in med_history if entry['date'] == current_date), None)
+            # Today's dose closest to now, and minutes since it was due
+            dose = agenda.nearest(med['name'], current_time)
+            if dose is not None:
+                time_diff = int((current_time - dose.when).total_seconds() // 60)
+                status = dose.status
             
             # Determine status and whether to show checkbox
-            if today_entry:
-                status = today_entry['status']
+            if dose is None:
+                status_text = "No dose today"
+                status_color = "black"
+                show_checkbox = False
+            elif status and status != 'pending':
                 if status == 'on_time':
                     status_text = "✓ Taken on time"
                     status_color = "green"
@@ -1123,7 +1263,7 @@ def update_patient_medications():
                     status_color = "red"
                     show_checkbox = True
             else:
-                # No entry for today
+                # Not taken yet (reminded or not)
                 if abs(time_diff) <= 10:  # Within 10-minute window
                     status_text = "Time to take!"
                     status_color = "blue"
@@ -1166,174 +1306,66 @@ def update_patient_medications():
                 font=("Arial", 10)).grid(row=1, column=0, pady=10)
     
     # Schedule next update in 1 minute
-    medication_display.after(60000, update_patient_medications)
+    medication_refresh_job = medication_display.after(60000, update_patient_medications)
+
+def refresh_after_dose_events(kinds):
+    """Redraw the medication list once after a batch of reminder events."""
+    if medication_display is not None and medication_display.winfo_exists():
+        update_patient_medications()
+
+def catch_up_missed_doses(username):
+    """Mark a patient's doses that came due while nobody was reminding them as missed."""
+    try:
+        caught_up = missed_sweeper.catch_up(prescriptions, lambda: medication_tracking, [username])
+        if caught_up:
+            print(f"Marked {caught_up} doses of {username} missed while the app was closed")
+            refresh_after_dose_events({'missed'})
+        save_medication_tracking()  # keeps the catch-up point in the next snapshot
+    except Exception as e:
+        print(f"Error catching up on missed doses: {str(e)}")
+
+def sweep_missed_doses():
+    """Mark expired pending doses as missed and wait for the next deadline."""
+    try:
+        if missed_sweeper.sweep():
+            refresh_after_dose_events({'missed'})
+    except Exception as e:
+        print(f"Error sweeping missed doses: {str(e)}")
+    
+    # Wake at the next deadline; the cap picks up doses that became pending meanwhile
+    delay_ms = SWEEP_MAX_DELAY_MS
+    next_deadline = missed_sweeper.next_deadline()
+    if next_deadline is not None:
+        delay_ms = min(delay_ms, max(0, int((next_deadline - clock.now()).total_seconds() * 1000)))
+    root.after(delay_ms, sweep_missed_doses)
 
 def take_medication(medication):
     """Mark a medication as taken and update streak."""
     current_user = username_entry.get()
-    current_time = datetime.now()
+    current_time = clock.now()
     
-    # Get medication time
-    med_time = datetime.strptime(medication['time'], "%H:%M").time()
-    current_time_only = current_time.time()
+    # Within 10 minutes of the closest scheduled dose is considered on time
+    dose = agenda_book.for_user(current_user).nearest(medication['name'], current_time)
+    status = dose_status(dose.time_text, current_time) if dose else 'late'
     
-    # Calculate time difference in minutes
-    time_diff = (current_time_only.hour * 60 + current_time_only.minute) - \
-                (med_time.hour * 60 + med_time.minute)
-    
-    # Update streak based on timing
-    if abs(time_diff) <= 10:  # Within 10 minutes is considered on time
-        status = "on_time"
-        streak_increment = 1
-    else:
-        status = "late"
-        streak_increment = 0
-    
-    # Update streak in user data
     if current_user in users:
-        if 'medications' not in users[current_user]:
-            users[current_user]['medications'] = []
-        
-        # Find and update the medication
-        for med in users[current_user]['medications']:
-            if med['name'] == medication['name']:
-                if 'streak' not in med:
-                    med['streak'] = 0
-                med['streak'] = max(0, med['streak'] + streak_increment)
-                break
-        
-        # Update tracking data
-        if current_user not in medication_tracking:
-            medication_tracking[current_user] = {}
-        if medication['name'] not in medication_tracking[current_user]:
-            medication_tracking[current_user][medication['name']] = {
-                'streak': 0,
-                'history': []
-            }
-        
-        tracking_data = medication_tracking[current_user][medication['name']]
-        tracking_data['streak'] = max(0, tracking_data['streak'] + streak_increment)
-        
-        # Add history entry
-        history_entry = {
-            'date': current_time.strftime("%Y-%m-%d"),
-            'time': current_time.strftime("%H:%M"),
-            'status': status
-        }
-        tracking_data['history'].append(history_entry)
-        
-        # Save data
-        save_users()
-        save_medication_tracking()
+        # Record the dose in the tracking journal (updates streak and history)
+        entry = record_dose_event(current_user, medication['name'], 'taken',
+                                  current_time.strftime("%Y-%m-%d"),
+                                  current_time.strftime("%H:%M"),
+                                  status)
+        if entry is not None:
+            status = entry['status']
         
         # Show notification
-        try:
-            notification.notify(
-                title="Medication Taken",
-                message=f"{medication['name']} marked as {status}",
-                app_icon=None,
-                timeout=5
-            )
-        except Exception as e:
-            print(f"Notification error: {e}")
+        notifier.submit("Medication Taken", f"{medication['name']} marked as {status}", 5, current_user,
+                        priority=PRIORITY_LOW)
         
         # Update display
         update_patient_medications()
     else:
         messagebox.showerror("Error", "User not found")
 
-def check_medication_reminders():
-    """Check for medication reminders and send notifications."""
-    while True:
-        try:
-            current_time = datetime.now()
-            current_user = username_entry.get()
-            
-            if current_user in users and 'medications' in users[current_user]:
-                for med in users[current_user]['medications']:
-                    try:
-                        # Validate time format
-                        if 'time' not in med or not isinstance(med['time'], str):
-                            continue
-                            
-                        try:
-                            med_time = datetime.strptime(med['time'], "%H:%M").time()
-                        except ValueError:
-                            print(f"Invalid time format for medication: {med.get('name', 'Unknown')}")
-                            continue
-                            
-                        current_time_only = current_time.time()
-                        
-                        # Check if it's time for medication (within 1 minute of scheduled time)
-                        if (med_time.hour == current_time_only.hour and 
-                            abs(med_time.minute - current_time_only.minute) <= 1):
-                            
-                            # Create 10-minute window for taking medication
-                            window_start = current_time
-                            window_end = current_time + timedelta(minutes=10)
-                            
-                            if current_user not in medication_check_windows:
-                                medication_check_windows[current_user] = {}
-                            
-                            # Only create new window if one doesn't exist for this medication
-                            if med['name'] not in medication_check_windows[current_user]:
-                                medication_check_windows[current_user][med['name']] = {
-                                    'window_start': window_start.strftime("%Y-%m-%d %H:%M:%S"),
-                                    'window_end': window_end.strftime("%Y-%m-%d %H:%M:%S")
-                                }
-                                
-                                # Create tracking entry if it doesn't exist
-                                if current_user not in medication_tracking:
-                                    medication_tracking[current_user] = {}
-                                if med['name'] not in medication_tracking[current_user]:
-                                    medication_tracking[current_user][med['name']] = {
-                                        'streak': 0,
-                                        'history': []
-                                    }
-                                
-                                # Add new tracking entry
-                                medication_tracking[current_user][med['name']]['history'].append({
-                                    'date': current_time.strftime("%Y-%m-%d"),
-                                    'time': med['time'],
-                                    'status': 'pending'
-                                })
-                                save_medication_tracking()
-                                
-                                # Send notification
-                                try:
-                                    notification.notify(
-                                        title="Medication Reminder",
-                                        message=f"Time to take {med['name']} - {med['dosage']}",
-                                        app_icon=None,
-                                        timeout=10
-                                    )
-                                except Exception as e:
-                                    print(f"Notification error: {e}")
-                        
-                        # Check for missed medications (10 minutes after window end)
-                        elif (med_time.hour == current_time_only.hour and 
-                              current_time_only.minute == (med_time.minute + 20) % 60):
-                            
-                            # If there's a pending entry that hasn't been marked, mark it as missed
-                            if (current_user in medication_tracking and 
-                                med['name'] in medication_tracking[current_user]):
-                                
-                                for entry in reversed(medication_tracking[current_user][med['name']]['history']):
-                                    if entry['status'] == 'pending' and entry['date'] == current_time.strftime("%Y-%m-%d"):
-                                        entry['status'] = 'missed'
-                                        medication_tracking[current_user][med['name']]['streak'] = 0
-                                        save_medication_tracking()
-                                        update_patient_medications()
-                                        break
-                    except Exception as e:
-                        print(f"Error processing medication: {med.get('name', 'Unknown')}, Error: {str(e)}")
-                        continue
-        
-        except Exception as e:
-            print(f"Error in medication reminder checker: {str(e)}")
-        
-        time.sleep(30)  # Check every 30 seconds
-
 def update_patient_notes():
     """Update the notes display for the current patient."""
     current_user = username_entry.get()
@@ -1406,9 +1438,10 @@ def update_physician_patient_view():
             info_text.insert(tk.END, f"Patient: {selected_patient}\n\n")
             
             # Display medications
-            if 'medications' in patient_data and patient_data['medications']:
+            patient_medications = prescriptions.for_user(selected_patient)
+            if patient_medications:
                 info_text.insert(tk.END, "Current Medications:\n")
-                for med in patient_data['medications']:
+                for med in patient_medications:
                     info_text.insert(tk.END, f"- {med['name']} ({med['dosage']}) at {med['time']}\n")
                     if 'schedule' in med:
                         info_text.insert(tk.END, f"  Schedule: {med['schedule']}\n")
@@ -1438,7 +1471,7 @@ def search_patient():
 def display_patient_medications():
     """Display medications for the current patient."""
     current_user = username_entry.get()
-    if current_user not in users or 'medications' not in users[current_user]:
+    if not prescriptions.for_user(current_user):
         return
     
     # Clear existing medications
@@ -1455,7 +1488,7 @@ def display_patient_medications():
             font=("Arial", 12, "bold")).grid(row=0, column=0, pady=10)
     
     # Display each medication
-    for i, med in enumerate(users[current_user]['medications'], 1):
+    for i, med in enumerate(prescriptions.for_user(current_user), 1):
         med_frame = tk.Frame(med_list_frame)
         med_frame.grid(row=i, column=0, sticky="ew", pady=2)
         
@@ -1476,6 +1509,7 @@ def display_patient_medications():
 def setup_patient_view():
     """Set up the patient's view with calendar and medication display."""
     global cal, appointments_frame, medications_frame, notes_frame, notes_text, medication_display
+    from tkcalendar import Calendar  # GUI-only dependency, imported when first needed
     
     # Clear existing widgets in patient_landing_frame
     for widget in patient_landing_frame.winfo_children():
@@ -1633,144 +1667,213 @@ def modify_selected_medication():
     
     med_entries['status'].set(values[3])
 
-# Create the main window
-root = tk.Tk()
-root.title("Medication Tracker")
-
-# Load all data at startup
-load_users()
-load_appointments()
-patient_manager = PatientManagement()
-
-# Configure grid so frames expand to fill the window
-root.rowconfigure(0, weight=1)
-root.columnconfigure(0, weight=1)
-
-# Create frames
-login_frame = tk.Frame(root)
-signup_frame = tk.Frame(root)
-patient_landing_frame = tk.Frame(root)
-physician_landing_frame = tk.Frame(root)
-physician_patient_frame = tk.Frame(root)
+# Merge changes saved by other instances sharing the data directory
+SHARED_REFRESH_MS = 5000
 
-for frame in (login_frame, signup_frame, patient_landing_frame, physician_landing_frame, physician_patient_frame):
-    frame.grid(row=0, column=0, sticky='nsew')
-
-# -------------------
-# Login Frame Setup
-# -------------------
-
-# Center frame container
-login_container = tk.Frame(login_frame)
-login_container.place(relx=0.5, rely=0.5, anchor="center")
-
-tk.Label(login_container, text="Welcome! Please Login or Sign Up", font=('Helvetica', 24, 'bold')).grid(row=0, column=0, columnspan=2, pady=(0,20))
-
-tk.Label(login_container, text="Username:", font=('Helvetica', 12)).grid(row=1, column=0, padx=10, pady=10, sticky="e")
-username_entry = tk.Entry(login_container, font=('Helvetica', 12), width=20)
-username_entry.grid(row=1, column=1, padx=10, pady=10)
-
-tk.Label(login_container, text="Password:", font=('Helvetica', 12)).grid(row=2, column=0, padx=10, pady=10, sticky="e")
-password_entry = tk.Entry(login_container, show="*", font=('Helvetica', 12), width=20)
-password_entry.grid(row=2, column=1, padx=10, pady=10)
-
-button_frame = tk.Frame(login_container)
-button_frame.grid(row=3, column=0, columnspan=2, pady=20)
-
-tk.Button(button_frame, text="Login", command=login, font=('Helvetica', 12), width=10).pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Sign Up", command=go_to_signup, font=('Helvetica', 12), width=10).pack(side=tk.LEFT, padx=5)
-
-# Configure login frame grid weights
-login_frame.grid_rowconfigure(0, weight=1)
-login_frame.grid_columnconfigure(0, weight=1)
-
-# -------------------
-# Sign-up Frame Setup
-# -------------------
-tk.Label(signup_frame, text="Sign Up", font=('Helvetica', 16)).grid(row=0, column=0, columnspan=2, pady=10)
-
-tk.Label(signup_frame, text="Username:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
-signup_username_entry = tk.Entry(signup_frame)
-signup_username_entry.grid(row=1, column=1, padx=10, pady=10)
-
-tk.Label(signup_frame, text="Password:").grid(row=2, column=0, padx=10, pady=10, sticky="e")
-signup_password_entry = tk.Entry(signup_frame, show="*")
-signup_password_entry.grid(row=2, column=1, padx=10, pady=10)
-
-# Add user type selection
-tk.Label(signup_frame, text="User Type:").grid(row=3, column=0, padx=10, pady=10, sticky="e")
-user_type_var = tk.StringVar()
-user_type_frame = tk.Frame(signup_frame)
-user_type_frame.grid(row=3, column=1, padx=10, pady=10, sticky="w")
-tk.Radiobutton(user_type_frame, text="Patient", variable=user_type_var, value="patient").pack(side="left")
-tk.Radiobutton(user_type_frame, text="Physician", variable=user_type_var, value="physician").pack(side="left")
-
-tk.Button(signup_frame, text="Sign Up", command=signup).grid(row=4, column=0, columnspan=2, pady=10)
-tk.Button(signup_frame, text="Back to Login", command=go_to_login).grid(row=5, column=0, columnspan=2, pady=10)
-
-# -------------------
-# Patient Landing Page Frame Setup
-# -------------------
-tk.Label(patient_landing_frame, text="Patient Dashboard", font=('Helvetica', 16)).grid(row=0, column=0, columnspan=2, pady=20)
-
-# Patient Information Section
-info_frame = tk.LabelFrame(patient_landing_frame, text="Your Information", padx=10, pady=10)
-info_frame.grid(row=1, column=0, columnspan=2, padx=20, pady=10, sticky="ew")
+def refresh_shared_data():
+    """Pick up users, appointments, doses and patients saved by other processes."""
+    try:
+        # Schedules of the users getting reminders, to spot prescriptions edited elsewhere
+        armed = {username: [(med['name'], schedule_key(med)) for med in prescriptions.for_user(username)]
+                 for username in reminder_scheduler.armed_users()}
+        users_changed = storage.refresh_users(users)
+        storage.refresh_appointments(appointments)
+        doses_changed = medication_journal.refresh(medication_tracking)
+        patient_manager.refresh()
+        if users_changed or doses_changed:
+            # Prescriptions or doses saved elsewhere: rebuild agendas on next read
+            agenda_book.clear()
+        if users_changed:
+            for username, schedules in armed.items():
+                if schedules != [(med['name'], schedule_key(med)) for med in prescriptions.for_user(username)]:
+                    reminder_scheduler.prescriptions_changed(username)
+        if doses_changed:
+            # Rolling counters are rebuilt from the merged history on next read
+            rolling_book.clear()
+    except Exception as e:
+        print(f"Error refreshing shared data: {str(e)}")
+    root.after(SHARED_REFRESH_MS, refresh_shared_data)
 
-tk.Label(info_frame, text="Name:").grid(row=0, column=0, sticky="e", padx=5, pady=5)
-name_entry = tk.Entry(info_frame)
-name_entry.grid(row=0, column=1, padx=5, pady=5)
+# Function to handle application closing
+def on_closing():
+    """Save all data and close the application."""
+    # Edited users are already marked dirty; flush() below writes them
+    save_appointments()
+    save_medication_tracking()
+    if not write_behind.flush():
+        if not messagebox.askyesno("Save Failed", "Some data could not be saved. Close anyway?"):
+            return
+    print(f"Write-behind stats: {write_behind.get_stats()}")  # Debug log
+    notifier.stop(timeout=2)
+    print(f"Notification stats: {notifier.get_stats()}")  # Debug log
+    root.destroy()
 
-tk.Label(info_frame, text="Age:").grid(row=1, column=0, sticky="e", padx=5, pady=5)
-age_entry = tk.Entry(info_frame)
-age_entry.grid(row=1, column=1, padx=5, pady=5)
+def main():
+    """Build the GUI, load data and run the application."""
+    global root, patient_manager
+    global login_frame, signup_frame, patient_landing_frame, physician_landing_frame, physician_patient_frame
+    global username_entry, password_entry, signup_username_entry, signup_password_entry, user_type_var
+    global name_entry, age_entry, medical_history_text
+    
+    # Create the main window
+    root = tk.Tk()
+    root.title("Medication Tracker")
+
+    # Load all data at startup
+    load_users()
+    load_appointments()
+    load_medication_tracking()
+    patient_manager = PatientManagement(storage, write_behind, prescriptions=prescriptions)
+
+    # Register stores with the write-behind flusher and run flushes on the Tk thread
+    write_behind.register('users', write_users)
+    write_behind.register('medications', write_medications)
+    write_behind.register('appointments', write_appointments)
+    write_behind.register('medication_tracking', write_medication_tracking)
+    write_behind.register('patients', lambda: patient_manager.flush())
+    write_behind.schedule = lambda delay, callback: root.after(int(delay * 1000), callback)
+
+    # Older data files kept streak/history copies in users; tracking owns them now
+    for username in prescriptions.normalize():
+        save_users(username)
+
+    # Configure grid so frames expand to fill the window
+    root.rowconfigure(0, weight=1)
+    root.columnconfigure(0, weight=1)
+
+    # Create frames
+    login_frame = tk.Frame(root)
+    signup_frame = tk.Frame(root)
+    patient_landing_frame = tk.Frame(root)
+    physician_landing_frame = tk.Frame(root)
+    physician_patient_frame = tk.Frame(root)
+
+    for frame in (login_frame, signup_frame, patient_landing_frame, physician_landing_frame, physician_patient_frame):
+        frame.grid(row=0, column=0, sticky='nsew')
+
+    # -------------------
+    # Login Frame Setup
+    # -------------------
+
+    # Center frame container
+    login_container = tk.Frame(login_frame)
+    login_container.place(relx=0.5, rely=0.5, anchor="center")
+
+    tk.Label(login_container, text="Welcome! Please Login or Sign Up", font=('Helvetica', 24, 'bold')).grid(row=0, column=0, columnspan=2, pady=(0,20))
+
+    tk.Label(login_container, text="Username:", font=('Helvetica', 12)).grid(row=1, column=0, padx=10, pady=10, sticky="e")
+    username_entry = tk.Entry(login_container, font=('Helvetica', 12), width=20)
+    username_entry.grid(row=1, column=1, padx=10, pady=10)
+
+    tk.Label(login_container, text="Password:", font=('Helvetica', 12)).grid(row=2, column=0, padx=10, pady=10, sticky="e")
+    password_entry = tk.Entry(login_container, show="*", font=('Helvetica', 12), width=20)
+    password_entry.grid(row=2, column=1, padx=10, pady=10)
+
+    button_frame = tk.Frame(login_container)
+    button_frame.grid(row=3, column=0, columnspan=2, pady=20)
+
+    tk.Button(button_frame, text="Login", command=login, font=('Helvetica', 12), width=10).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Sign Up", command=go_to_signup, font=('Helvetica', 12), width=10).pack(side=tk.LEFT, padx=5)
+
+    # Configure login frame grid weights
+    login_frame.grid_rowconfigure(0, weight=1)
+    login_frame.grid_columnconfigure(0, weight=1)
+
+    # -------------------
+    # Sign-up Frame Setup
+    # -------------------
+    tk.Label(signup_frame, text="Sign Up", font=('Helvetica', 16)).grid(row=0, column=0, columnspan=2, pady=10)
+
+    tk.Label(signup_frame, text="Username:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
+    signup_username_entry = tk.Entry(signup_frame)
+    signup_username_entry.grid(row=1, column=1, padx=10, pady=10)
+
+    tk.Label(signup_frame, text="Password:").grid(row=2, column=0, padx=10, pady=10, sticky="e")
+    signup_password_entry = tk.Entry(signup_frame, show="*")
+    signup_password_entry.grid(row=2, column=1, padx=10, pady=10)
+
+    # Add user type selection
+    tk.Label(signup_frame, text="User Type:").grid(row=3, column=0, padx=10, pady=10, sticky="e")
+    user_type_var = tk.StringVar()
+    user_type_frame = tk.Frame(signup_frame)
+    user_type_frame.grid(row=3, column=1, padx=10, pady=10, sticky="w")
+    tk.Radiobutton(user_type_frame, text="Patient", variable=user_type_var, value="patient").pack(side="left")
+    tk.Radiobutton(user_type_frame, text="Physician", variable=user_type_var, value="physician").pack(side="left")
+
+    tk.Button(signup_frame, text="Sign Up", command=signup).grid(row=4, column=0, columnspan=2, pady=10)
+    tk.Button(signup_frame, text="Back to Login", command=go_to_login).grid(row=5, column=0, columnspan=2, pady=10)
+
+    # -------------------
+    # Patient Landing Page Frame Setup
+    # -------------------
+    tk.Label(patient_landing_frame, text="Patient Dashboard", font=('Helvetica', 16)).grid(row=0, column=0, columnspan=2, pady=20)
+
+    # Patient Information Section
+    info_frame = tk.LabelFrame(patient_landing_frame, text="Your Information", padx=10, pady=10)
+    info_frame.grid(row=1, column=0, columnspan=2, padx=20, pady=10, sticky="ew")
+
+    tk.Label(info_frame, text="Name:").grid(row=0, column=0, sticky="e", padx=5, pady=5)
+    name_entry = tk.Entry(info_frame)
+    name_entry.grid(row=0, column=1, padx=5, pady=5)
+
+    tk.Label(info_frame, text="Age:").grid(row=1, column=0, sticky="e", padx=5, pady=5)
+    age_entry = tk.Entry(info_frame)
+    age_entry.grid(row=1, column=1, padx=5, pady=5)
+
+    tk.Label(info_frame, text="Medical History:").grid(row=2, column=0, sticky="e", padx=5, pady=5)
+    medical_history_text = tk.Text(info_frame, height=4, width=30)
+    medical_history_text.grid(row=2, column=1, padx=5, pady=5)
+
+    # Buttons Section
+    button_frame = tk.Frame(patient_landing_frame)
+    button_frame.grid(row=2, column=0, columnspan=2, pady=20)
+
+    tk.Button(button_frame, text="View Appointments", width=15).pack(side="left", padx=5)
+    tk.Button(button_frame, text="View Prescriptions", width=15).pack(side="left", padx=5)
+    tk.Button(button_frame, text="View Test Results", width=15).pack(side="left", padx=5)
 
-tk.Label(info_frame, text="Medical History:").grid(row=2, column=0, sticky="e", padx=5, pady=5)
-medical_history_text = tk.Text(info_frame, height=4, width=30)
-medical_history_text.grid(row=2, column=1, padx=5, pady=5)
+    # Logout Button
+    tk.Button(patient_landing_frame, text="Logout", 
+              command=go_to_login
+              ).grid(row=3, column=0, columnspan=2, pady=20)
 
-# Buttons Section
-button_frame = tk.Frame(patient_landing_frame)
-button_frame.grid(row=2, column=0, columnspan=2, pady=20)
+    # -------------------
+    # Physician Landing Page Frame Setup
+    # -------------------
+    tk.Label(physician_landing_frame, text="Physician Dashboard", font=('Helvetica', 16)).grid(row=0, column=0, columnspan=2, pady=20)
 
-tk.Button(button_frame, text="View Appointments", width=15).pack(side="left", padx=5)
-tk.Button(button_frame, text="View Prescriptions", width=15).pack(side="left", padx=5)
-tk.Button(button_frame, text="View Test Results", width=15).pack(side="left", padx=5)
+    tk.Label(physician_landing_frame, text="You have successfully logged in as a physician!", font=('Helvetica', 12)).grid(row=1, column=0, columnspan=2, pady=10)
 
-# Logout Button
-tk.Button(patient_landing_frame, text="Logout", 
-          command=lambda: [show_frame(login_frame), username_entry.delete(0, tk.END), password_entry.delete(0, tk.END)]
-          ).grid(row=3, column=0, columnspan=2, pady=20)
+    tk.Button(physician_landing_frame, text="Logout", 
+              command=go_to_login
+              ).grid(row=2, column=0, columnspan=2, pady=20)
 
-# -------------------
-# Physician Landing Page Frame Setup
-# -------------------
-tk.Label(physician_landing_frame, text="Physician Dashboard", font=('Helvetica', 16)).grid(row=0, column=0, columnspan=2, pady=20)
+    # Bind the closing event
+    root.protocol("WM_DELETE_WINDOW", on_closing)
 
-tk.Label(physician_landing_frame, text="You have successfully logged in as a physician!", font=('Helvetica', 12)).grid(row=1, column=0, columnspan=2, pady=10)
+    # Show the login frame first
+    show_frame(login_frame)
 
-tk.Button(physician_landing_frame, text="Logout", 
-          command=lambda: [show_frame(login_frame), username_entry.delete(0, tk.END), password_entry.delete(0, tk.END)]
-          ).grid(row=2, column=0, columnspan=2, pady=20)
+    # Start polling for changes made by other instances
+    root.after(SHARED_REFRESH_MS, refresh_shared_data)
 
-# Function to handle application closing
-def on_closing():
-    """Save all data and close the application."""
-    save_users()
-    save_appointments()
-    save_medication_tracking()
-    root.destroy()
+    # Start delivering notifications
+    notifier.start()
 
-# Bind the closing event
-root.protocol("WM_DELETE_WINDOW", on_closing)
+    # Handle events posted by background threads on the Tk thread, in batches
+    ui_events.on_batch(refresh_after_dose_events)
+    ui_events.attach(root.after)
 
-# Show the login frame first
-show_frame(login_frame)
+    # Start the medication reminder scheduler in a separate thread, unless
+    # reminders for every patient come from the reminder service daemon
+    if REMINDERS_IN_APP:
+        reminder_scheduler.start()
+        # Doses missed by patients while logged out are caught up at login (catch_up_missed_doses);
+        # this also catches up on doses that expired while the app was closed
+        sweep_missed_doses()
 
-# Start the medication reminder checker in a separate thread
-import threading
-reminder_thread = threading.Thread(target=check_medication_reminders, daemon=True)
-reminder_thread.start()
+    # Start the GUI event loop
+    root.mainloop()
 
-# Start the GUI event loop
-root.mainloop()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+"""MediMinder core: data, adherence and reminder logic with no GUI imports.
+
+The Tk application (main-1.py) is built on top of these modules; they can
+also be imported on their own, e.g. for scripts and benchmarks.
+"""
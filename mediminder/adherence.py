@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+# A dose taken within this many minutes of its scheduled time counts as on time
+ON_TIME_MINUTES = 10
+
+
+@lru_cache(maxsize=2048)
+def minutes_of_day(time_text):
+    """Minutes since midnight of an HH:MM time"""
+    hours, minutes = time_text.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def dose_status(scheduled_time, taken_at):
+    """'on_time' or 'late' for a dose scheduled at HH:MM and taken at a datetime"""
+    taken_minute = taken_at.hour * 60 + taken_at.minute
+    difference = abs(taken_minute - minutes_of_day(scheduled_time))
+    # Around midnight, e.g. a 23:55 dose taken at 00:03
+    if min(difference, 24 * 60 - difference) <= ON_TIME_MINUTES:
+        return 'on_time'
+    return 'late'
+
+
+def status_on(tracking, username, med_name, date_text, dose=0):
+    """Recorded status of a day's first (or dose-th) dose of a medication, or None if nothing was recorded"""
+    med_tracking = tracking.get(username, {}).get(med_name)
+    if not med_tracking:
+        return None
+    if dose == 0:
+        entry = med_tracking['history'].find_date(date_text)
+        return entry['status'] if entry else None
+    entries = med_tracking['history'].entries_on(date_text)
+    return entries[dose]['status'] if dose < len(entries) else None
@@ -0,0 +1,173 @@
+from .adherence import ON_TIME_MINUTES
+from .clock import system_clock
+from .prescriptions import created_at
+from .schedule import compile_schedule
+
+TAKEN_STATUSES = ('on_time', 'late')
+
+
+class DoseSlot:
+    """One scheduled dose of the day and what has happened to it"""
+
+    __slots__ = ('med_name', 'when', 'dosage', 'status', 'taken_at')
+
+    def __init__(self, med_name, when, dosage):
+        self.med_name = med_name
+        self.when = when
+        self.dosage = dosage
+        # None until the dose is due; then pending, on_time, late or missed
+        self.status = None
+        self.taken_at = None
+
+    @property
+    def time_text(self):
+        return self.when.strftime('%H:%M')
+
+
+class DailyAgenda:
+    """A patient's doses for one day, in time order, with their current status.
+
+    apply() updates a slot in place for each dose event, following the
+    journal's rules: pending and missed events name the scheduled time; a
+    taken dose resolves the latest pending one, else the latest open or
+    missed one that was due when it was taken (never a later dose).
+    """
+
+    def __init__(self, username, day):
+        self.username = username
+        self.day = day
+        self.date_text = day.strftime('%Y-%m-%d')
+        self.slots = []
+        # med_name -> that medication's slots, in time order
+        self.by_med = {}
+
+    def add(self, slot):
+        self.slots.append(slot)
+        self.by_med.setdefault(slot.med_name, []).append(slot)
+
+    def sort(self):
+        self.slots.sort(key=lambda slot: (slot.when, slot.med_name))
+
+    def for_med(self, med_name):
+        return self.by_med.get(med_name, [])
+
+    def nearest(self, med_name, moment):
+        """The medication's slot closest to moment, or None if it has no dose today"""
+        slots = self.for_med(med_name)
+        if not slots:
+            return None
+        return min(slots, key=lambda slot: abs(slot.when - moment))
+
+    def _slot_at(self, med_name, time_text):
+        for slot in self.for_med(med_name):
+            if slot.time_text == time_text:
+                return slot
+        return None
+
+    def apply(self, med_name, event, time_text, status):
+        """Update the agenda for a dose event; returns the slot changed, if any"""
+        slots = self.for_med(med_name)
+        if not slots:
+            return None
+        if event == 'taken':
+            pending = [slot for slot in slots if slot.status == 'pending']
+            if pending:
+                slot = pending[-1]
+            else:
+                # Due by the take time (or early within the on-time window): a dose never
+                # fills a slot that is still to come
+                taken_minute = int(time_text[:2]) * 60 + int(time_text[3:5]) if time_text else 24 * 60
+                due = [slot for slot in slots
+                       if slot.when.hour * 60 + slot.when.minute <= taken_minute + ON_TIME_MINUTES]
+                open_slots = [slot for slot in due if slot.status is None]
+                missed = [slot for slot in due if slot.status == 'missed']
+                if open_slots:
+                    slot = open_slots[-1]
+                elif missed:
+                    slot = missed[-1]
+                else:
+                    return None
+            slot.status = status
+            slot.taken_at = time_text
+            return slot
+        slot = self._slot_at(med_name, time_text)
+        if slot is None:
+            return None
+        slot.status = 'missed' if event == 'missed' else 'pending'
+        return slot
+
+
+class AgendaBook:
+    """Today's agenda for each patient, built once and kept up to date.
+
+    An agenda is built from the compiled schedules and that day's history
+    the first time it is read each day, rebuilt when the patient's
+    prescriptions change, and updated in place by dose_event(), so
+    readers such as the medication list only walk today's doses.
+    """
+
+    def __init__(self, prescriptions, get_tracking, clock=None):
+        self.prescriptions = prescriptions
+        self.get_tracking = get_tracking
+        self.clock = clock or system_clock
+        # username -> DailyAgenda for today
+        self.agendas = {}
+        self.stats = {'builds': 0, 'updates': 0, 'hits': 0}
+
+    def build(self, username, day):
+        """Agenda of a patient for any day, from schedules and recorded history"""
+        agenda = DailyAgenda(username, day)
+        for med in self.prescriptions.for_user(username):
+            try:
+                schedule = compile_schedule(med)
+                doses = schedule.on(day)
+                created = created_at(med)
+            except (KeyError, TypeError, ValueError):
+                print(f"Invalid schedule for medication: {med.get('name', 'Unknown')}")
+                continue
+            dosage = schedule.dosage_on(day)
+            for when in doses:
+                # Doses scheduled before the prescription was added are not part of it
+                if created is None or when >= created:
+                    agenda.add(DoseSlot(med['name'], when, dosage))
+        agenda.sort()
+
+        # Replay what was already recorded that day (sealed months are read on demand)
+        user_tracking = self.get_tracking().get(username, {})
+        for med_name in agenda.by_med:
+            med_tracking = user_tracking.get(med_name)
+            if not med_tracking:
+                continue
+            for entry in med_tracking['history'].entries_on(agenda.date_text):
+                event = 'taken' if entry['status'] in TAKEN_STATUSES else entry['status']
+                agenda.apply(med_name, event, entry['time'], entry['status'])
+        self.stats['builds'] += 1
+        return agenda
+
+    def for_user(self, username, day=None):
+        """A patient's agenda for day (today by default); only today's is kept"""
+        today = self.clock.now().date()
+        day = day or today
+        if day != today:
+            return self.build(username, day)
+        agenda = self.agendas.get(username)
+        if agenda is None or agenda.day != today:
+            agenda = self.agendas[username] = self.build(username, today)
+        else:
+            self.stats['hits'] += 1
+        return agenda
+
+    def dose_event(self, user, med_name, event, date, time=None, status=None):
+        """Apply a recorded dose event to the user's agenda, if it is for today"""
+        agenda = self.agendas.get(user)
+        if agenda is not None and agenda.date_text == date:
+            if agenda.apply(med_name, event, time, status) is not None:
+                self.stats['updates'] += 1
+
+    def prescriptions_changed(self, username):
+        """Prescription listener: rebuild the user's agenda on next read"""
+        self.agendas.pop(username, None)
+
+    def clear(self):
+        """Forget every agenda (e.g. after doses recorded by another process were merged)"""
+        self.agendas.clear()
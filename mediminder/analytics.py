@@ -0,0 +1,298 @@
+"""Population adherence analytics over medication tracking, vectorised with NumPy.
+
+Every recorded dose, sealed months included, is loaded into parallel
+NumPy columns straight from the DoseHistory arrays, and adherence, status
+ratios, streaks and lateness are computed per prescription, patient,
+medication or cohort without a Python loop over doses.
+
+NumPy is only needed here and is imported on first use (pip install numpy).
+"""
+from datetime import date
+
+from .dose_history import STATUS_CODES, DoseHistory
+from .schedule import compile_schedule
+
+PENDING = STATUS_CODES['pending']
+ON_TIME = STATUS_CODES['on_time']
+LATE = STATUS_CODES['late']
+MISSED = STATUS_CODES['missed']
+
+GROUPINGS = ('prescription', 'patient', 'medication', 'cohort')
+# Padding for prescriptions with fewer daily doses than the widest schedule
+NO_DOSE = 10 ** 6
+AGE_BANDS = ((18, '0-17'), (40, '18-39'), (65, '40-64'))
+
+
+def age_band(dob_text, today=None):
+    """Cohort label for a YYYY-MM-DD date of birth ('Unknown' if it can't be read)"""
+    try:
+        born = date.fromisoformat(dob_text.strip())
+    except (AttributeError, ValueError):
+        return 'Unknown'
+    today = today or date.today()
+    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    for limit, label in AGE_BANDS:
+        if age < limit:
+            return label
+    return '65+'
+
+
+def _segments(history):
+    """Monthly segments of a history, oldest first (sealed months read from the archive)"""
+    if hasattr(history, 'months'):
+        segments = (history.segment(month) for month in history.months())
+        return [segment for segment in segments if segment is not None]
+    if isinstance(history, DoseHistory):
+        return [history]
+    return [DoseHistory(history)]
+
+
+class DoseEvents:
+    """Every recorded dose as NumPy columns, ordered by prescription, then day and minute.
+
+    keys[i] is the (username, med_name) of prescription i; `prescription`
+    holds that index for each dose. `scheduled` has each prescription's
+    daily dose minutes (padded with NO_DOSE) when prescriptions were given.
+    Per-prescription totals do not depend on the grouping, so summarize()
+    computes them once and keeps them in `totals`.
+    """
+
+    def __init__(self, keys, prescription, day, minute, status, scheduled=None):
+        self.keys = keys
+        self.prescription = prescription
+        self.day = day
+        self.minute = minute
+        self.status = status
+        self.scheduled = scheduled
+        self.totals = None
+
+    def __len__(self):
+        return len(self.status)
+
+
+def load_events(tracking, prescriptions=None):
+    """Load the whole dose history of every patient into a DoseEvents.
+
+    The columns are read from the DoseHistory arrays without copying each
+    dose. Pass the PrescriptionRepository to also compute lateness.
+    """
+    import numpy as np
+
+    keys, lengths, days, minutes, statuses = [], [], [], [], []
+    for username, user_tracking in tracking.items():
+        if not isinstance(user_tracking, dict):
+            continue  # reserved snapshot keys
+        for med_name, med_tracking in user_tracking.items():
+            count = 0
+            for segment in _segments(med_tracking['history']):
+                if not len(segment):
+                    continue
+                days.append(np.frombuffer(segment.days, dtype=segment.days.typecode))
+                minutes.append(np.frombuffer(segment.minutes, dtype=segment.minutes.typecode))
+                statuses.append(np.frombuffer(segment.statuses, dtype=segment.statuses.typecode))
+                count += len(segment)
+            if count:
+                keys.append((username, med_name))
+                lengths.append(count)
+
+    if not keys:
+        empty = np.zeros(0, dtype=np.int32)
+        return DoseEvents([], empty, empty, empty.astype(np.int16), empty.astype(np.int8))
+    prescription = np.repeat(np.arange(len(keys), dtype=np.int32), lengths)
+    day = np.concatenate(days).astype(np.int32, copy=False)
+    minute = np.concatenate(minutes).astype(np.int16, copy=False)
+    status = np.concatenate(statuses).astype(np.int8, copy=False)
+
+    # History is appended in time order, so sorting is rarely needed
+    moment = day.astype(np.int64) * 1440 + minute
+    same = prescription[1:] == prescription[:-1]
+    if np.any(same & (moment[1:] < moment[:-1])):
+        order = np.lexsort((minute, day, prescription))
+        day, minute, status = day[order], minute[order], status[order]
+
+    scheduled = _scheduled_minutes(keys, prescriptions) if prescriptions is not None else None
+    return DoseEvents(keys, prescription, day, minute, status, scheduled)
+
+
+def _scheduled_minutes(keys, prescriptions):
+    """Matrix of each prescription's daily dose minutes, padded with NO_DOSE"""
+    import numpy as np
+
+    today = date.today()
+    rows = []
+    for username, med_name in keys:
+        med = prescriptions.get(username, med_name)
+        try:
+            schedule = compile_schedule(med) if med else None
+        except (KeyError, TypeError, ValueError):
+            schedule = None
+        if schedule is None:
+            rows.append([])
+        elif schedule.phases[-1].interval is None:
+            rows.append(schedule.phases[-1].minutes)
+        else:
+            # Every-N-hours: the dose times of a recent day
+            rows.append([dose.hour * 60 + dose.minute for dose in schedule.on(today)])
+    width = max(1, max(len(row) for row in rows))
+    matrix = np.full((len(rows), width), NO_DOSE, dtype=np.int32)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+def _streaks(events, resolved):
+    """Longest and current run of on-time doses per prescription (a missed dose ends a run)"""
+    import numpy as np
+
+    count = len(events.keys)
+    if resolved.all():
+        prescription, status = events.prescription, events.status
+    else:
+        prescription, status = events.prescription[resolved], events.status[resolved]
+    longest = np.zeros(count, dtype=np.int64)
+    current = np.zeros(count, dtype=np.int64)
+    if not len(status):
+        return longest, current
+
+    on_time = (status == ON_TIME).astype(np.int32)
+    first = np.ones(len(status), dtype=bool)
+    np.not_equal(prescription[1:], prescription[:-1], out=first[1:])
+    reset = first | (status == MISSED)
+    total = np.cumsum(on_time, dtype=np.int32)
+    # Running on-time count since the latest reset at or before each dose
+    resets = np.flatnonzero(reset)
+    run = np.repeat(np.arange(len(resets)), np.diff(np.append(resets, len(status))))
+    streak = total - (total - on_time)[resets][run]
+
+    starts = np.flatnonzero(first)
+    longest[prescription[starts]] = np.maximum.reduceat(streak, starts)
+    ends = np.append(starts[1:], len(status)) - 1
+    current[prescription[ends]] = streak[ends]
+    return longest, current
+
+
+def _lateness(events):
+    """Minutes after the closest scheduled dose for each dose (NaN if unknown or not taken)"""
+    import numpy as np
+
+    lateness = np.full(len(events), np.nan)
+    if events.scheduled is None or not len(events):
+        return lateness
+    minute = events.minute.astype(np.int32)
+    # One pass per daily dose keeps memory at a few columns however many doses there are
+    closest = np.full(len(events), NO_DOSE, dtype=np.int32)
+    for column in events.scheduled.T:
+        difference = minute - column[events.prescription]
+        np.copyto(closest, difference, where=np.abs(difference) < np.abs(closest))
+    taken = ((events.status == ON_TIME) | (events.status == LATE)) & (np.abs(closest) < NO_DOSE // 2)
+    lateness[taken] = np.maximum(closest[taken], 0)
+    return lateness
+
+
+def _group_index(events, by, cohort_of):
+    """Group number of each prescription and the group labels"""
+    import numpy as np
+
+    if by == 'prescription':
+        return np.arange(len(events.keys)), list(events.keys)
+    if by == 'patient':
+        labels = [username for username, _ in events.keys]
+    elif by == 'medication':
+        labels = [med_name for _, med_name in events.keys]
+    elif by == 'cohort':
+        cohort_of = cohort_of or (lambda username: 'all')
+        cohorts = {}
+        labels = [cohorts.setdefault(username, cohort_of(username)) for username, _ in events.keys]
+    else:
+        raise ValueError(f"unknown grouping {by!r}, expected one of {GROUPINGS}")
+    names = sorted(set(labels))
+    number = {name: i for i, name in enumerate(names)}
+    return np.array([number[label] for label in labels], dtype=np.int64), names
+
+
+def _prescription_totals(events):
+    """Status counts, lateness sum and count, and streaks of each prescription"""
+    import numpy as np
+
+    count = len(events.keys)
+    statuses = max(STATUS_CODES.values()) + 1
+    counts = np.bincount(events.prescription.astype(np.int64) * statuses + events.status,
+                         minlength=count * statuses).reshape(count, statuses)
+    lateness = _lateness(events)
+    known = ~np.isnan(lateness)
+    longest, current = _streaks(events, events.status != PENDING)
+    return {
+        'counts': counts,
+        'lateness_sum': np.bincount(events.prescription[known], weights=lateness[known], minlength=count),
+        'lateness_count': np.bincount(events.prescription[known], minlength=count),
+        'longest': longest,
+        'current': current,
+    }
+
+
+def summarize(events, by='patient', cohort_of=None):
+    """Adherence metrics per group: {label: {metric: value}}.
+
+    by is 'prescription', 'patient', 'medication' or 'cohort' (cohort_of
+    maps a username to its cohort label, e.g. via age_band). Adherence is
+    taken / (taken + missed); pending doses are not counted. Streaks are
+    runs of on-time doses as in the medication streak: the group's
+    longest run, and the lowest current run among its prescriptions.
+    """
+    import numpy as np
+
+    rx_group, labels = _group_index(events, by, cohort_of)
+    groups = len(labels)
+    if not groups:
+        return {}
+    if events.totals is None:
+        events.totals = _prescription_totals(events)
+    totals = events.totals
+
+    def total(values):
+        return np.bincount(rx_group, weights=values, minlength=groups)
+
+    on_time = total(totals['counts'][:, ON_TIME]).astype(np.int64)
+    late = total(totals['counts'][:, LATE]).astype(np.int64)
+    missed = total(totals['counts'][:, MISSED]).astype(np.int64)
+    resolved = on_time + late + missed
+    lateness_sum = total(totals['lateness_sum'])
+    lateness_count = total(totals['lateness_count'])
+
+    longest = np.zeros(groups, dtype=np.int64)
+    np.maximum.at(longest, rx_group, totals['longest'])
+    current = np.full(groups, np.iinfo(np.int64).max)
+    np.minimum.at(current, rx_group, totals['current'])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        adherence = (on_time + late) / resolved
+        on_time_ratio = on_time / resolved
+        late_ratio = late / resolved
+        missed_ratio = missed / resolved
+        mean_lateness = lateness_sum / lateness_count
+
+    def number(value):
+        value = float(value)
+        return None if value != value else value  # NaN -> None
+
+    return {
+        label: {
+            'doses': int(resolved[i]),
+            'on_time': int(on_time[i]),
+            'late': int(late[i]),
+            'missed': int(missed[i]),
+            'adherence': number(adherence[i]),
+            'on_time_ratio': number(on_time_ratio[i]),
+            'late_ratio': number(late_ratio[i]),
+            'missed_ratio': number(missed_ratio[i]),
+            'longest_streak': int(longest[i]),
+            'current_streak': int(current[i]),
+            'mean_lateness': number(mean_lateness[i]),
+        }
+        for i, label in enumerate(labels)
+    }
+
+
+def adherence_report(tracking, prescriptions=None, by='patient', cohort_of=None):
+    """Load tracking and summarise it in one call (see summarize)"""
+    return summarize(load_events(tracking, prescriptions), by, cohort_of)
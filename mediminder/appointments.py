@@ -0,0 +1,57 @@
+import uuid
+
+
+class AppointmentBook:
+    """Appointments stored as {patient_id: {date: [appointments]}}"""
+
+    def __init__(self, get_appointments, on_change=None):
+        # Getter, because the GUI rebinds its appointments global on load
+        self.get_appointments = get_appointments
+        # Called after every edit so the appointments store gets saved
+        self.on_change = on_change
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def add(self, patient_id, date, time, description, duration="30"):
+        """Add an appointment for a patient; returns the new appointment"""
+        appointments = self.get_appointments()
+        day = appointments.setdefault(patient_id, {}).setdefault(date, [])
+
+        appointment = {
+            'time': time,
+            'description': description,
+            'duration': duration,
+            'id': str(uuid.uuid4())[:8]  # Generate unique ID for the appointment
+        }
+        day.append(appointment)
+
+        # Keep each day sorted by time
+        day.sort(key=lambda x: x['time'])
+        self._changed()
+        print(f"Added appointment for patient {patient_id} on {date}: {appointment}")  # Debug log
+        return appointment
+
+    def for_patient(self, patient_id, date=None):
+        """Appointments of a patient, optionally filtered by date"""
+        appointments = self.get_appointments()
+        if patient_id not in appointments:
+            return []
+        if date:
+            return appointments[patient_id].get(date, [])
+        return appointments[patient_id]
+
+    def delete(self, patient_id, date, appointment_id):
+        """Delete an appointment; returns True if the day existed"""
+        appointments = self.get_appointments()
+        if patient_id not in appointments or date not in appointments[patient_id]:
+            return False
+        appointments[patient_id][date] = [
+            apt for apt in appointments[patient_id][date]
+            if apt['id'] != appointment_id
+        ]
+        if not appointments[patient_id][date]:
+            del appointments[patient_id][date]
+        self._changed()
+        return True
@@ -0,0 +1,61 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """The real clock: wall-clock time and real sleeps"""
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, condition, timeout):
+        """Wait on a held threading.Condition for up to timeout seconds"""
+        return condition.wait(timeout)
+
+
+class SimulatedClock:
+    """A clock that only moves when told to, for tests and simulations.
+
+    sleep() and wait() return at once after moving the time forward, so
+    code written against the clock runs through hours of schedule in
+    milliseconds. Several threads may share one simulated clock.
+    """
+
+    def __init__(self, start=None):
+        self.current = start or datetime(2026, 1, 1)
+        self.lock = threading.Lock()
+
+    def now(self):
+        return self.current
+
+    def advance(self, delta):
+        """Move time forward by a timedelta or a number of seconds"""
+        if not isinstance(delta, timedelta):
+            delta = timedelta(seconds=delta)
+        with self.lock:
+            self.current += delta
+        return self.current
+
+    def advance_to(self, when):
+        """Move time forward to when (never backwards)"""
+        with self.lock:
+            if when > self.current:
+                self.current = when
+        return self.current
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def wait(self, condition, timeout):
+        # Release the condition briefly so other threads can notify or re-arm
+        condition.wait(0)
+        self.advance(timeout)
+        return False
+
+
+# Shared default so every component reads the same clock unless one is injected
+system_clock = SystemClock()
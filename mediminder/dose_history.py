@@ -0,0 +1,228 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from functools import lru_cache
+
+# Status codes stored in the status column
+STATUSES = ('pending', 'on_time', 'late', 'missed')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+# Minute-of-day value used when an entry has no time
+NO_TIME = -1
+
+
+@lru_cache(maxsize=4096)
+def date_to_ordinal(date_text):
+    return date.fromisoformat(date_text).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def ordinal_to_date(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+def time_to_minute(time_text):
+    if not time_text:
+        return NO_TIME
+    hours, minutes = time_text.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def minute_to_time(minute):
+    if minute == NO_TIME:
+        return None
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class HistoryEntry:
+    """Dict-like view of one row of a DoseHistory"""
+
+    __slots__ = ('history', 'position')
+
+    FIELDS = ('date', 'time', 'status')
+
+    def __init__(self, history, position):
+        self.history = history
+        self.position = position
+
+    def __getitem__(self, field):
+        history = self.history
+        if field == 'date':
+            return ordinal_to_date(history.days[self.position])
+        if field == 'time':
+            return minute_to_time(history.minutes[self.position])
+        if field == 'status':
+            return STATUSES[history.statuses[self.position]]
+        raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        history = self.history
+        if field == 'date':
+            history.days[self.position] = date_to_ordinal(value)
+            history.reindex()
+        elif field == 'time':
+            history.minutes[self.position] = time_to_minute(value)
+        elif field == 'status':
+            history.statuses[self.position] = STATUS_CODES[value]
+        else:
+            raise KeyError(field)
+
+    def __contains__(self, field):
+        return field in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, (HistoryEntry, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.FIELDS)
+
+    def items(self):
+        return [(field, self[field]) for field in self.FIELDS]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class DoseHistory:
+    """Column-oriented dose history.
+
+    Stores each entry as a day ordinal, a minute of day and a status code in
+    three typed arrays (7 bytes per dose instead of a dict with three
+    strings). Indexing and iteration yield HistoryEntry views, so existing
+    code using entry['date'] / entry['status'] keeps working.
+
+    Lookups by date use the day column itself as the index: entries are
+    appended in date order, so a day's entries are contiguous and found by
+    bisection, and the latest day (today, for the dashboard) is tracked on
+    append and found in O(1). If entries ever arrive out of date order, a
+    day -> positions dict is built once and kept up to date instead.
+    """
+
+    def __init__(self, entries=None):
+        self.days = array('i')
+        self.minutes = array('h')
+        self.statuses = array('b')
+        # Position of the first entry of the latest day, while days are in order
+        self.last_day_start = 0
+        self.day_index = None
+        if entries:
+            self.extend(entries)
+
+    def append(self, entry):
+        day = date_to_ordinal(entry['date'])
+        position = len(self.days)
+        if self.day_index is None and position and day != self.days[-1]:
+            if day > self.days[-1]:
+                self.last_day_start = position
+            else:
+                self._build_day_index()
+        self.days.append(day)
+        self.minutes.append(time_to_minute(entry.get('time')))
+        self.statuses.append(STATUS_CODES[entry['status']])
+        if self.day_index is not None:
+            self.day_index.setdefault(day, []).append(position)
+
+    def _build_day_index(self):
+        self.day_index = {}
+        for position, day in enumerate(self.days):
+            self.day_index.setdefault(day, []).append(position)
+
+    def reindex(self):
+        """Rebuild the date lookup after an entry's date was changed in place"""
+        self._build_day_index()
+
+    def positions_on(self, date_text):
+        """Positions of the entries on a YYYY-MM-DD date, in the order they were added"""
+        day = date_to_ordinal(date_text)
+        if self.day_index is not None:
+            return self.day_index.get(day, [])
+        if not self.days:
+            return range(0)
+        if day == self.days[-1]:
+            return range(self.last_day_start, len(self.days))
+        start = bisect_left(self.days, day)
+        return range(start, bisect_right(self.days, day, start))
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [HistoryEntry(self, i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('history index out of range')
+        return HistoryEntry(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield HistoryEntry(self, position)
+
+    def __reversed__(self):
+        for position in range(len(self) - 1, -1, -1):
+            yield HistoryEntry(self, position)
+
+    def __eq__(self, other):
+        if isinstance(other, DoseHistory):
+            return (self.days == other.days and self.minutes == other.minutes
+                    and self.statuses == other.statuses)
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"DoseHistory({self.to_list()!r})"
+
+    def to_list(self):
+        """Plain list of dicts, as stored in JSON"""
+        return [entry.to_dict() for entry in self]
+
+    def count_status(self, status):
+        """Number of entries with the given status"""
+        return self.statuses.count(STATUS_CODES[status])
+
+    def find_date(self, date_text):
+        """First entry on the given YYYY-MM-DD date, or None"""
+        positions = self.positions_on(date_text)
+        return HistoryEntry(self, positions[0]) if positions else None
+
+    def entries_on(self, date_text):
+        """Every entry on the given date (one per dose occurrence), oldest first"""
+        return [HistoryEntry(self, position) for position in self.positions_on(date_text)]
+
+    def find_dose(self, date_text, time_text):
+        """Entry of the dose at HH:MM on the given date, or None"""
+        minute = time_to_minute(time_text)
+        for position in self.positions_on(date_text):
+            if self.minutes[position] == minute:
+                return HistoryEntry(self, position)
+        return None
+
+
+def encode_history(value):
+    """json.dump default hook that serialises history objects as lists of dicts"""
+    if hasattr(value, 'to_list'):
+        return value.to_list()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
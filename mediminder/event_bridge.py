@@ -0,0 +1,77 @@
+from collections import deque
+
+# How often the consumer thread drains posted events
+DRAIN_INTERVAL_MS = 100
+
+
+class EventBridge:
+    """Hands events from background threads to one consumer thread.
+
+    Worker threads only post(); handlers run on the thread that calls
+    drain() (the Tk mainloop, via attach(root.after)), so that thread is
+    the single writer of shared state and the only one touching widgets.
+    After each drained batch the batch callbacks run once, so a burst of
+    events causes one UI refresh.
+    """
+
+    def __init__(self, max_batch=1000):
+        self.max_batch = max_batch
+        # deque.append / popleft are atomic, so no lock is needed
+        self.events = deque()
+        self.handlers = {}
+        self.batch_callbacks = []
+        self.schedule = None
+        self.interval_ms = DRAIN_INTERVAL_MS
+        self.stats = {'posted': 0, 'handled': 0, 'failed': 0, 'batches': 0, 'largest_batch': 0}
+
+    def subscribe(self, kind, handler):
+        """Run handler(*args) on the consumer thread for each posted event of this kind"""
+        self.handlers.setdefault(kind, []).append(handler)
+
+    def on_batch(self, callback):
+        """Run callback(kinds) once after each drained batch, with the set of event kinds"""
+        self.batch_callbacks.append(callback)
+
+    def post(self, kind, *args):
+        """Queue an event (safe to call from any thread)"""
+        self.events.append((kind, args))
+        self.stats['posted'] += 1
+
+    def drain(self):
+        """Handle up to max_batch queued events; returns how many were handled"""
+        kinds = set()
+        count = 0
+        while count < self.max_batch:
+            try:
+                kind, args = self.events.popleft()
+            except IndexError:
+                break
+            count += 1
+            kinds.add(kind)
+            for handler in self.handlers.get(kind, []):
+                try:
+                    handler(*args)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    print(f"Error handling {kind} event: {str(e)}")
+        if count:
+            self.stats['handled'] += count
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], count)
+            for callback in self.batch_callbacks:
+                try:
+                    callback(kinds)
+                except Exception as e:
+                    print(f"Error refreshing after {sorted(kinds)} events: {str(e)}")
+        return count
+
+    def attach(self, schedule, interval_ms=DRAIN_INTERVAL_MS):
+        """Drain periodically using schedule(delay_ms, callback), e.g. root.after"""
+        self.schedule = schedule
+        self.interval_ms = interval_ms
+        self.schedule(self.interval_ms, self._pump)
+
+    def _pump(self):
+        self.drain()
+        # Come back sooner if a burst is still waiting
+        self.schedule(0 if self.events else self.interval_ms, self._pump)
@@ -0,0 +1,263 @@
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import date
+
+from .dose_history import DoseHistory
+
+
+def month_of(date_text):
+    """'YYYY-MM' month key of a YYYY-MM-DD date"""
+    return date_text[:7]
+
+
+def previous_month(month):
+    year, month_number = int(month[:4]), int(month[5:7])
+    if month_number == 1:
+        return f"{year - 1:04d}-12"
+    return f"{year:04d}-{month_number - 1:02d}"
+
+
+def months_between(start_month, end_month):
+    """All month keys from start_month to end_month inclusive"""
+    months = []
+    year, month_number = int(start_month[:4]), int(start_month[5:7])
+    while f"{year:04d}-{month_number:02d}" <= end_month:
+        months.append(f"{year:04d}-{month_number:02d}")
+        month_number += 1
+        if month_number > 12:
+            year, month_number = year + 1, 1
+    return months
+
+
+class HistoryArchive:
+    """Sealed monthly history segments stored as gzip-compressed JSON files"""
+
+    def __init__(self, root='history_archive'):
+        self.root = root
+
+    def _safe(self, name):
+        return ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+
+    def _directory_name(self, name):
+        # Readable prefix plus a hash of the exact name, so names that only
+        # differ in punctuation or case never share a directory
+        return f"{self._safe(name)}-{hashlib.sha1(name.encode()).hexdigest()[:10]}"
+
+    def directory(self, key):
+        user, med_name = key
+        return os.path.join(self.root, self._directory_name(user), self._directory_name(med_name))
+
+    def path(self, key, month):
+        return os.path.join(self.directory(key), month + '.json.gz')
+
+    def months(self, key):
+        """Sealed month keys of one history, oldest first"""
+        try:
+            names = os.listdir(self.directory(key))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json.gz')] for name in names if name.endswith('.json.gz'))
+
+    def has(self, key, month):
+        return os.path.exists(self.path(key, month))
+
+    def read(self, key, month):
+        """Load a sealed month, or None if it was never archived"""
+        try:
+            with gzip.open(self.path(key, month), 'rt') as file:
+                return DoseHistory(json.load(file))
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, month, history):
+        path = self.path(key, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wt') as file:
+            json.dump(history.to_list(), file)
+        os.replace(temp_path, path)
+
+
+class SegmentedHistory:
+    """Dose history split into monthly DoseHistory segments.
+
+    Only unsealed (hot) months are kept in memory and written to the
+    tracking snapshot. Sealed months live in the HistoryArchive and are
+    read on demand by find_date() / entries_between(), with a small cache.
+    Iteration, len() and indexing cover the hot months only.
+    """
+
+    COLD_CACHE_SIZE = 3
+
+    def __init__(self, entries=None, archive=None, key=None):
+        self.archive = archive
+        self.key = key
+        self.hot = {}
+        self.cold = OrderedDict()
+        if entries:
+            for entry in entries:
+                self._hot_segment(month_of(entry['date'])).append(entry)
+
+    def _hot_segment(self, month):
+        segment = self.hot.get(month)
+        if segment is None:
+            segment = self.hot[month] = DoseHistory()
+        return segment
+
+    def _is_sealed(self, month):
+        return month not in self.hot and self.archive is not None and self.archive.has(self.key, month)
+
+    def _cold_segment(self, month):
+        """Load a sealed month from the archive, keeping a few recent ones cached"""
+        if month in self.cold:
+            self.cold.move_to_end(month)
+            return self.cold[month]
+        segment = self.archive.read(self.key, month)
+        if segment is None:
+            return None
+        self.cold[month] = segment
+        while len(self.cold) > self.COLD_CACHE_SIZE:
+            self.cold.popitem(last=False)
+        return segment
+
+    def segment(self, month):
+        """Segment for a month, hot or loaded from the archive, or None"""
+        if month in self.hot:
+            return self.hot[month]
+        if self._is_sealed(month):
+            return self._cold_segment(month)
+        return None
+
+    def append(self, entry):
+        month = month_of(entry['date'])
+        if self._is_sealed(month):
+            # Late write into a sealed month: update its archive file
+            segment = self._cold_segment(month)
+            segment.append(entry)
+            self.archive.write(self.key, month, segment)
+        else:
+            self._hot_segment(month).append(entry)
+
+    def entry_changed(self, date_text):
+        """Write a sealed month back to the archive after one of its entries was edited in place"""
+        month = month_of(date_text)
+        if month not in self.hot and month in self.cold:
+            self.archive.write(self.key, month, self.cold[month])
+
+    def _ordered_hot(self):
+        return [self.hot[month] for month in sorted(self.hot)]
+
+    def months(self):
+        """Every month with history, hot or sealed, oldest first"""
+        months = set(self.hot)
+        if self.archive is not None and self.key is not None:
+            months.update(self.archive.months(self.key))
+        return sorted(months)
+
+    def hot_segments(self):
+        """The in-memory monthly DoseHistory segments, oldest first"""
+        return self._ordered_hot()
+
+    def __iter__(self):
+        for segment in self._ordered_hot():
+            yield from segment
+
+    def __reversed__(self):
+        for segment in reversed(self._ordered_hot()):
+            yield from reversed(segment)
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.hot.values())
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return list(self)[position]
+        if position < 0:
+            position += len(self)
+        for segment in self._ordered_hot():
+            if position < len(segment):
+                return segment[position]
+            position -= len(segment)
+        raise IndexError('history index out of range')
+
+    def __eq__(self, other):
+        if isinstance(other, (SegmentedHistory, DoseHistory, list)):
+            other_list = other if isinstance(other, list) else other.to_list()
+            return self.to_list() == other_list
+        return NotImplemented
+
+    def __repr__(self):
+        return f"SegmentedHistory({self.to_list()!r})"
+
+    def to_list(self):
+        """Hot entries as a list of dicts, as stored in the tracking snapshot"""
+        return [entry for segment in self._ordered_hot() for entry in segment.to_list()]
+
+    def count_status(self, status):
+        return sum(segment.count_status(status) for segment in self.hot.values())
+
+    def find_date(self, date_text):
+        """First entry on the given date, loading a sealed month if needed"""
+        segment = self.segment(month_of(date_text))
+        if segment is None:
+            return None
+        return segment.find_date(date_text)
+
+    def entries_on(self, date_text):
+        """Every entry on the given date, using the segment's date index"""
+        segment = self.segment(month_of(date_text))
+        if segment is None:
+            return []
+        return segment.entries_on(date_text)
+
+    def entries_between(self, start_date, end_date):
+        """Entries with start_date <= date <= end_date, across hot and sealed months"""
+        entries = []
+        for month in months_between(month_of(start_date), month_of(end_date)):
+            segment = self.segment(month)
+            if segment is None:
+                continue
+            entries.extend(entry for entry in segment if start_date <= entry['date'] <= end_date)
+        return entries
+
+    def seal_before(self, cutoff_month):
+        """Archive and drop every hot month older than cutoff_month"""
+        sealed = []
+        for month in sorted(self.hot):
+            if month >= cutoff_month:
+                break
+            self.archive.write(self.key, month, self.hot[month])
+            del self.hot[month]
+            sealed.append(month)
+        return sealed
+
+
+def hot_cutoff(today=None):
+    """Oldest month kept hot: the previous calendar month"""
+    today = today or date.today()
+    return previous_month(today.strftime('%Y-%m'))
+
+
+def segment_tracking(tracking, archive):
+    """Convert every history in a medication_tracking dict to SegmentedHistory"""
+    for user, user_tracking in tracking.items():
+        for med_name, med_tracking in user_tracking.items():
+            history = med_tracking.get('history', [])
+            if not isinstance(history, SegmentedHistory):
+                med_tracking['history'] = SegmentedHistory(history, archive, (user, med_name))
+    return tracking
+
+
+def seal_tracking(tracking, today=None):
+    """Seal months older than the previous month for every history; returns count"""
+    cutoff = hot_cutoff(today)
+    sealed = 0
+    for user_tracking in tracking.values():
+        for med_tracking in user_tracking.values():
+            history = med_tracking['history']
+            if isinstance(history, SegmentedHistory) and history.archive is not None:
+                sealed += len(history.seal_before(cutoff))
+    return sealed
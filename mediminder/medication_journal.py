@@ -0,0 +1,328 @@
+import json
+import os
+from datetime import datetime, timedelta
+from .adherence import dose_status
+from .dose_history import encode_history
+from .history_segments import HistoryArchive, SegmentedHistory, seal_tracking, segment_tracking
+from .shared_files import FileLock, atomic_write_json, file_signature
+from .streaks import next_streak
+from .sweeper import MISSED_AFTER, PendingIndex, dose_deadline
+
+# Reserved snapshot key holding the sequence number of the last journal
+# event folded into the snapshot
+SNAPSHOT_SEQ_KEY = '__journal_seq__'
+# Reserved snapshot key holding the open (pending) doses, see PendingIndex
+SNAPSHOT_PENDING_KEY = '__pending__'
+# Reserved snapshot key: scheduled doses up to this time were checked for misses
+SNAPSHOT_SWEPT_KEY = '__swept_until__'
+
+
+def _latest_pending(history, date, time=None):
+    """Latest pending entry on a date (with the given scheduled time, if any)"""
+    for entry in reversed(history.entries_on(date)):
+        if entry['status'] == 'pending' and (time is None or entry['time'] == time):
+            return entry
+    return None
+
+
+def _carried_over(history, event, pending):
+    """Previous date and pending entry of a dose taken after midnight but before its deadline, or None"""
+    if not event['time']:
+        return None
+    if pending is not None:
+        if pending.has(event['user'], event['med'], event['date']):
+            return None
+    elif _latest_pending(history, event['date']) is not None:
+        return None
+    taken = datetime.fromisoformat(f"{event['date']}T{event['time']}")
+    previous = (taken - timedelta(days=1)).strftime('%Y-%m-%d')
+    if pending is not None and not pending.has(event['user'], event['med'], previous):
+        return None
+    entry = _latest_pending(history, previous)
+    grace = pending.grace if pending is not None else MISSED_AFTER
+    if entry is None or dose_deadline(previous, entry['time'], grace) < taken:
+        return None
+    return previous, entry
+
+
+def _entry_changed(history, date):
+    # Entries of a sealed month are edited in a cached copy; persist it
+    if isinstance(history, SegmentedHistory):
+        history.entry_changed(date)
+
+
+def apply_event(tracking, event, archive=None, pending=None):
+    """Apply a single dose event to the medication tracking dictionary.
+
+    A taken dose resolves that day's pending entry (or is appended if none
+    was pending); a missed event flips the pending entry to missed, or
+    appends a missed entry if its status is 'missed' (a dose that was
+    never reminded). A dose taken after midnight but before the deadline of
+    the previous day's pending dose resolves that dose: the event's date,
+    time and status are rewritten to match it. When a
+    PendingIndex is given it is kept in step, and history is only searched
+    if the index says a dose is pending. The streak is updated from the
+    event itself (see next_streak); the value stored in older journal
+    entries is not trusted.
+    """
+    user_tracking = tracking.setdefault(event['user'], {})
+    med_tracking = user_tracking.get(event['med'])
+    if med_tracking is None:
+        med_tracking = user_tracking[event['med']] = {
+            'streak': 0,
+            'history': SegmentedHistory(archive=archive, key=(event['user'], event['med']))
+        }
+    history = med_tracking['history']
+    if event['event'] == 'taken':
+        carried = _carried_over(history, event, pending)
+        if carried is not None:
+            # A 23:50 dose taken at 00:05 belongs to the day it was scheduled on
+            previous, entry = carried
+            taken = datetime.fromisoformat(f"{event['date']}T{event['time']}")
+            event['date'] = previous
+            event['time'] = entry['time']
+            event['status'] = dose_status(entry['time'], taken)
+    key = (event['user'], event['med'], event['date'])
+
+    if event['event'] == 'missed':
+        # Flip the pending entry for that day (and time, if given) to missed
+        entry = None
+        if pending is None or pending.resolve(*key, event['time']):
+            entry = _latest_pending(history, event['date'], event['time'])
+        if entry is not None:
+            entry['status'] = 'missed'
+            _entry_changed(history, event['date'])
+        elif event['status'] == 'missed':
+            # A dose that was never reminded, found by the sweeper's catch-up
+            history.append({'date': event['date'], 'time': event['time'], 'status': 'missed'})
+    elif event['event'] == 'taken' and (pending is None or pending.has(*key)):
+        entry = _latest_pending(history, event['date'])
+        if entry is not None:
+            if pending is not None:
+                pending.resolve(*key, entry['time'])
+            entry['time'] = event['time']
+            entry['status'] = event['status']
+            _entry_changed(history, event['date'])
+        else:
+            history.append({'date': event['date'], 'time': event['time'], 'status': event['status']})
+    elif event['event'] == 'pending' and pending is not None:
+        # A dose that is already pending keeps its one history entry
+        if pending.add(*key, event['time']):
+            history.append({'date': event['date'], 'time': event['time'], 'status': event['status']})
+    else:
+        history.append({
+            'date': event['date'],
+            'time': event['time'],
+            'status': event['status']
+        })
+
+    med_tracking['streak'] = next_streak(med_tracking['streak'], event['event'], event['status'])
+    return med_tracking['streak']
+
+
+class MedicationJournal:
+    """Append-only dose event journal with periodic snapshot compaction.
+
+    History older than the previous month is sealed into the history archive
+    on compaction, so the snapshot only holds the hot months. Several
+    processes may share the files: every append and compaction holds a file
+    lock and first applies events other processes recorded since.
+    """
+
+    def __init__(self, snapshot_file='medication_tracking.json',
+                 journal_file='medication_tracking.journal', compact_every=500,
+                 archive_dir='history_archive'):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.archive = HistoryArchive(archive_dir)
+        self.compact_every = compact_every
+        self.seq = 0
+        self.events_since_compaction = 0
+        # Bytes of the journal already applied, and the snapshot they follow
+        self.offset = 0
+        self.snapshot_signature = None
+        # Open doses by deadline, for the missed-dose sweeper
+        self.pending = PendingIndex()
+        # username -> time up to which that patient's scheduled doses were
+        # checked for misses (see MissedDoseSweeper.catch_up)
+        self.swept_until = {}
+
+    def _read_snapshot(self):
+        tracking = {}
+        try:
+            with open(self.snapshot_file, 'r') as file:
+                tracking = json.load(file)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            print("Error reading medication tracking snapshot. Starting from journal only.")
+
+        self.snapshot_signature = file_signature(self.snapshot_file)
+        self.seq = tracking.pop(SNAPSHOT_SEQ_KEY, 0)
+        pending_rows = tracking.pop(SNAPSHOT_PENDING_KEY, None)
+        swept_until = tracking.pop(SNAPSHOT_SWEPT_KEY, None)
+        if isinstance(swept_until, dict):
+            for username, text in swept_until.items():
+                when = datetime.fromisoformat(text)
+                self.swept_until[username] = max(when, self.swept_until.get(username, when))
+        self.offset = 0
+        self.events_since_compaction = 0
+        tracking = segment_tracking(tracking, self.archive)
+        if pending_rows is None:
+            # Snapshot from before the pending index: scan history once
+            self.pending = PendingIndex.from_tracking(tracking)
+        else:
+            self.pending = PendingIndex.from_list(pending_rows)
+        return tracking
+
+    def _replay(self, tracking):
+        """Apply journal events appended after our offset; returns how many"""
+        try:
+            file = open(self.journal_file, 'rb')
+        except FileNotFoundError:
+            return 0
+        applied = 0
+        with file:
+            file.seek(self.offset)
+            for line in file:
+                self.offset += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn line from an interrupted append
+                    print("Skipping corrupt medication journal entry")
+                    continue
+                # Events already folded into the snapshot are skipped
+                if event['seq'] <= self.seq:
+                    continue
+                apply_event(tracking, event, self.archive, self.pending)
+                self.seq = event['seq']
+                self.events_since_compaction += 1
+                applied += 1
+        return applied
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            return 0
+
+    def _catch_up(self, tracking):
+        """Apply changes made by other processes (caller holds the lock)"""
+        if (file_signature(self.snapshot_file) != self.snapshot_signature
+                or self._journal_size() < self.offset):
+            # Another process compacted: reload everything in place
+            fresh = self._read_snapshot()
+            self._replay(fresh)
+            tracking.clear()
+            tracking.update(fresh)
+            return True
+        return self._replay(tracking) > 0
+
+    def load(self):
+        """Load the snapshot and replay any journal events written after it"""
+        with FileLock(self.journal_file):
+            tracking = self._read_snapshot()
+            self._replay(tracking)
+
+        # Months that went cold while the app was closed are sealed now
+        if seal_tracking(tracking):
+            self.compact(tracking)
+        return tracking
+
+    def refresh(self, tracking):
+        """Apply dose events recorded by other processes; True if any"""
+        if (file_signature(self.snapshot_file) == self.snapshot_signature
+                and self._journal_size() == self.offset):
+            return False
+        with FileLock(self.journal_file):
+            return self._catch_up(tracking)
+
+    def new_history(self, user, med_name):
+        """Empty history for a new medication, backed by the journal's archive"""
+        return SegmentedHistory(archive=self.archive, key=(user, med_name))
+
+    def record(self, tracking, user, med_name, event, date, time=None, status=None):
+        """Apply a taken/pending/missed event and append it to the journal.
+
+        Returns the journal entry, or None for a missed event whose dose is
+        no longer pending.
+        """
+        return self.record_many(tracking, [(user, med_name, event, date, time, status)])[0]
+
+    def _applies(self, tracking, user, med_name, event, date, time, status):
+        """False for a missed event another process already took care of"""
+        if event != 'missed':
+            return True
+        if status == 'missed':
+            # Never reminded: skip it if anything was recorded for that dose meanwhile
+            history = tracking.get(user, {}).get(med_name, {}).get('history')
+            return history is None or all(entry['time'] != time for entry in history.entries_on(date))
+        return self.pending.has(user, med_name, date)
+
+    def record_many(self, tracking, events):
+        """Apply several (user, med, event, date, time, status) events with one journal append.
+
+        The events share one lock and one fsync, e.g. every dose a sweep
+        marks missed. Returns their journal entries, None where record()
+        would have returned None.
+        """
+        entries = []
+        lines = []
+        with FileLock(self.journal_file):
+            self._catch_up(tracking)
+
+            for user, med_name, event, date, time, status in events:
+                if not self._applies(tracking, user, med_name, event, date, time, status):
+                    entries.append(None)
+                    continue
+                self.seq += 1
+                entry = {
+                    'seq': self.seq,
+                    'user': user,
+                    'med': med_name,
+                    'event': event,
+                    'date': date,
+                    'time': time,
+                    'status': status
+                }
+                # The streak after the event is kept in the entry for readers of the journal
+                entry['streak'] = apply_event(tracking, entry, self.archive, self.pending)
+                entries.append(entry)
+                lines.append(json.dumps(entry) + '\n')
+
+            if lines:
+                data = ''.join(lines).encode()
+                with open(self.journal_file, 'ab') as file:
+                    file.write(data)
+                    file.flush()
+                    os.fsync(file.fileno())
+                self.offset += len(data)
+                self.events_since_compaction += len(lines)
+            needs_compaction = self.events_since_compaction >= self.compact_every
+
+        if needs_compaction:
+            self.compact(tracking)
+        return entries
+
+    def compact(self, tracking):
+        """Seal cold months, write a snapshot of the hot ones and truncate the journal"""
+        with FileLock(self.journal_file):
+            self._catch_up(tracking)
+
+            # Sealed months are archived before the snapshot that drops them
+            seal_tracking(tracking)
+            snapshot = dict(tracking)
+            snapshot[SNAPSHOT_SEQ_KEY] = self.seq
+            snapshot[SNAPSHOT_PENDING_KEY] = self.pending.to_list()
+            if self.swept_until:
+                snapshot[SNAPSHOT_SWEPT_KEY] = {username: when.isoformat()
+                                                for username, when in self.swept_until.items()}
+            atomic_write_json(self.snapshot_file, snapshot, default=encode_history)
+            self.snapshot_signature = file_signature(self.snapshot_file)
+
+            # Safe to drop the journal now; a crash before this point is
+            # harmless because replay skips events covered by the snapshot
+            open(self.journal_file, 'w').close()
+            self.offset = 0
+            self.events_since_compaction = 0
@@ -0,0 +1,63 @@
+import threading
+from collections import deque
+
+
+class LagStats:
+    """Latency samples in seconds (e.g. reminder dispatch lag) with mean and percentiles"""
+
+    def __init__(self, max_samples=100000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Percentiles are taken over the most recent samples
+        self.samples = deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+
+    def add(self, lag):
+        with self.lock:
+            self.count += 1
+            self.total += lag
+            self.max = max(self.max, lag)
+            self.samples.append(lag)
+
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count, total, worst = self.count, self.total, self.max
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+        return {
+            'count': count,
+            'mean': total / count if count else 0.0,
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': worst
+        }
+
+
+class BurstCounter:
+    """Events per fixed window (one second by default) and the largest window seen"""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.bucket = None
+        self.current = 0
+        self.peak = 0
+        self.total = 0
+
+    def add(self, now, count=1):
+        bucket = int(now // self.window)
+        if bucket != self.bucket:
+            self.bucket = bucket
+            self.current = 0
+        self.current += count
+        self.total += count
+        self.peak = max(self.peak, self.current)
+
+    def summary(self):
+        return {'total': self.total, 'peak_per_window': self.peak, 'window': self.window}
@@ -0,0 +1,372 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from .metrics import BurstCounter, LagStats
+
+# Lower values are delivered first when notifications back up behind the rate limit
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+# Notifications of one group for one user submitted within this many seconds are sent as one
+COALESCE_SECONDS = 2.0
+
+
+def desktop_notify(title, message, timeout=10):
+    """Show a desktop notification; plyer is imported on first use"""
+    from plyer import notification
+    notification.notify(title=title, message=message, app_icon=None, timeout=timeout)
+
+
+class Notification:
+    __slots__ = ('title', 'message', 'timeout', 'username', 'priority', 'group', 'count', 'created')
+
+    def __init__(self, title, message, timeout=10, username=None, priority=PRIORITY_NORMAL, group=None):
+        self.title = title
+        self.message = message
+        self.timeout = timeout
+        self.username = username
+        self.priority = priority
+        # Notifications with a group (e.g. 'dose_due') may be coalesced per user
+        self.group = group
+        # How many submitted notifications this one stands for
+        self.count = 1
+        self.created = time.monotonic()
+
+    def to_dict(self):
+        return {'title': self.title, 'message': self.message, 'username': self.username}
+
+
+def merge_notifications(notifications):
+    """One notification listing the messages of several (same user and group)"""
+    first = notifications[0]
+    if len(notifications) == 1:
+        return first
+    merged = Notification(f"{first.title} ({len(notifications)})",
+                          "\n".join(notification.message for notification in notifications),
+                          max(notification.timeout for notification in notifications),
+                          first.username,
+                          min(notification.priority for notification in notifications),
+                          first.group)
+    merged.count = sum(notification.count for notification in notifications)
+    merged.created = min(notification.created for notification in notifications)
+    return merged
+
+
+class TokenBucket:
+    """Allows `rate` notifications per second on average, in bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waits = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        self._refill()
+        if self.tokens < 1:
+            self.waits += 1
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+
+class Sink:
+    """Where notifications are delivered.
+
+    Subclasses implement send(); a send that raises or takes longer than
+    `timeout` seconds is retried up to `retries` times. `concurrency` sends
+    run at once and at most `queue_size` notifications wait for this sink.
+    """
+
+    name = 'sink'
+
+    def __init__(self, concurrency=1, timeout=5.0, retries=2, queue_size=1000):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.queue_size = queue_size
+
+    async def send(self, notification):
+        raise NotImplementedError
+
+
+class DesktopSink(Sink):
+    """Desktop notifications via plyer, run in a worker thread"""
+
+    name = 'desktop'
+
+    async def send(self, notification):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, desktop_notify, notification.title,
+                                   notification.message, notification.timeout)
+
+
+class FileSink(Sink):
+    """Appends notifications as JSON lines to a file (e.g. for another process to pick up)"""
+
+    name = 'file'
+
+    def __init__(self, path, **options):
+        super().__init__(**options)
+        self.path = path
+
+    def _append(self, line):
+        with open(self.path, 'a') as file:
+            file.write(line + '\n')
+
+    async def send(self, notification):
+        record = dict(notification.to_dict(), time=time.strftime('%Y-%m-%d %H:%M:%S'))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._append, json.dumps(record))
+
+
+class MemorySink(Sink):
+    """Keeps delivered notifications in memory; can be made slow or failing for tests"""
+
+    name = 'memory'
+
+    def __init__(self, delay=0.0, fail_every=0, **options):
+        super().__init__(**options)
+        self.delay = delay
+        self.fail_every = fail_every
+        self.attempts = 0
+        self.delivered = []
+
+    async def send(self, notification):
+        self.attempts += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_every and self.attempts % self.fail_every == 0:
+            raise RuntimeError('simulated sink failure')
+        self.delivered.append(notification)
+
+
+def default_sinks():
+    """Desktop notifications, plus a JSON-lines log if MEDIMINDER_NOTIFY_LOG is set"""
+    sinks = [DesktopSink()]
+    log_path = os.environ.get('MEDIMINDER_NOTIFY_LOG')
+    if log_path:
+        sinks.append(FileSink(log_path))
+    return sinks
+
+
+def default_rate():
+    """Notifications per second allowed by MEDIMINDER_NOTIFY_RATE, or None for no limit"""
+    rate = os.environ.get('MEDIMINDER_NOTIFY_RATE')
+    return float(rate) if rate else None
+
+
+class NotificationDispatcher:
+    """Delivers notifications to every sink from an asyncio loop in its own thread.
+
+    asyncio costs more to import than the rest of the package, so only the
+    app and the reminder service import this module, when they start.
+
+    submit() never blocks: it hands the notification to the loop, which
+    drops it if the inbound queue is full. Each sink has its own bounded
+    queue and workers, so a slow or failing sink only delays itself.
+
+    Grouped notifications (e.g. reminders) for the same user within
+    coalesce_window seconds are merged into one. With a rate, a global
+    token bucket limits how many notifications per second reach the
+    sinks; while they wait, higher-priority notifications go first.
+    Burst statistics show the peak per second before and after merging.
+    """
+
+    def __init__(self, sinks, queue_size=1000, retry_delay=0.5, coalesce_window=COALESCE_SECONDS,
+                 rate=None, burst=None):
+        self.sinks = sinks
+        self.queue_size = queue_size
+        self.retry_delay = retry_delay
+        self.coalesce_window = coalesce_window
+        self.limiter = TokenBucket(rate, burst) if rate else None
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        # Set if the loop failed to start; raised again by start()
+        self.error = None
+        # (username, group) -> notifications waiting to be merged
+        self.groups = {}
+        self.order = itertools.count()
+        # Updated from caller threads (submit) and the loop thread
+        self.stats = {'submitted': 0, 'dropped': 0, 'coalesced': 0, 'largest_group': 0}
+        self.stats_lock = threading.Lock()
+        self.bursts = {'submitted': BurstCounter(), 'coalesced': BurstCounter(), 'sent': BurstCounter()}
+        self.sink_stats = {sink.name: {'sent': 0, 'failed': 0, 'retried': 0, 'timeouts': 0,
+                                       'dropped': 0, 'latency': LagStats(), 'started': None,
+                                       'last_sent': None}
+                           for sink in sinks}
+        self.errors = deque(maxlen=20)
+
+    def submit(self, title, message, timeout=10, username=None, priority=PRIORITY_NORMAL, group=None):
+        """Queue a notification for every sink (thread-safe, non-blocking)"""
+        self._count('submitted')
+        if self.loop is None or not self.loop.is_running():
+            self._count('dropped')
+            return False
+        notification = Notification(title, message, timeout, username, priority, group)
+        try:
+            self.loop.call_soon_threadsafe(self._enqueue, notification)
+        except RuntimeError:  # loop closed while stopping
+            self._count('dropped')
+            return False
+        return True
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _enqueue(self, notification):
+        self.bursts['submitted'].add(time.monotonic())
+        if notification.group is None or not self.coalesce_window:
+            self._ready(notification)
+            return
+        key = (notification.username, notification.group)
+        group = self.groups.get(key)
+        if group is not None:
+            group.append(notification)
+            return
+        self.groups[key] = [notification]
+        self.loop.call_later(self.coalesce_window, self._flush_group, key)
+
+    def _flush_group(self, key):
+        group = self.groups.pop(key, None)
+        if not group:
+            return
+        with self.stats_lock:
+            self.stats['coalesced'] += len(group) - 1
+            self.stats['largest_group'] = max(self.stats['largest_group'], len(group))
+        self._ready(merge_notifications(group))
+
+    def _ready(self, notification):
+        self.bursts['coalesced'].add(time.monotonic())
+        try:
+            self.inbound.put_nowait((notification.priority, next(self.order), notification))
+        except asyncio.QueueFull:
+            self._count('dropped')
+
+    def _close(self):
+        for key in list(self.groups):
+            self._flush_group(key)
+        # The stop marker sorts after everything queued and waits for queue
+        # space, so nothing queued is dropped
+        asyncio.ensure_future(self.inbound.put((float('inf'), next(self.order), None)))
+
+    async def _fan_out(self):
+        while True:
+            _, _, notification = await self.inbound.get()
+            if notification is not None:
+                if self.limiter is not None:
+                    await self.limiter.acquire()
+                self.bursts['sent'].add(time.monotonic())
+            for sink in self.sinks:
+                if notification is None:
+                    for _ in range(sink.concurrency):
+                        await self.sink_queues[sink.name].put(None)
+                    continue
+                try:
+                    self.sink_queues[sink.name].put_nowait(notification)
+                except asyncio.QueueFull:
+                    self.sink_stats[sink.name]['dropped'] += 1
+            if notification is None:
+                return
+
+    async def _deliver(self, sink, notification):
+        stats = self.sink_stats[sink.name]
+        for attempt in range(sink.retries + 1):
+            if attempt:
+                stats['retried'] += 1
+                await asyncio.sleep(self.retry_delay * attempt)
+            try:
+                await asyncio.wait_for(sink.send(notification), sink.timeout)
+            except asyncio.TimeoutError:
+                stats['timeouts'] += 1
+                error = f"timed out after {sink.timeout}s"
+            except Exception as e:
+                error = str(e)
+            else:
+                stats['sent'] += 1
+                stats['last_sent'] = time.monotonic()
+                stats['latency'].add(time.monotonic() - notification.created)
+                return
+        stats['failed'] += 1
+        self.errors.append((sink.name, error))
+        print(f"Notification error ({sink.name}): {error}")
+
+    async def _worker(self, sink):
+        queue = self.sink_queues[sink.name]
+        while True:
+            notification = await queue.get()
+            if notification is None:
+                return
+            await self._deliver(sink, notification)
+
+    async def _run(self):
+        self.inbound = asyncio.PriorityQueue(self.queue_size)
+        self.sink_queues = {sink.name: asyncio.Queue(sink.queue_size) for sink in self.sinks}
+        now = time.monotonic()
+        for stats in self.sink_stats.values():
+            stats['started'] = now
+        workers = [asyncio.create_task(self._worker(sink))
+                   for sink in self.sinks for _ in range(sink.concurrency)]
+        fan_out = asyncio.create_task(self._fan_out())
+        self.ready.set()
+        await fan_out
+        await asyncio.gather(*workers)
+
+    def _thread_main(self):
+        try:
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.loop.run_until_complete(self._run())
+            finally:
+                self.loop.close()
+        except Exception as e:
+            self.error = e
+            print(f"Notification dispatcher stopped: {str(e)}")
+        finally:
+            # Never leave start() waiting, whether or not the loop got going
+            self.ready.set()
+
+    def start(self):
+        """Start the loop thread; raises the error if the loop could not start"""
+        self.thread = threading.Thread(target=self._thread_main, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout=5.0):
+        """Deliver what is queued (for up to timeout seconds) and stop the loop"""
+        if self.loop is None or not self.loop.is_running():
+            return
+        self.loop.call_soon_threadsafe(self._close)
+        self.thread.join(timeout)
+
+    def get_stats(self):
+        """Totals, bursts, plus throughput (sent per second while running) and latency per sink"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['rate_limited'] = self.limiter.waits if self.limiter else 0
+        stats['bursts'] = {name: counter.summary() for name, counter in self.bursts.items()}
+        for name, sink_stats in self.sink_stats.items():
+            elapsed = 0
+            if sink_stats['last_sent']:
+                elapsed = sink_stats['last_sent'] - sink_stats['started']
+            summary = {key: value for key, value in sink_stats.items()
+                       if key not in ('latency', 'started', 'last_sent')}
+            summary['throughput'] = sink_stats['sent'] / elapsed if elapsed else 0.0
+            summary['latency'] = sink_stats['latency'].summary()
+            stats[name] = summary
+        return stats
@@ -0,0 +1,258 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+from .storage import get_backend, patient_summary
+
+class LazyPatientStore(MutableMapping):
+    """Patient records keyed by id, loaded from the backend on first access.
+
+    Only the compact id -> summary index is read up front. Full records are
+    kept in an LRU of at most `capacity` entries; records in `pinned`
+    (unsaved changes) are never evicted.
+    """
+
+    def __init__(self, backend, capacity=1000, pinned=None):
+        self.backend = backend
+        self.capacity = capacity
+        self.pinned = pinned if pinned is not None else set()
+        self.index = dict(backend.load_patient_index())
+        self.index_version = getattr(backend, 'index_version', 0)
+        self.cache = OrderedDict()
+
+    def __getitem__(self, patient_id):
+        if patient_id in self.cache:
+            # Re-read clean records another process has rewritten since
+            if patient_id in self.pinned or not self.backend.patient_changed(patient_id):
+                self.cache.move_to_end(patient_id)
+                return self.cache[patient_id]
+            del self.cache[patient_id]
+        if patient_id not in self.index:
+            raise KeyError(patient_id)
+        patient = self.backend.load_patient(patient_id)
+        if patient is None:
+            raise KeyError(patient_id)
+        self.cache[patient_id] = patient
+        self._evict()
+        return patient
+
+    def __setitem__(self, patient_id, patient):
+        self.cache[patient_id] = patient
+        self.cache.move_to_end(patient_id)
+        self.index[patient_id] = patient_summary(patient)
+        self._evict()
+
+    def __delitem__(self, patient_id):
+        del self.index[patient_id]
+        self.cache.pop(patient_id, None)
+
+    def __contains__(self, patient_id):
+        return patient_id in self.index
+
+    def __iter__(self):
+        return iter(list(self.index))
+
+    def __len__(self):
+        return len(self.index)
+
+    def _evict(self):
+        """Drop least recently used clean records beyond capacity"""
+        if len(self.cache) <= self.capacity:
+            return
+        for patient_id in list(self.cache):
+            if len(self.cache) <= self.capacity:
+                break
+            if patient_id not in self.pinned:
+                del self.cache[patient_id]
+                self.backend.forget_patient(patient_id)
+
+    def refresh(self):
+        """Pick up patients added, renamed or removed by other processes"""
+        refresh_index = getattr(self.backend, 'refresh_patient_index', None)
+        if refresh_index is None:
+            return False
+        refresh_index()
+        if self.backend.index_version == self.index_version:
+            return False
+        self.index_version = self.backend.index_version
+        shared_index = self.backend.patient_index
+        for patient_id in [pid for pid in self.index if pid not in shared_index]:
+            if patient_id not in self.pinned:
+                del self.index[patient_id]
+                self.cache.pop(patient_id, None)
+        for patient_id, summary in shared_index.items():
+            if patient_id not in self.pinned:
+                self.index[patient_id] = summary
+        return True
+
+    def refresh_summary(self, patient_id):
+        """Update the index entry after a record's summary fields change"""
+        if patient_id in self.cache:
+            self.index[patient_id] = patient_summary(self.cache[patient_id])
+
+
+class PatientManagement:
+    def __init__(self, backend=None, write_behind=None, cache_size=1000, prescriptions=None):
+        self.backend = backend or get_backend()
+        # Optional WriteBehind layer; when set, saves are coalesced
+        self.write_behind = write_behind
+        # Optional PrescriptionRepository; when set, medications are read from
+        # and written to it instead of being copied into patient records
+        self.prescriptions = prescriptions
+        self.dirty = set()
+        self.cache_size = cache_size
+        self.patients = self.load_patients()
+
+    def load_patients(self):
+        """Open the patient store; records are loaded lazily on first access"""
+        return LazyPatientStore(self.backend, self.cache_size, pinned=self.dirty)
+
+    def save_patients(self, keys=None):
+        """Save patients to the storage backend"""
+        try:
+            self.backend.save_patients(self.patients, keys)
+            return True
+        except Exception as e:
+            print(f"Error saving patients: {e}")
+            return False
+
+    def mark_dirty(self, patient_id):
+        """Record a changed patient and save it, or defer to the write-behind layer"""
+        self.dirty.add(patient_id)
+        self.patients.refresh_summary(patient_id)
+        if self.write_behind:
+            self.write_behind.mark_dirty('patients')
+            return True
+        return self.flush()
+
+    def flush(self):
+        """Save only the patients changed since the last flush"""
+        if not self.dirty:
+            return True
+        keys = sorted(self.dirty)
+        if self.save_patients(keys):
+            self.dirty.difference_update(keys)
+            return True
+        return False
+
+    def add_patient(self, patient_id, name, dob, contact):
+        """Add a new patient"""
+        if patient_id not in self.patients:
+            self.patients[patient_id] = {
+                'name': name,
+                'dob': dob,
+                'contact': contact,
+                'medications': [],
+                'medical_notes': []
+            }
+            return self.mark_dirty(patient_id)
+        return False
+
+    def add_medication_history(self, patient_id, medication):
+        if self.prescriptions:
+            return self.prescriptions.upsert_for_patient(patient_id, medication) is not None
+        if patient_id in self.patients:
+            medication['date_prescribed'] = str(datetime.now())
+            self.patients[patient_id]['medications'].append(medication)
+            self.mark_dirty(patient_id)
+            return True
+        return False
+
+    def get_patient_history(self, patient_id):
+        """Get patient history by ID"""
+        return self.patients.get(patient_id)
+
+    def get_all_patients(self):
+        """Get all patients sorted by name"""
+        return self.patients
+
+    def refresh(self):
+        """Reload the patient index if other processes changed it"""
+        return self.patients.refresh()
+
+    def get_patient_summaries(self):
+        """Get {patient_id: {name, dob, contact}} without loading full records"""
+        return self.patients.index
+
+    def modify_patient(self, patient_id, updated_data):
+        """Modify patient information while preserving medical data"""
+        if patient_id in self.patients:
+            # Preserve medical data
+            medical_notes = self.patients[patient_id].get('medical_notes', [])
+            medications = self.patients[patient_id].get('medications', [])
+            
+            # Update patient info
+            self.patients[patient_id].update(updated_data)
+            
+            # Restore medical data
+            self.patients[patient_id]['medical_notes'] = medical_notes
+            self.patients[patient_id]['medications'] = medications
+            
+            return self.mark_dirty(patient_id)
+        return False
+
+    def add_medical_note(self, patient_id, note):
+        """Add a medical note to patient record"""
+        if patient_id in self.patients:
+            if 'medical_notes' not in self.patients[patient_id]:
+                self.patients[patient_id]['medical_notes'] = []
+            
+            new_note = {
+                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'note': note
+            }
+            
+            self.patients[patient_id]['medical_notes'].append(new_note)
+            return self.mark_dirty(patient_id)
+        return False
+
+    def add_medication(self, patient_id, medication_data):
+        """Add or update a medication for a patient"""
+        if self.prescriptions:
+            return self.prescriptions.upsert_for_patient(patient_id, medication_data) is not None
+        if patient_id in self.patients:
+            if 'medications' not in self.patients[patient_id]:
+                self.patients[patient_id]['medications'] = []
+            
+            # Check if medication already exists
+            existing_med = None
+            for i, med in enumerate(self.patients[patient_id]['medications']):
+                if med['medication_name'] == medication_data['medication_name']:
+                    existing_med = i
+                    break
+                
+            if existing_med is not None:
+                # Update existing medication
+                self.patients[patient_id]['medications'][existing_med] = medication_data
+            else:
+                # Add new medication
+                self.patients[patient_id]['medications'].append(medication_data)
+            
+            return self.mark_dirty(patient_id)
+        return False
+
+    def get_medication_history(self, patient_id):
+        if self.prescriptions:
+            return self.prescriptions.patient_view(patient_id)
+        if patient_id in self.patients:
+            return self.patients[patient_id].get('medications', [])
+        return []
+
+    def update_medication_status(self, patient_id, medication_name, new_status):
+        if self.prescriptions:
+            username = self.prescriptions.username_for_patient(patient_id)
+            return username is not None and self.prescriptions.set_status(username, medication_name, new_status)
+        if patient_id in self.patients:
+            for med in self.patients[patient_id].get('medications', []):
+                if med['medication_name'] == medication_name:
+                    med['status'] = new_status
+                    med['last_modified'] = str(datetime.now())
+                    self.mark_dirty(patient_id)
+                    return True
+        return False
+
+    def get_patient_by_name(self, name):
+        """Get patient ID by name"""
+        for patient_id, data in self.patients.index.items():
+            if data.get('name') == name:
+                return patient_id
+        return None
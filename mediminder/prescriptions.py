@@ -0,0 +1,175 @@
+from datetime import datetime
+
+# Fields stored for a prescription; streak and history are derived from
+# medication tracking and are never stored alongside the prescription
+PRESCRIPTION_FIELDS = ('name', 'dosage', 'time', 'instructions', 'status', 'start_date', 'last_modified',
+                       'created', 'every_hours', 'weekdays', 'end_date', 'taper')
+DERIVED_FIELDS = ('streak', 'history')
+
+
+def _stamp_start(record, start_date=None):
+    """Give an every_hours prescription the start date its doses are counted from; True if set"""
+    if not record.get('every_hours') or record.get('start_date'):
+        return False
+    record['start_date'] = (start_date or record.get('created') or record.get('last_modified')
+                            or datetime.now().strftime('%Y-%m-%d'))[:10]
+    return True
+
+
+def created_at(prescription):
+    """When a prescription was added (a datetime), or None if it predates the 'created' field"""
+    created = prescription.get('created')
+    return datetime.fromisoformat(created) if created else None
+
+
+class PrescriptionRepository:
+    """Single source of truth for prescriptions.
+
+    Prescriptions are stored once, in users[username]['medications']. Streaks
+    and dose history are read from medication tracking, and the per-patient
+    view used by PatientManagement is derived on demand.
+    """
+
+    def __init__(self, get_users, get_tracking=None, on_change=None):
+        # Getters, because the GUI rebinds its users/tracking globals on load
+        self.get_users = get_users
+        self.get_tracking = get_tracking or (lambda: {})
+        # Called with the username after every edit so that user gets saved
+        self.on_change = on_change
+        # Called with the username after every edit (e.g. to re-arm reminders)
+        self.listeners = []
+        self.patient_usernames = {}
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _changed(self, username):
+        if self.on_change:
+            self.on_change(username)
+        for listener in self.listeners:
+            listener(username)
+
+    def normalize(self):
+        """Drop derived fields left in stored prescriptions by older versions, and date interval ones.
+
+        Returns the usernames whose prescriptions changed, to be saved.
+        """
+        changed = []
+        for username, data in self.get_users().items():
+            user_changed = False
+            for med in data.get('medications', []):
+                for field in DERIVED_FIELDS:
+                    if field in med:
+                        del med[field]
+                        user_changed = True
+                if _stamp_start(med):
+                    user_changed = True
+            if user_changed:
+                changed.append(username)
+        return changed
+
+    def for_user(self, username):
+        """Prescriptions of a user (the stored list, empty if none)"""
+        return self.get_users().get(username, {}).get('medications', [])
+
+    def get(self, username, name):
+        for med in self.for_user(username):
+            if med['name'] == name:
+                return med
+        return None
+
+    def upsert(self, username, prescription):
+        """Add or update a prescription by name; returns 'added' or 'updated'"""
+        medications = self.get_users()[username].setdefault('medications', [])
+        record = {field: prescription[field] for field in PRESCRIPTION_FIELDS if field in prescription}
+        result = 'added'
+        for i, med in enumerate(medications):
+            if med['name'] == record['name']:
+                _stamp_start(record, med.get('start_date'))
+                if med.get('created'):
+                    record['created'] = med['created']
+                medications[i] = record
+                result = 'updated'
+                break
+        else:
+            _stamp_start(record)
+            record.setdefault('created', str(datetime.now()))
+            medications.append(record)
+        self._changed(username)
+        return result
+
+    def replace_all(self, username, prescriptions):
+        """Replace a user's prescriptions, keeping stored fields not given"""
+        existing = {med['name']: med for med in self.for_user(username)}
+        medications = []
+        for prescription in prescriptions:
+            record = dict(existing.get(prescription['name'], {'created': str(datetime.now())}))
+            record.update(prescription)
+            for field in DERIVED_FIELDS:
+                record.pop(field, None)
+            _stamp_start(record)
+            medications.append(record)
+        self.get_users()[username]['medications'] = medications
+        self._changed(username)
+
+    def delete(self, username, name):
+        """Remove a prescription; returns True if it existed"""
+        medications = self.for_user(username)
+        remaining = [med for med in medications if med['name'] != name]
+        if len(remaining) == len(medications):
+            return False
+        self.get_users()[username]['medications'] = remaining
+        self._changed(username)
+        return True
+
+    def set_status(self, username, name, status):
+        med = self.get(username, name)
+        if med is None:
+            return False
+        med['status'] = status
+        med['last_modified'] = str(datetime.now())
+        self._changed(username)
+        return True
+
+    def streak(self, username, name):
+        """Current streak, derived from medication tracking"""
+        return self.get_tracking().get(username, {}).get(name, {}).get('streak', 0)
+
+    def username_for_patient(self, patient_id):
+        """Username owning a patient id, or None"""
+        username = self.patient_usernames.get(patient_id)
+        users = self.get_users()
+        if username is None or users.get(username, {}).get('patient_id') != patient_id:
+            self.patient_usernames = {data['patient_id']: name for name, data in users.items()
+                                      if 'patient_id' in data}
+            username = self.patient_usernames.get(patient_id)
+        return username
+
+    def upsert_for_patient(self, patient_id, medication):
+        """Add or update a prescription given in PatientManagement's format"""
+        username = self.username_for_patient(patient_id)
+        if username is None:
+            return None
+        prescription = {
+            'name': medication['medication_name'],
+            'dosage': medication.get('dosage', ''),
+            'time': medication.get('schedule', ''),
+            'instructions': medication.get('instructions', ''),
+            'status': medication.get('status', 'Active'),
+            'start_date': medication.get('start_date') or datetime.now().strftime('%Y-%m-%d')
+        }
+        return self.upsert(username, prescription)
+
+    def patient_view(self, patient_id):
+        """Prescriptions of a patient in PatientManagement's medication format"""
+        username = self.username_for_patient(patient_id)
+        if username is None:
+            return []
+        return [{
+            'medication_name': med['name'],
+            'dosage': med.get('dosage', ''),
+            'schedule': med.get('time', ''),
+            'instructions': med.get('instructions', ''),
+            'status': med.get('status', ''),
+            'start_date': med.get('start_date', '')
+        } for med in self.for_user(username)]
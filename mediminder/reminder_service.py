@@ -0,0 +1,176 @@
+"""Reminder daemon for every patient, independent of the GUI.
+
+Usage: python -m mediminder.reminder_service [shards]
+"""
+import sys
+import threading
+import time
+import zlib
+from .clock import system_clock
+from .medication_journal import MedicationJournal
+from .metrics import LagStats
+from .prescriptions import PrescriptionRepository
+from .reminders import MedicationReminders
+from .schedule import schedule_key
+from .scheduler import DoseScheduler
+from .sweeper import MissedDoseSweeper
+from .storage import get_backend
+
+# How often the daemon picks up users and doses saved by other processes
+REFRESH_SECONDS = 5
+# How often the daemon prints its lag statistics
+REPORT_SECONDS = 60
+
+
+def patient_usernames(users):
+    return [name for name, data in users.items() if data.get('type') == 'patient']
+
+
+class ReminderService:
+    """Schedules reminders for every patient, sharded across DoseScheduler threads.
+
+    Each username always maps to the same shard, so one user's doses are
+    handled by one thread in order, and a slow dispatch only delays its
+    own shard. Handlers are called under one lock because they write the
+    shared tracking journal.
+    """
+
+    def __init__(self, prescriptions, reminders, shards=4, clock=None):
+        self.prescriptions = prescriptions
+        self.reminders = reminders
+        self.clock = clock or system_clock
+        self.now = self.clock.now
+        self.lag = LagStats()
+        self.dispatch_lock = threading.Lock()
+        self.schedulers = [DoseScheduler(prescriptions, self._dose_due, clock=self.clock)
+                           for _ in range(shards)]
+        prescriptions.add_listener(self.prescriptions_changed)
+
+    def shard(self, username):
+        return self.schedulers[zlib.crc32(username.encode('utf-8')) % len(self.schedulers)]
+
+    def _dose_due(self, username, med, when):
+        self.lag.add((self.now() - when).total_seconds())
+        with self.dispatch_lock:
+            self.reminders.dose_due(username, med, when)
+
+    def arm_all(self, users):
+        """Schedule every patient in users"""
+        by_shard = {id(scheduler): [] for scheduler in self.schedulers}
+        for username in patient_usernames(users):
+            by_shard[id(self.shard(username))].append(username)
+        for scheduler in self.schedulers:
+            scheduler.arm_many(by_shard[id(scheduler)])
+
+    def sync_users(self, users):
+        """Arm new patients and disarm removed ones (e.g. after a refresh)"""
+        current = set(patient_usernames(users))
+        for scheduler in self.schedulers:
+            for username in [name for name in scheduler.armed if name not in current]:
+                scheduler.disarm(username)
+        for username in current:
+            scheduler = self.shard(username)
+            if username not in scheduler.armed:
+                scheduler.arm(username)
+
+    def prescriptions_changed(self, username):
+        self.shard(username).prescriptions_changed(username)
+
+    def rearm(self, username):
+        self.shard(username).arm(username)
+
+    def start(self):
+        for scheduler in self.schedulers:
+            scheduler.start()
+
+    def stop(self):
+        for scheduler in self.schedulers:
+            scheduler.stop()
+
+    def get_stats(self):
+        stats = {'shards': len(self.schedulers), 'lag': self.lag.summary()}
+        for key in ('fired_due', 'stale_skipped', 'wakeups'):
+            stats[key] = sum(scheduler.stats[key] for scheduler in self.schedulers)
+        stats['armed_users'] = sum(len(scheduler.armed) for scheduler in self.schedulers)
+        stats['queued'] = sum(len(scheduler.heap) for scheduler in self.schedulers)
+        return stats
+
+
+def prescription_times(users):
+    """{username: [(name, schedule), ...]} used to spot changed prescriptions"""
+    return {name: [(med['name'], schedule_key(med)) for med in data.get('medications', [])]
+            for name, data in users.items() if data.get('type') == 'patient'}
+
+
+def main():
+    from .notifications import NotificationDispatcher, default_rate, default_sinks  # imports asyncio
+
+    shards = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    storage = get_backend()
+    users = storage.load_users()
+    journal = MedicationJournal()
+    tracking = journal.load()
+
+    prescriptions = PrescriptionRepository(lambda: users, lambda: tracking)
+    # Older interval prescriptions get the start date their doses are counted from; saved
+    # before arming so the GUI and this daemon anchor them the same way
+    normalized = prescriptions.normalize()
+    if normalized:
+        storage.save_users(users, normalized)
+    notifier = NotificationDispatcher(default_sinks(), rate=default_rate())
+    notifier.start()
+    def record(user, med_name, event, date, time_text, status):
+        return journal.record(tracking, user, med_name, event, date, time_text, status)
+
+    reminders = MedicationReminders(record, notify=notifier.submit)
+    sweeper = MissedDoseSweeper(journal, record, record_many=lambda events: journal.record_many(tracking, events))
+    service = ReminderService(prescriptions, reminders, shards)
+
+    # Doses that expired while no reminder process was running
+    print(f"Marked {sweeper.catch_up(prescriptions, lambda: tracking)} doses that were never reminded as missed")
+    print(f"Marked {sweeper.sweep()} expired doses as missed")
+    service.arm_all(users)
+    service.start()
+    print(f"Reminder service started: {service.get_stats()}")
+
+    seen = prescription_times(users)
+    last_report = time.monotonic()
+    try:
+        while True:
+            # Wake for the next refresh or missed-dose deadline, whichever is first
+            delay = REFRESH_SECONDS
+            with service.dispatch_lock:
+                next_deadline = sweeper.next_deadline()
+            if next_deadline is not None:
+                delay = min(delay, max(0.0, (next_deadline - system_clock.now()).total_seconds()))
+            system_clock.sleep(delay)
+            try:
+                with service.dispatch_lock:
+                    journal.refresh(tracking)
+                    sweeper.sweep()
+                if storage.refresh_users(users):
+                    service.sync_users(users)
+                    current = prescription_times(users)
+                    for username, times in current.items():
+                        if seen.get(username) != times:
+                            service.rearm(username)
+                    seen = current
+            except Exception as e:
+                print(f"Error refreshing shared data: {str(e)}")
+            if time.monotonic() - last_report >= REPORT_SECONDS:
+                print(f"Reminder service stats: {service.get_stats()}")
+                print(f"Notification stats: {notifier.get_stats()}")
+                print(f"Missed-dose sweeper stats: {sweeper.stats}")
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        notifier.stop()
+        journal.compact(tracking)
+        print(f"Reminder service stats: {service.get_stats()}")
+        print(f"Notification stats: {notifier.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
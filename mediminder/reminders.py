@@ -0,0 +1,37 @@
+from functools import lru_cache
+
+from .schedule import compile_schedule
+from .windows import ReminderWindows
+
+
+@lru_cache(maxsize=4096)
+def dose_texts(when):
+    """(YYYY-MM-DD, HH:MM) of a dose time; doses due together share one cached pair"""
+    return when.strftime("%Y-%m-%d"), when.strftime("%H:%M")
+
+
+class MedicationReminders:
+    """What happens when a dose is due, independent of any GUI.
+
+    The DoseScheduler decides when; dose_due() records a pending dose and
+    sends a reminder, once per scheduled dose (see ReminderWindows). Doses
+    still pending at their deadline are marked missed by the MissedDoseSweeper.
+    """
+
+    def __init__(self, record, notify=None, windows=None):
+        # record(user, med_name, event, date, time, status) -> journal the event
+        self.record = record
+        # notify(title, message, timeout, username, priority, group), e.g. NotificationDispatcher.submit
+        # (reminders use its default, normal priority);
+        # reminders share the 'dose_due' group, so one user's simultaneous doses become one notification
+        self.notify = notify
+        self.windows = windows or ReminderWindows()
+
+    def dose_due(self, username, med, when):
+        if not self.windows.open(username, med['name'], when):
+            return
+        self.record(username, med['name'], 'pending', *dose_texts(when), 'pending')
+        if self.notify:
+            dosage = compile_schedule(med).dosage_on(when.date())
+            self.notify("Medication Reminder", f"Time to take {med['name']} - {dosage}", 10, username,
+                        group='dose_due')
@@ -0,0 +1,198 @@
+"""Clinic-wide adherence report for every patient, as CSV and JSON.
+
+Patients are split into chunks that are summarised and formatted in
+worker processes (see analytics), and each chunk is written out as soon
+as it is done, in patient order, so the report is never held in memory
+as a whole. The JSON file is a list of patients with a per-medication
+breakdown; the CSV has one row per patient and medication, plus an
+'(all)' row per patient. Metrics cover each patient's whole dose
+history: workers read sealed months from the history archive.
+
+Usage: python -m mediminder.report [output_prefix] [workers] [chunk_size]
+"""
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from .history_segments import SegmentedHistory
+from .prescriptions import PrescriptionRepository
+
+CHUNK_SIZE = 1000
+ALL_MEDICATIONS = '(all)'
+METRICS = ('doses', 'on_time', 'late', 'missed', 'adherence', 'on_time_ratio', 'late_ratio',
+           'missed_ratio', 'longest_streak', 'current_streak', 'mean_lateness')
+CSV_FIELDS = ('username', 'patient_id', 'name', 'cohort', 'medication') + METRICS
+EMPTY_METRICS = dict.fromkeys(METRICS, 0)
+EMPTY_METRICS.update(dict.fromkeys(('adherence', 'on_time_ratio', 'late_ratio', 'missed_ratio',
+                                    'mean_lateness')))
+
+
+def _for_worker(user_tracking):
+    """A user's tracking for pickling to a worker: hot months in memory, sealed months left to the archive"""
+    detached = {}
+    for med_name, med_tracking in user_tracking.items():
+        history = med_tracking.get('history', [])
+        if isinstance(history, SegmentedHistory):
+            # Without the cold cache; the worker reads sealed months from disk itself
+            history = SegmentedHistory(archive=history.archive, key=history.key)
+            history.hot = med_tracking['history'].hot
+        detached[med_name] = {'streak': med_tracking.get('streak', 0), 'history': history}
+    return detached
+
+
+def report_chunk(patients):
+    """Report rows for a chunk of patients (runs in a worker process).
+
+    patients is a list of (username, medications, user_tracking, info)
+    where info has patient_id, name and cohort.
+    """
+    from .analytics import load_events, summarize
+
+    users = {username: {'medications': medications} for username, medications, _, _ in patients}
+    tracking = {username: user_tracking for username, _, user_tracking, _ in patients}
+    events = load_events(tracking, PrescriptionRepository(lambda: users))
+    by_medication = summarize(events, 'prescription')
+    by_patient = summarize(events, 'patient')
+
+    rows = []
+    for username, medications, _, info in patients:
+        medication_rows = {}
+        for med in medications:
+            medication_rows[med['name']] = by_medication.get((username, med['name']), EMPTY_METRICS)
+        rows.append(dict(info, username=username, totals=by_patient.get(username, EMPTY_METRICS),
+                         medications=medication_rows))
+    return rows
+
+
+def patient_chunks(users, tracking, patient_index, chunk_size=CHUNK_SIZE):
+    """Yield lists of report_chunk() inputs, chunk_size patients at a time"""
+    from .analytics import age_band
+
+    chunk = []
+    for username in sorted(users):
+        data = users[username]
+        if data.get('type') != 'patient':
+            continue
+        summary = patient_index.get(data.get('patient_id'), {})
+        info = {
+            'patient_id': data.get('patient_id', ''),
+            'name': summary.get('name', ''),
+            'cohort': age_band(summary.get('dob', '')),
+        }
+        chunk.append((username, data.get('medications', []), _for_worker(tracking.get(username, {})), info))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def format_chunk(patients):
+    """CSV text and JSON items for a chunk of patients (runs in a worker process)"""
+    rows = report_chunk(patients)
+    text = io.StringIO()
+    writer = csv.DictWriter(text, CSV_FIELDS)
+    items = []
+    for row in rows:
+        base = {field: row[field] for field in ('username', 'patient_id', 'name', 'cohort')}
+        for med_name, metrics in row['medications'].items():
+            writer.writerow(dict(base, medication=med_name, **metrics))
+        writer.writerow(dict(base, medication=ALL_MEDICATIONS, **row['totals']))
+        items.append(json.dumps(row))
+    return text.getvalue(), items
+
+
+class ReportWriter:
+    """Streams formatted chunks to a CSV file and a JSON list"""
+
+    def __init__(self, csv_path, json_path):
+        self.csv_file = open(csv_path, 'w', newline='')
+        csv.DictWriter(self.csv_file, CSV_FIELDS).writeheader()
+        self.json_file = open(json_path, 'w')
+        self.json_file.write('[')
+        self.patients = 0
+
+    def write(self, csv_text, json_items):
+        self.csv_file.write(csv_text)
+        if json_items:
+            self.json_file.write(',\n' if self.patients else '\n')
+            self.json_file.write(',\n'.join(json_items))
+        self.patients += len(json_items)
+
+    def close(self):
+        self.json_file.write('\n]\n')
+        self.json_file.close()
+        self.csv_file.close()
+
+
+def write_report(users, tracking, patient_index, csv_path, json_path, workers=None,
+                 chunk_size=CHUNK_SIZE, progress=None):
+    """Write the report for every patient; returns {'patients', 'seconds', 'per_second'}.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    however many patients there are. progress(patients_done, elapsed) is
+    called after each chunk is written.
+    """
+    from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing, only needed here
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    writer = ReportWriter(csv_path, json_path)
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            in_flight = deque()
+
+            def write_next():
+                writer.write(*in_flight.popleft().result())
+                if progress:
+                    progress(writer.patients, time.perf_counter() - start)
+
+            for chunk in patient_chunks(users, tracking, patient_index, chunk_size):
+                in_flight.append(executor.submit(format_chunk, chunk))
+                if len(in_flight) >= workers * 2:
+                    write_next()
+            while in_flight:
+                write_next()
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    return {
+        'patients': writer.patients,
+        'seconds': seconds,
+        'per_second': writer.patients / seconds if seconds else 0.0,
+    }
+
+
+def main():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("The adherence report needs numpy (pip install numpy)")
+        sys.exit(1)
+    from .medication_journal import MedicationJournal
+    from .storage import get_backend
+
+    prefix = sys.argv[1] if len(sys.argv) > 1 else 'adherence_report'
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else CHUNK_SIZE
+
+    storage = get_backend()
+    users = storage.load_users()
+    patient_index = storage.load_patient_index()
+    tracking = MedicationJournal().load()
+
+    def progress(done, elapsed):
+        print(f"\r{done} patients, {done / elapsed:,.0f}/s", end='', flush=True)
+
+    stats = write_report(users, tracking, patient_index, f"{prefix}.csv", f"{prefix}.json",
+                         workers, chunk_size, progress)
+    print(f"\nWrote {prefix}.csv and {prefix}.json: {stats['patients']} patients in "
+          f"{stats['seconds']:.1f}s ({stats['per_second']:,.0f} patients/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+from array import array
+from datetime import timedelta
+
+from .clock import system_clock
+from .dose_history import date_to_ordinal
+
+# Rolling windows, in days, kept for every patient and medication
+WINDOWS = (7, 30, 90)
+COUNTED = ('on_time', 'late', 'missed')
+STATUS_INDEX = {status: i for i, status in enumerate(COUNTED)}
+NO_DAY = -1
+
+
+class RollingAdherence:
+    """Dose counts over the last 7, 30 and 90 days, as a ring buffer of daily buckets.
+
+    Bucket day % span holds one day's on-time, late and missed counts.
+    Each window keeps running totals: a dose adds to the windows covering
+    its day, and when the day moves on the buckets that slide out are
+    subtracted, so reading a window is O(1) and updates are amortised O(1).
+    """
+
+    def __init__(self, today, windows=WINDOWS):
+        self.windows = windows
+        self.span = max(windows)
+        self.today = today
+        # Day ordinal each bucket currently holds
+        self.days = array('i', [NO_DAY]) * self.span
+        # counts[status][bucket]
+        self.counts = [array('i', [0]) * self.span for _ in COUNTED]
+        # window -> running [on_time, late, missed] over (today - window, today]
+        self.totals = {window: [0] * len(COUNTED) for window in windows}
+
+    def _bucket_count(self, day, status):
+        slot = day % self.span
+        return self.counts[status][slot] if self.days[slot] == day else 0
+
+    def advance(self, today):
+        """Move the windows forward to end on today"""
+        if today <= self.today:
+            return
+        for window, totals in self.totals.items():
+            if today - self.today >= window:
+                totals[:] = [0] * len(COUNTED)
+                continue
+            # Days that slide out: (self.today - window, today - window]
+            for day in range(self.today - window + 1, today - window + 1):
+                for status in range(len(COUNTED)):
+                    totals[status] -= self._bucket_count(day, status)
+        self.today = today
+
+    def add(self, day, status, count=1):
+        """Count a dose of day (an ordinal) with status on_time, late or missed"""
+        if day > self.today:
+            self.advance(day)
+        if day <= self.today - self.span:
+            return
+        status = STATUS_INDEX[status]
+        slot = day % self.span
+        if self.days[slot] != day:
+            # The bucket held a day older than every window; reuse it
+            self.days[slot] = day
+            for counts in self.counts:
+                counts[slot] = 0
+        self.counts[status][slot] += count
+        for window, totals in self.totals.items():
+            if day > self.today - window:
+                totals[status] += count
+
+    def window(self, days):
+        """{'on_time', 'late', 'missed', 'doses', 'adherence'} over the last days (one of the windows)"""
+        on_time, late, missed = self.totals[days]
+        doses = on_time + late + missed
+        return {
+            'on_time': on_time,
+            'late': late,
+            'missed': missed,
+            'doses': doses,
+            'adherence': (on_time + late) / doses if doses else None,
+        }
+
+
+def _recent_entries(history, start_date, end_date):
+    if hasattr(history, 'entries_between'):
+        return history.entries_between(start_date, end_date)
+    return [entry for entry in history if start_date <= entry['date'] <= end_date]
+
+
+def from_history(history, today, windows=WINDOWS):
+    """RollingAdherence of a dose history, recomputed from its entries (sealed months included)"""
+    rolling = RollingAdherence(today.toordinal(), windows)
+    start_date = (today - timedelta(days=rolling.span - 1)).isoformat()
+    for entry in _recent_entries(history, start_date, today.isoformat()):
+        if entry['status'] in STATUS_INDEX:
+            rolling.add(date_to_ordinal(entry['date']), entry['status'])
+    return rolling
+
+
+class RollingBook:
+    """Rolling adherence for each patient and medication, kept up to date.
+
+    Like the agenda book, a medication's counters are built from history
+    the first time they are read and then updated in place by dose_event(),
+    so dashboards read recent adherence without scanning history.
+    """
+
+    def __init__(self, get_tracking, clock=None, windows=WINDOWS):
+        self.get_tracking = get_tracking
+        self.clock = clock or system_clock
+        self.windows = windows
+        # (username, med_name) -> RollingAdherence
+        self.rolling = {}
+        self.stats = {'builds': 0, 'updates': 0, 'reads': 0}
+
+    def _history(self, username, med_name):
+        return self.get_tracking().get(username, {}).get(med_name, {}).get('history', [])
+
+    def for_med(self, username, med_name):
+        """RollingAdherence of one medication, moved forward to today"""
+        today = self.clock.now().date()
+        key = (username, med_name)
+        rolling = self.rolling.get(key)
+        if rolling is None:
+            rolling = self.rolling[key] = from_history(self._history(username, med_name), today, self.windows)
+            self.stats['builds'] += 1
+        else:
+            rolling.advance(today.toordinal())
+        return rolling
+
+    def adherence(self, username, med_name, days):
+        """Counts and adherence of a medication over the last days (7, 30 or 90)"""
+        self.stats['reads'] += 1
+        return self.for_med(username, med_name).window(days)
+
+    def dose_event(self, user, med_name, event, date, time=None, status=None):
+        """Count a recorded dose event in the medication's counters, if they were built"""
+        rolling = self.rolling.get((user, med_name))
+        if rolling is None or event == 'pending':
+            return
+        rolling.add(date_to_ordinal(date), 'missed' if event == 'missed' else status)
+        self.stats['updates'] += 1
+
+    def verify(self):
+        """Compare every built counter with a full recompute: [(user, med, days, stored, recomputed)]"""
+        today = self.clock.now().date()
+        drift = []
+        for (username, med_name), rolling in self.rolling.items():
+            rolling.advance(today.toordinal())
+            fresh = from_history(self._history(username, med_name), today, self.windows)
+            for days in self.windows:
+                if rolling.totals[days] != fresh.totals[days]:
+                    drift.append((username, med_name, days, rolling.window(days), fresh.window(days)))
+        return drift
+
+    def clear(self):
+        """Forget every counter (e.g. after doses recorded by another process were merged)"""
+        self.rolling.clear()
@@ -0,0 +1,185 @@
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from .adherence import minutes_of_day
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+# Guard against rules that never produce a dose (e.g. weekdays outside the date range)
+MAX_STEPS = 1000
+
+
+def parse_times(text):
+    """Sorted minutes of day of 'HH:MM' or comma-separated 'HH:MM, HH:MM'"""
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"invalid dose time: {text!r}")
+    minutes = set()
+    for part in text.replace(';', ',').split(','):
+        part = part.strip()
+        hours, mins = part.split(':')
+        if not (0 <= int(hours) < 24 and 0 <= int(mins) < 60):
+            raise ValueError(f"invalid dose time: {part!r}")
+        minutes.add(minutes_of_day(part))
+    return sorted(minutes)
+
+
+def parse_weekdays(weekdays):
+    """Set of weekday numbers (Monday = 0) from names or numbers, None for every day"""
+    if not weekdays:
+        return None
+    days = set()
+    for day in weekdays:
+        if isinstance(day, int):
+            days.add(day % 7)
+        else:
+            days.add(WEEKDAY_NAMES.index(day.strip().lower()[:3]))
+    return frozenset(days)
+
+
+class Phase:
+    """Dose times and dosage in effect from a start date (one tapering step)"""
+
+    __slots__ = ('start', 'minutes', 'interval', 'anchor', 'dosage')
+
+    def __init__(self, start, minutes, every_hours, dosage):
+        self.start = start
+        self.minutes = minutes
+        self.dosage = dosage
+        self.interval = None
+        self.anchor = None
+        if every_hours:
+            # Every N hours counted from the first dose time on the phase start date
+            self.interval = timedelta(hours=float(every_hours))
+            self.anchor = datetime.combine(start, time(minutes[0] // 60, minutes[0] % 60))
+
+    def first_on_or_after(self, moment):
+        """First dose of this phase at or after moment, ignoring other rules"""
+        if self.interval is not None:
+            if moment <= self.anchor:
+                return self.anchor
+            steps = -((self.anchor - moment) // self.interval)  # ceiling division
+            return self.anchor + steps * self.interval
+        minute = moment.hour * 60 + moment.minute + (1 if moment.second or moment.microsecond else 0)
+        position = bisect_left(self.minutes, minute)
+        day = moment.date()
+        if position == len(self.minutes):
+            day += timedelta(days=1)
+            position = 0
+        first = self.minutes[position]
+        return datetime.combine(day, time(first // 60, first % 60))
+
+
+class Schedule:
+    """A prescription's dose times, compiled once.
+
+    Supports several doses a day ('time': '08:00, 20:00'), every N hours
+    ('every_hours'), specific weekdays ('weekdays': ['mon', 'thu']),
+    start/end dates and tapering ('taper': [{'from': date, 'dosage': ...,
+    'time': ...}, ...], each step changing dosage and/or times from a date).
+    next_after() costs O(log n) in the number of dose times and taper steps.
+    """
+
+    def __init__(self, phases, weekdays=None, start=None, end=None):
+        self.phases = phases
+        self.phase_starts = [phase.start for phase in phases]
+        self.weekdays = weekdays
+        self.start = start
+        self.end = end
+
+    def phase_on(self, day):
+        position = bisect_right(self.phase_starts, day) - 1
+        return self.phases[max(position, 0)]
+
+    def _allowed(self, day):
+        if self.start and day < self.start:
+            return False
+        if self.end and day > self.end:
+            return False
+        return self.weekdays is None or day.weekday() in self.weekdays
+
+    def next_after(self, moment):
+        """First dose at or after moment, or None if the schedule has ended"""
+        if self.start and moment.date() < self.start:
+            moment = datetime.combine(self.start, time())
+        for _ in range(MAX_STEPS):
+            if self.end and moment.date() > self.end:
+                return None
+            day = moment.date()
+            phase = self.phase_on(day)
+            candidate = phase.first_on_or_after(moment)
+            # A later taper step takes over from its start date
+            position = bisect_right(self.phase_starts, day)
+            if position < len(self.phases) and candidate.date() >= self.phases[position].start:
+                moment = datetime.combine(self.phases[position].start, time())
+                continue
+            if self._allowed(candidate.date()):
+                return candidate
+            moment = datetime.combine(candidate.date() + timedelta(days=1), time())
+        return None
+
+    def between(self, start, end):
+        """Every dose with start <= dose time < end"""
+        doses = []
+        moment = self.next_after(start)
+        while moment is not None and moment < end and len(doses) < MAX_STEPS:
+            doses.append(moment)
+            moment = self.next_after(moment + timedelta(minutes=1))
+        return doses
+
+    def on(self, day):
+        """Doses on a date"""
+        start = datetime.combine(day, time())
+        return self.between(start, start + timedelta(days=1))
+
+    def times_on(self, day):
+        return [dose.strftime('%H:%M') for dose in self.on(day)]
+
+    def nearest(self, moment):
+        """Dose on moment's date closest to moment, or None if there is none that day"""
+        doses = self.on(moment.date())
+        if not doses:
+            return None
+        return min(doses, key=lambda dose: abs(dose - moment))
+
+    def dosage_on(self, day):
+        return self.phase_on(day).dosage
+
+
+def _date(text):
+    return date.fromisoformat(text[:10]) if text else None
+
+
+@lru_cache(maxsize=65536)
+def _compile(time_text, every_hours, weekdays, start_date, end_date, taper, dosage):
+    start = _date(start_date)
+    if every_hours and start is None:
+        # Doses every N hours are counted from the first dose time on the start date
+        raise ValueError("an every_hours schedule needs a start_date")
+    phases = [Phase(start or date.min, parse_times(time_text), every_hours, dosage)]
+    for step in sorted(json.loads(taper), key=lambda step: step['from']) if taper else []:
+        previous = phases[-1]
+        minutes = parse_times(step['time']) if step.get('time') else previous.minutes
+        hours = step.get('every_hours', previous.interval.total_seconds() / 3600 if previous.interval else None)
+        phases.append(Phase(_date(step['from']), minutes, hours, step.get('dosage', previous.dosage)))
+    weekday_set = parse_weekdays(json.loads(weekdays)) if weekdays else None
+    return Schedule(phases, weekday_set, start, _date(end_date))
+
+
+def schedule_key(prescription):
+    """Hashable form of the fields that make up a prescription's schedule"""
+    weekdays = prescription.get('weekdays')
+    taper = prescription.get('taper')
+    return (prescription.get('time'), prescription.get('every_hours') or None,
+            json.dumps(weekdays) if weekdays else None,
+            prescription.get('start_date') or None, prescription.get('end_date') or None,
+            json.dumps(taper, sort_keys=True) if taper else None,
+            prescription.get('dosage'))
+
+
+def compile_schedule(prescription):
+    """Compiled Schedule of a prescription; identical schedules share one object.
+
+    Raises ValueError if its time or rules are invalid.
+    """
+    return _compile(*schedule_key(prescription))
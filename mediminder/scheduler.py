@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import threading
+from datetime import timedelta
+
+from .clock import system_clock
+from .schedule import compile_schedule
+
+# A dose whose time passed less than this long ago when it is armed still fires
+DUE_GRACE = timedelta(minutes=1)
+# Upper bound on one sleep, so wall-clock changes are picked up eventually
+MAX_SLEEP_SECONDS = 300
+
+
+def next_occurrence(med, after):
+    """First dose of a prescription that is not before `after`, or None if it has ended"""
+    return compile_schedule(med).next_after(after)
+
+
+class DoseScheduler:
+    """Min-heap of upcoming dose events that sleeps until the next one is due.
+
+    Each armed prescription has one 'due' event in the heap; when it fires,
+    its next dose from the compiled schedule is pushed. Changing a user's prescriptions re-arms
+    them: older heap entries are left in place and skipped when popped
+    (their version no longer matches). Missed doses are handled by the
+    MissedDoseSweeper, from the pending doses the journal records.
+    """
+
+    def __init__(self, prescriptions, on_due, clock=None):
+        self.prescriptions = prescriptions
+        # on_due(username, med, when), where when is the scheduled time of the dose
+        self.on_due = on_due
+        # A SimulatedClock makes run() step through time instead of sleeping
+        self.clock = clock or system_clock
+        self.now = self.clock.now
+        self.heap = []
+        self.counter = itertools.count()
+        # (username, med_name) -> version of its current 'due' entry
+        self.versions = {}
+        # username -> names of the prescriptions armed for that user
+        self.armed = {}
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.stats = {'fired_due': 0, 'stale_skipped': 0, 'wakeups': 0}
+
+    def _push(self, when, username, med_name, version):
+        heapq.heappush(self.heap, (when, next(self.counter), username, med_name, version))
+
+    def _bump(self, username, med_name):
+        # Versions are never reused, so forgetting a key cannot revive old entries
+        version = self.versions[(username, med_name)] = next(self.counter)
+        return version
+
+    def _arm_user(self, username, now, entries):
+        """Collect a user's next 'due' entries and bump their versions"""
+        names = set()
+        for med in self.prescriptions.for_user(username):
+            try:
+                when = next_occurrence(med, now - DUE_GRACE)
+            except (AttributeError, KeyError, TypeError, ValueError):
+                print(f"Invalid schedule for medication: {med.get('name', 'Unknown')}")
+                continue
+            names.add(med['name'])
+            if when is None:
+                continue
+            entries.append((when, next(self.counter), username, med['name'],
+                            self._bump(username, med['name'])))
+        # Prescriptions removed since the last arm keep stale entries only
+        for name in self.armed.get(username, set()) - names:
+            self.versions.pop((username, name), None)
+        self.armed[username] = names
+
+    def arm(self, username):
+        """(Re)schedule every prescription of a user"""
+        with self.condition:
+            entries = []
+            self._arm_user(username, self.now(), entries)
+            for entry in entries:
+                heapq.heappush(self.heap, entry)
+            self.condition.notify()
+
+    def arm_many(self, usernames):
+        """Schedule many users at once, rebuilding the heap in one pass"""
+        with self.condition:
+            now = self.now()
+            for username in usernames:
+                self._arm_user(username, now, self.heap)
+            heapq.heapify(self.heap)
+            self.condition.notify()
+
+    def disarm(self, username):
+        """Stop reminders for a user"""
+        with self.condition:
+            for name in self.armed.pop(username, set()):
+                self.versions.pop((username, name), None)
+            self.condition.notify()
+
+    def armed_users(self):
+        """Usernames currently scheduled"""
+        with self.condition:
+            return list(self.armed)
+
+    def prescriptions_changed(self, username):
+        """Prescription listener: re-arm the user if they are scheduled"""
+        if username in self.armed:
+            self.arm(username)
+
+    def next_due(self):
+        """Time of the earliest live event, or None"""
+        with self.condition:
+            self._drop_stale()
+            return self.heap[0][0] if self.heap else None
+
+    def _drop_stale(self):
+        while self.heap:
+            when, _, username, med_name, version = self.heap[0]
+            if self.versions.get((username, med_name)) != version:
+                heapq.heappop(self.heap)
+                self.stats['stale_skipped'] += 1
+            else:
+                break
+
+    def _pop_due(self, now):
+        """Pop every live event due at or before now"""
+        events = []
+        self._drop_stale()
+        while self.heap and self.heap[0][0] <= now:
+            events.append(heapq.heappop(self.heap))
+            self._drop_stale()
+        return events
+
+    def _fire(self, event):
+        when, _, username, med_name, version = event
+        med = self.prescriptions.get(username, med_name)
+        if med is None:
+            return
+        next_when = next_occurrence(med, when + timedelta(minutes=1))
+        if next_when is not None:
+            with self.condition:
+                self._push(next_when, username, med_name, version)
+        self.stats['fired_due'] += 1
+        self.on_due(username, med, when)
+
+    def run_pending(self):
+        """Fire everything due now; returns the number of events fired"""
+        with self.condition:
+            events = self._pop_due(self.now())
+        for event in events:
+            try:
+                self._fire(event)
+            except Exception as e:
+                print(f"Error processing medication: {event[3]}, Error: {str(e)}")
+        return len(events)
+
+    def run(self):
+        """Sleep until the next event, fire it, repeat (until stop())"""
+        while self.running:
+            self.run_pending()
+            with self.condition:
+                if not self.running:
+                    break
+                next_when = self.heap[0][0] if self.heap else None
+                timeout = MAX_SLEEP_SECONDS
+                if next_when is not None:
+                    timeout = min(timeout, max(0, (next_when - self.now()).total_seconds()))
+                if timeout > 0:
+                    self.clock.wait(self.condition, timeout)
+                self.stats['wakeups'] += 1
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
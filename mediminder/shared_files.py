@@ -0,0 +1,160 @@
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive inter-process lock held on a <path>.lock side file.
+
+    Not re-entrant: never take the same lock twice in one process.
+    """
+
+    def __init__(self, path):
+        self.lock_path = path + '.lock'
+        self.file = None
+
+    def __enter__(self):
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.lock_path, 'a+')
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+def file_signature(path):
+    """(inode, mtime_ns, size) of a file, or None if it doesn't exist.
+
+    Atomic replaces always produce a new inode, so any rewrite by another
+    process changes the signature.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def atomic_write_json(path, data, indent=None, default=None):
+    """Write JSON to a temp file, fsync it and rename it over path"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(data, file, indent=indent, default=default)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+_MISSING = object()
+
+
+def three_way_merge(base, ours, theirs):
+    """Merge our changes and another process's changes relative to a common base.
+
+    Dicts are merged key by key and lists item by item (keeping additions
+    and removals from both sides); for anything else our version wins.
+    _MISSING marks a deleted or absent value.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(theirs) + [k for k in ours if k not in theirs]:
+            value = three_way_merge(base.get(key, _MISSING), ours.get(key, _MISSING),
+                                    theirs.get(key, _MISSING))
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    if isinstance(ours, list) and isinstance(theirs, list):
+        base = base if isinstance(base, list) else []
+        merged = [item for item in theirs if item in ours or item not in base]
+        merged.extend(item for item in ours if item not in theirs and item not in base)
+        return merged
+    return ours
+
+
+def sync_in_place(target, source):
+    """Make the dict `target` equal to `source`, touching only differing keys"""
+    for key in [k for k in target if k not in source]:
+        del target[key]
+    for key, value in source.items():
+        if target.get(key, _MISSING) != value:
+            target[key] = value
+
+
+def _copy(data):
+    return json.loads(json.dumps(data))
+
+
+class SharedJsonFile:
+    """A JSON dict file shared by several processes.
+
+    Writes take an exclusive lock and replace the file atomically. If another
+    process wrote since our last load/save, its changes are merged with ours
+    (three-way, against the version we last saw) instead of being overwritten.
+    """
+
+    def __init__(self, path, indent=None):
+        self.path = path
+        self.indent = indent
+        self.base = {}
+        self.signature = None
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as file:
+            return json.load(file)
+
+    def changed(self):
+        """True if the file was rewritten since our last load/save"""
+        return file_signature(self.path) != self.signature
+
+    def load(self):
+        with FileLock(self.path):
+            data = self._read()
+            self.signature = file_signature(self.path)
+        self.base = _copy(data)
+        return data
+
+    def save(self, data):
+        """Save data (merging concurrent changes); returns the merged dict"""
+        with FileLock(self.path):
+            if file_signature(self.path) != self.signature:
+                data = three_way_merge(self.base, data, self._read())
+            atomic_write_json(self.path, data, indent=self.indent)
+            self.signature = file_signature(self.path)
+        self.base = _copy(data)
+        return data
+
+    def refresh(self, data):
+        """Merge another process's changes into data; returns (merged, changed)"""
+        if not self.changed():
+            return data, False
+        with FileLock(self.path):
+            disk = self._read()
+            self.signature = file_signature(self.path)
+        merged = three_way_merge(self.base, data, disk)
+        self.base = disk
+        return merged, True
@@ -0,0 +1,223 @@
+"""Replays simulated time through the reminder pipeline, much faster than real time.
+
+Patients get generated prescriptions and a seeded adherence model (most
+doses are taken a few minutes after the reminder, some late, some never).
+The real scheduler, reminder and missed-dose sweeper code runs against a
+SimulatedClock that jumps from one minute with events to the next, or
+moves in fixed ticks to mimic a polling loop. Results are reproducible for a given seed.
+
+Usage: python -m mediminder.simulation [patients] [days] [tick_seconds] [seed]
+"""
+import heapq
+import itertools
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from .adherence import dose_status
+from .clock import SimulatedClock
+from .medication_journal import apply_event
+from .prescriptions import PrescriptionRepository
+from .reminder_service import ReminderService
+from .reminders import MedicationReminders, dose_texts
+from .rolling import RollingBook
+from .streaks import verify_streaks
+from .sweeper import MissedDoseSweeper, PendingIndex
+
+START = datetime(2026, 1, 1)
+# Prescription rules handed out to simulated patients
+RULES = [
+    {'time': '08:00'},
+    {'time': '08:00, 20:00'},
+    {'time': '07:30, 13:00, 19:30'},
+    {'time': '06:00', 'every_hours': 8},
+    {'time': '09:00', 'weekdays': ['mon', 'wed', 'fri']},
+    {'time': '21:00', 'dosage': '20mg', 'taper': [{'from': '2026-04-01', 'dosage': '10mg'},
+                                                   {'from': '2026-07-01', 'dosage': '5mg'}]},
+]
+
+
+class MemoryJournal:
+    """MedicationJournal without files: same record() and pending index, kept in memory"""
+
+    def __init__(self):
+        self.pending = PendingIndex()
+        self.events = 0
+
+    def record(self, tracking, user, med_name, event, date, time=None, status=None):
+        if event == 'missed' and not self.pending.has(user, med_name, date):
+            return None
+        entry = {'user': user, 'med': med_name, 'event': event, 'date': date, 'time': time, 'status': status}
+        entry['streak'] = apply_event(tracking, entry, pending=self.pending)
+        self.events += 1
+        return entry
+
+
+def build_users(patients, seed=1, start=START):
+    """Patients with one to three generated prescriptions each"""
+    rng = random.Random(seed)
+    users = {}
+    for p in range(patients):
+        medications = []
+        for m in range(rng.randint(1, 3)):
+            medications.append(dict({'dosage': '10mg'}, name=f"med{m}",
+                                    start_date=start.strftime('%Y-%m-%d'), **rng.choice(RULES)))
+        users[f"patient{p}"] = {'type': 'patient', 'password': '', 'medications': medications}
+    return users
+
+
+class Simulation:
+    """Drives the reminder pipeline for a population of patients on a SimulatedClock.
+
+    take_rate is the share of doses taken at all; delays until a dose is
+    taken are exponential with mean_delay_minutes. With tick_seconds the
+    clock moves in fixed steps (dispatch lag is then up to one tick);
+    otherwise it jumps to the end of the minute holding the next reminder,
+    deadline or dose taken, and handles everything due in that minute as one
+    step (doses keep the time they were taken at).
+    """
+
+    def __init__(self, users, take_rate=0.9, mean_delay_minutes=8, tick_seconds=None,
+                 shards=1, seed=1, start=START):
+        self.users = users
+        self.clock = SimulatedClock(start)
+        self.rng = random.Random(seed)
+        self.take_rate = take_rate
+        self.mean_delay = mean_delay_minutes
+        self.tick = timedelta(seconds=tick_seconds) if tick_seconds else None
+        self.tracking = {}
+        self.journal = MemoryJournal()
+        self.prescriptions = PrescriptionRepository(lambda: users, lambda: self.tracking)
+        self.reminders = MedicationReminders(self.record, notify=self.notify)
+        self.service = ReminderService(self.prescriptions, self, shards, clock=self.clock)
+        self.sweeper = MissedDoseSweeper(self.journal, self.record, clock=self.clock)
+        self.rolling = RollingBook(lambda: self.tracking, clock=self.clock)
+        # Doses the patients will take: (when, seq, username, med_name, scheduled)
+        self.actions = []
+        self.counter = itertools.count()
+        self.stats = {'reminders': 0, 'notifications': 0, 'taken_on_time': 0, 'taken_late': 0}
+
+    def record(self, user, med_name, event, date, time_text, status):
+        entry = self.journal.record(self.tracking, user, med_name, event, date, time_text, status)
+        if entry is not None:
+            self.rolling.dose_event(user, med_name, event, entry['date'], entry['time'], entry['status'])
+        return entry
+
+    def notify(self, title, message, timeout=10, username=None, priority=None, group=None):
+        self.stats['notifications'] += 1
+
+    def dose_due(self, username, med, when):
+        """ReminderService handler: send the reminder and decide if and when the dose is taken"""
+        self.stats['reminders'] += 1
+        self.reminders.dose_due(username, med, when)
+        if self.rng.random() < self.take_rate:
+            delay = timedelta(minutes=self.rng.expovariate(1 / self.mean_delay))
+            heapq.heappush(self.actions, (when + delay, next(self.counter), username, med['name'], when))
+
+    def _take_due(self, now):
+        while self.actions and self.actions[0][0] <= now:
+            taken_at, _, username, med_name, scheduled = heapq.heappop(self.actions)
+            status = dose_status(dose_texts(scheduled)[1], taken_at)
+            self.stats['taken_on_time' if status == 'on_time' else 'taken_late'] += 1
+            # Doses taken in the same minute share their date and time texts
+            self.record(username, med_name, 'taken', *dose_texts(taken_at.replace(second=0, microsecond=0)), status)
+
+    def _next_event(self):
+        """(time of the next reminder, deadline or dose taken, or None; each scheduler's next due time)"""
+        dues = [scheduler.next_due() for scheduler in self.service.schedulers]
+        candidates = dues + [self.sweeper.next_deadline()]
+        if self.actions:
+            candidates.append(self.actions[0][0])
+        candidates = [when for when in candidates if when is not None]
+        return (min(candidates) if candidates else None), dues
+
+    @staticmethod
+    def _minute_end(when):
+        """when rounded up to a whole minute"""
+        minute = when.replace(second=0, microsecond=0)
+        return minute if minute == when else minute + timedelta(minutes=1)
+
+    def run(self, days):
+        """Simulate days of reminders; returns a report"""
+        end = self.clock.now() + timedelta(days=days)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        self.service.arm_all(self.users)
+        for username, data in self.users.items():
+            for med in data['medications']:
+                self.rolling.for_med(username, med['name'])
+        steps = 0
+        while True:
+            next_when, dues = self._next_event()
+            if next_when is None or next_when > end:
+                break
+            if self.tick is not None:
+                # Polling: step in whole ticks until the next event is reached
+                ticks = -((self.clock.now() - next_when) // self.tick)
+                next_when = self.clock.now() + max(ticks, 1) * self.tick
+            else:
+                # Reminders and deadlines fall on whole minutes; doses taken
+                # during the minute are handled with them in one step
+                next_when = self._minute_end(next_when)
+            now = self.clock.advance_to(next_when)
+            self._take_due(now)
+            # Only shards with a reminder due run; the sweeper only when a deadline passed
+            for scheduler, due in zip(self.service.schedulers, dues):
+                if due is not None and due <= now:
+                    scheduler.run_pending()
+            deadline = self.sweeper.next_deadline()
+            if deadline is not None and deadline <= now:
+                self.sweeper.sweep()
+            steps += 1
+        self.clock.advance_to(end)
+        return self.report(days, steps, time.process_time() - cpu_start, time.perf_counter() - wall_start)
+
+    def report(self, days, steps, cpu_seconds, wall_seconds):
+        service_stats = self.service.get_stats()
+        return {
+            'patients': len(self.users),
+            'prescriptions': sum(len(data['medications']) for data in self.users.values()),
+            'simulated_days': days,
+            'steps': steps,
+            'reminders_fired': service_stats['fired_due'],
+            'notifications': self.stats['notifications'],
+            'taken_on_time': self.stats['taken_on_time'],
+            'taken_late': self.stats['taken_late'],
+            'missed_detected': self.sweeper.stats['missed'],
+            'still_pending': len(self.journal.pending),
+            'journal_events': self.journal.events,
+            'streak_drift': len(verify_streaks(self.tracking)),
+            'rolling_drift': len(self.rolling.verify()),
+            'reminder_windows': len(self.reminders.windows),
+            'reminder_windows_peak': self.reminders.windows.stats['peak'],
+            'lag': service_stats['lag'],
+            'cpu_seconds': cpu_seconds,
+            'wall_seconds': wall_seconds,
+            'speedup': days * 86400 / wall_seconds if wall_seconds else 0.0,
+        }
+
+
+def main():
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    tick = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+    report = Simulation(build_users(patients, seed), tick_seconds=tick, seed=seed).run(days)
+    lag = report['lag']
+    print(f"{report['patients']} patients, {report['prescriptions']} prescriptions, "
+          f"{report['simulated_days']} simulated days in {report['steps']} steps")
+    print(f"reminders: {report['reminders_fired']} fired, {report['notifications']} notifications")
+    print(f"doses:     {report['taken_on_time']} on time, {report['taken_late']} late, "
+          f"{report['missed_detected']} missed, {report['still_pending']} still pending, "
+          f"{report['streak_drift']} streaks and {report['rolling_drift']} rolling windows differing from history")
+    print(f"windows:   {report['reminder_windows']} open at the end, peak {report['reminder_windows_peak']}")
+    print(f"lag:       mean {lag['mean']:.1f} s, p50 {lag['p50']:.1f} s, p95 {lag['p95']:.1f} s, "
+          f"p99 {lag['p99']:.1f} s, max {lag['max']:.1f} s (simulated)")
+    print(f"cost:      CPU {report['cpu_seconds']:.2f}s, wall {report['wall_seconds']:.2f}s, "
+          f"{report['speedup']:,.0f}x real time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,615 @@
+import json
+import os
+import sys
+import threading
+
+from .shared_files import FileLock, SharedJsonFile, atomic_write_json, file_signature, sync_in_place
+
+# Fields kept in the compact patient index so listings don't load full records
+PATIENT_SUMMARY_FIELDS = ('name', 'dob', 'contact')
+
+
+def patient_summary(patient):
+    return {field: patient.get(field, '') for field in PATIENT_SUMMARY_FIELDS}
+
+
+class JsonBackend:
+    """JSON file storage: one file per store, one shard file per patient.
+
+    Safe to share between processes: writes are locked and atomic, and
+    concurrent changes to users/medications/appointments are merged.
+    """
+
+    def __init__(self, data_dir='.'):
+        self.data_dir = data_dir
+        self.users_file = os.path.join(data_dir, 'users.json')
+        self.medications_file = os.path.join(data_dir, 'medications.json')
+        self.appointments_file = os.path.join(data_dir, 'appointments.json')
+        self.users_store = SharedJsonFile(self.users_file)
+        self.medications_store = SharedJsonFile(self.medications_file)
+        self.appointments_store = SharedJsonFile(self.appointments_file)
+        # Legacy single-file patient store, migrated into patients_dir on first load
+        self.patients_file = os.path.join(data_dir, 'patients.json')
+        self.patients_dir = os.path.join(data_dir, 'patients')
+        self.patient_index_file = os.path.join(self.patients_dir, 'index.json')
+        self.patient_index = None
+        self.index_signature = None
+        # Bumped whenever patient_index picks up changes from disk
+        self.index_version = 0
+        # Signature of each patient shard as last read or written by us
+        self.shard_signatures = {}
+
+    def _save_shared(self, store, data):
+        sync_in_place(data, store.save(data))
+
+    def _refresh_shared(self, store, data):
+        merged, changed = store.refresh(data)
+        if changed:
+            sync_in_place(data, merged)
+        return changed
+
+    def load_users(self):
+        return self.users_store.load()
+
+    def save_users(self, users, keys=None):
+        self._save_shared(self.users_store, users)
+
+    def refresh_users(self, users):
+        """Merge users changed by other processes into users; True if any"""
+        return self._refresh_shared(self.users_store, users)
+
+    def load_medications(self):
+        return self.medications_store.load()
+
+    def save_medications(self, medications, keys=None):
+        self._save_shared(self.medications_store, medications)
+
+    def refresh_medications(self, medications):
+        return self._refresh_shared(self.medications_store, medications)
+
+    def load_appointments(self):
+        return self.appointments_store.load()
+
+    def save_appointments(self, appointments, keys=None):
+        self._save_shared(self.appointments_store, appointments)
+
+    def refresh_appointments(self, appointments):
+        return self._refresh_shared(self.appointments_store, appointments)
+
+    def _shard_path(self, patient_id):
+        """Per-patient shard file, bucketed by the first two id characters"""
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in patient_id)
+        return os.path.join(self.patients_dir, safe_id[:2] or '_', safe_id + '.json')
+
+    def _patients_lock(self):
+        return FileLock(self.patients_dir)
+
+    def _read_legacy_patients(self):
+        try:
+            with open(self.patients_file, 'r') as file:
+                return json.load(file)
+        except json.JSONDecodeError:
+            print("Error reading patients file. Starting with no patients.")
+            return {}
+
+    def _migrate_legacy_patients(self):
+        """Split a legacy single-file patients.json into per-patient shards"""
+        patients = self._read_legacy_patients()
+        os.makedirs(self.patients_dir, exist_ok=True)
+        self._write_shards(patients, list(patients))
+        atomic_write_json(self.patient_index_file,
+                          {pid: patient_summary(patient) for pid, patient in patients.items()})
+        os.replace(self.patients_file, self.patients_file + '.migrated')
+
+    def _ensure_patients_dir(self):
+        if os.path.isdir(self.patients_dir):
+            return
+        with self._patients_lock():
+            if not os.path.isdir(self.patients_dir):
+                if os.path.exists(self.patients_file):
+                    self._migrate_legacy_patients()
+                else:
+                    os.makedirs(self.patients_dir, exist_ok=True)
+
+    def patient_ids(self):
+        """List patient ids from the shard directory without reading records"""
+        self._ensure_patients_dir()
+        if self.patient_index is not None:
+            return list(self.patient_index)
+        ids = []
+        for bucket in os.listdir(self.patients_dir):
+            bucket_dir = os.path.join(self.patients_dir, bucket)
+            if os.path.isdir(bucket_dir):
+                ids.extend(name[:-5] for name in os.listdir(bucket_dir) if name.endswith('.json'))
+        return ids
+
+    def _read_patient_index(self):
+        with open(self.patient_index_file, 'r') as file:
+            index = json.load(file)
+        self.index_signature = file_signature(self.patient_index_file)
+        return index
+
+    def load_patient_index(self):
+        """Load the compact id -> summary index, rebuilding it from shards if missing"""
+        if self.patient_index is not None:
+            self.refresh_patient_index()
+            return self.patient_index
+        self._ensure_patients_dir()
+        try:
+            self.patient_index = self._read_patient_index()
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {pid: patient_summary(patient) for pid, patient in self.load_patients().items()}
+            with self._patients_lock():
+                atomic_write_json(self.patient_index_file, index)
+                self.index_signature = file_signature(self.patient_index_file)
+            self.patient_index = index
+        return self.patient_index
+
+    def refresh_patient_index(self):
+        """Pick up patients added or renamed by other processes; True if any"""
+        if self.patient_index is None or file_signature(self.patient_index_file) == self.index_signature:
+            return False
+        try:
+            sync_in_place(self.patient_index, self._read_patient_index())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        self.index_version += 1
+        return True
+
+    def load_patients(self, patient_ids=None):
+        """Load patient shards, all of them or only the given ids"""
+        if patient_ids is None:
+            patient_ids = self.patient_ids()
+        patients = {}
+        for patient_id in patient_ids:
+            patient = self.load_patient(patient_id)
+            if patient is not None:
+                patients[patient_id] = patient
+        return patients
+
+    def load_patient(self, patient_id):
+        """Load a single patient shard, or None if it doesn't exist"""
+        path = self._shard_path(patient_id)
+        try:
+            signature = file_signature(path)
+            with open(path, 'r') as file:
+                patient = json.load(file)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            print(f"Error reading patient record {patient_id}.")
+            return None
+        self.shard_signatures[patient_id] = signature
+        return patient
+
+    def read_patients(self):
+        """Read every patient without resharding a legacy patients.json"""
+        if os.path.isdir(self.patients_dir):
+            return self.load_patients()
+        if os.path.exists(self.patients_file):
+            return self._read_legacy_patients()
+        return {}
+
+    def patient_changed(self, patient_id):
+        """True if another process rewrote this patient's shard since we read it"""
+        signature = self.shard_signatures.get(patient_id)
+        return signature is not None and file_signature(self._shard_path(patient_id)) != signature
+
+    def forget_patient(self, patient_id):
+        """Drop bookkeeping for a record evicted from memory"""
+        self.shard_signatures.pop(patient_id, None)
+
+    def _write_shards(self, patients, keys):
+        """Write or remove shards; returns the index entries that changed"""
+        index_updates = {}
+        for patient_id in keys:
+            path = self._shard_path(patient_id)
+            if patient_id not in patients:
+                # Patient was removed
+                if os.path.exists(path):
+                    os.remove(path)
+                self.shard_signatures.pop(patient_id, None)
+                index_updates[patient_id] = None
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write_json(path, patients[patient_id], indent=4)
+            self.shard_signatures[patient_id] = file_signature(path)
+            summary = patient_summary(patients[patient_id])
+            if self.patient_index is None or self.patient_index.get(patient_id) != summary:
+                index_updates[patient_id] = summary
+        return index_updates
+
+    def save_patients(self, patients, keys=None):
+        """Write the shards for the given patient ids (all patients if None)"""
+        self._ensure_patients_dir()
+        if keys is None:
+            keys = list(patients)
+            keys.extend(pid for pid in self.patient_ids() if pid not in patients)
+        with self._patients_lock():
+            index_updates = self._write_shards(patients, keys)
+            # The index is only rewritten when a summary field changes, and is
+            # re-read under the lock so entries added by other processes survive
+            if index_updates and self.patient_index is not None:
+                try:
+                    index = self._read_patient_index()
+                except (FileNotFoundError, json.JSONDecodeError):
+                    index = dict(self.patient_index)
+                for patient_id, summary in index_updates.items():
+                    if summary is None:
+                        index.pop(patient_id, None)
+                    else:
+                        index[patient_id] = summary
+                atomic_write_json(self.patient_index_file, index)
+                self.index_signature = file_signature(self.patient_index_file)
+                sync_in_place(self.patient_index, index)
+                self.index_version += 1
+
+
+class SqliteBackend:
+    """SQLite storage with one row per user, patient, medication and appointment.
+
+    Saves only touch rows whose content changed since the last load/save
+    (or only the given keys), so write cost follows the edit rather than
+    the size of the store.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            type TEXT,
+            patient_id TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_patient ON users (patient_id);
+
+        CREATE TABLE IF NOT EXISTS medications (
+            patient_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS patients (
+            patient_id TEXT PRIMARY KEY,
+            name TEXT,
+            data TEXT NOT NULL,
+            updated INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (name);
+
+        CREATE TABLE IF NOT EXISTS patient_medications (
+            patient_id TEXT NOT NULL,
+            med_name TEXT NOT NULL,
+            date TEXT,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_patient_medications_patient
+            ON patient_medications (patient_id);
+        CREATE INDEX IF NOT EXISTS idx_patient_medications_lookup
+            ON patient_medications (patient_id, med_name, date);
+
+        CREATE TABLE IF NOT EXISTS appointments (
+            id TEXT,
+            patient_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id);
+        CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (date);
+    """
+
+    def __init__(self, db_path='mediminder.db'):
+        # Imported here so the default JSON setup doesn't pay for sqlite3
+        import sqlite3
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(patients)")]
+        if 'updated' not in columns:
+            # Databases created before per-row change tracking
+            self.conn.execute("ALTER TABLE patients ADD COLUMN updated INTEGER NOT NULL DEFAULT 0")
+            self.conn.commit()
+        # Serialized form of every row as last written, per store
+        self._saved = {'users': {}, 'medications': {}, 'patients': {}, 'appointments': {}}
+        # PRAGMA data_version as last seen per store; it changes when another
+        # connection (process) commits
+        version = self._data_version()
+        self._seen_versions = {store: version for store in self._saved}
+        # patient_id -> (updated counter, data_version) of each record as last
+        # read or written by us
+        self._patient_versions = {}
+
+    def close(self):
+        self.conn.close()
+
+    def _data_version(self):
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self, store, data, load):
+        """Merge rows committed by other processes into data, keeping our unsaved edits"""
+        version = self._data_version()
+        if self._seen_versions[store] == version:
+            return False
+        self._seen_versions[store] = version
+        base = dict(self._saved[store])
+        disk = load()
+        merged = {}
+        for key in list(disk) + [k for k in data if k not in disk]:
+            ours = json.dumps(data[key], sort_keys=True) if key in data else None
+            if ours != base.get(key):
+                # Changed locally since the last save: keep our version
+                if key in data:
+                    merged[key] = data[key]
+            elif key in disk:
+                merged[key] = disk[key]
+        sync_in_place(data, merged)
+        return True
+
+    def refresh_users(self, users):
+        return self._refresh('users', users, self.load_users)
+
+    def refresh_medications(self, medications):
+        return self._refresh('medications', medications, self.load_medications)
+
+    def refresh_appointments(self, appointments):
+        return self._refresh('appointments', appointments, self.load_appointments)
+
+    def patient_changed(self, patient_id):
+        """True if another process rewrote this patient's row since we read it"""
+        known = self._patient_versions.get(patient_id)
+        if known is None:
+            return False
+        updated, version = known
+        current = self._data_version()
+        if current == version:
+            # Nobody else has committed anything since
+            return False
+        with self.lock:
+            row = self.conn.execute("SELECT updated FROM patients WHERE patient_id = ?",
+                                    (patient_id,)).fetchone()
+        if row is None or row[0] != updated:
+            return True
+        self._patient_versions[patient_id] = (updated, current)
+        return False
+
+    def forget_patient(self, patient_id):
+        """Drop bookkeeping for a record evicted from memory"""
+        self._patient_versions.pop(patient_id, None)
+
+    def _changed(self, store, data, keys):
+        """Return (changed, removed) keys of a store compared to the last save"""
+        saved = self._saved[store]
+        candidates = data.keys() if keys is None else [k for k in keys if k in data]
+        changed = {}
+        for key in candidates:
+            encoded = json.dumps(data[key], sort_keys=True)
+            if saved.get(key) != encoded:
+                changed[key] = encoded
+        if keys is None:
+            removed = [key for key in saved if key not in data]
+        else:
+            removed = [key for key in keys if key not in data and key in saved]
+        return changed, removed
+
+    def _commit(self, store, changed, removed):
+        saved = self._saved[store]
+        saved.update(changed)
+        for key in removed:
+            saved.pop(key, None)
+
+    # Users
+
+    def load_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT username, data FROM users").fetchall()
+        users = {username: json.loads(data) for username, data in rows}
+        self._saved['users'] = {username: json.dumps(user, sort_keys=True) for username, user in users.items()}
+        return users
+
+    def save_users(self, users, keys=None):
+        changed, removed = self._changed('users', users, keys)
+        if not changed and not removed:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO users (username, type, patient_id, data) VALUES (?, ?, ?, ?)",
+                [(username, users[username].get('type'), users[username].get('patient_id'), data)
+                 for username, data in changed.items()])
+            self.conn.executemany("DELETE FROM users WHERE username = ?", [(k,) for k in removed])
+        self._commit('users', changed, removed)
+
+    # Medications
+
+    def load_medications(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT patient_id, data FROM medications").fetchall()
+        medications = {patient_id: json.loads(data) for patient_id, data in rows}
+        self._saved['medications'] = {k: json.dumps(v, sort_keys=True) for k, v in medications.items()}
+        return medications
+
+    def save_medications(self, medications, keys=None):
+        changed, removed = self._changed('medications', medications, keys)
+        if not changed and not removed:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO medications (patient_id, data) VALUES (?, ?)",
+                list(changed.items()))
+            self.conn.executemany("DELETE FROM medications WHERE patient_id = ?", [(k,) for k in removed])
+        self._commit('medications', changed, removed)
+
+    # Appointments
+
+    def load_appointments(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT patient_id, date, data FROM appointments ORDER BY patient_id, date, position").fetchall()
+        appointments = {}
+        for patient_id, date, data in rows:
+            appointments.setdefault(patient_id, {}).setdefault(date, []).append(json.loads(data))
+        self._saved['appointments'] = {k: json.dumps(v, sort_keys=True) for k, v in appointments.items()}
+        return appointments
+
+    def load_patient_appointments(self, patient_id, date=None):
+        """Load one patient's appointments, optionally for a single date"""
+        query = "SELECT date, data FROM appointments WHERE patient_id = ?"
+        params = [patient_id]
+        if date:
+            query += " AND date = ?"
+            params.append(date)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY date, position", params).fetchall()
+        result = {}
+        for apt_date, data in rows:
+            result.setdefault(apt_date, []).append(json.loads(data))
+        return result.get(date, []) if date else result
+
+    def save_appointments(self, appointments, keys=None):
+        changed, removed = self._changed('appointments', appointments, keys)
+        if not changed and not removed:
+            return
+        rows = []
+        for patient_id in changed:
+            for date, day_appointments in appointments[patient_id].items():
+                for position, apt in enumerate(day_appointments):
+                    rows.append((apt.get('id'), patient_id, date, apt.get('time'), position, json.dumps(apt)))
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM appointments WHERE patient_id = ?",
+                                  [(k,) for k in list(changed) + removed])
+            self.conn.executemany(
+                "INSERT INTO appointments (id, patient_id, date, time, position, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+        self._commit('appointments', changed, removed)
+
+    # Patients
+
+    def _patient_from_rows(self, data, med_rows):
+        patient = json.loads(data)
+        patient['medications'] = [json.loads(med) for med in med_rows]
+        return patient
+
+    def load_patients(self):
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN")
+            rows = self.conn.execute("SELECT patient_id, data, updated FROM patients").fetchall()
+            med_rows = self.conn.execute(
+                "SELECT patient_id, data FROM patient_medications ORDER BY patient_id, position").fetchall()
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        medications = {}
+        for patient_id, data in med_rows:
+            medications.setdefault(patient_id, []).append(data)
+        patients = {patient_id: self._patient_from_rows(data, medications.get(patient_id, []))
+                    for patient_id, data, _ in rows}
+        self._patient_versions = {patient_id: (updated, version) for patient_id, _, updated in rows}
+        self._saved['patients'] = {k: json.dumps(v, sort_keys=True) for k, v in patients.items()}
+        return patients
+
+    def load_patient_index(self):
+        """Load the compact id -> summary index without reading full records"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT patient_id, name, json_extract(data, '$.dob'), json_extract(data, '$.contact') "
+                "FROM patients").fetchall()
+        return {patient_id: {'name': name or '', 'dob': dob or '', 'contact': contact or ''}
+                for patient_id, name, dob, contact in rows}
+
+    def load_patient(self, patient_id):
+        """Load a single patient record, or None if it doesn't exist"""
+        # One read transaction so the row, its medications and the
+        # data_version we remember all belong to the same commit
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN")
+            row = self.conn.execute("SELECT data, updated FROM patients WHERE patient_id = ?",
+                                    (patient_id,)).fetchone()
+            med_rows = self.conn.execute(
+                "SELECT data FROM patient_medications WHERE patient_id = ? ORDER BY position",
+                (patient_id,)).fetchall()
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if row is None:
+            self._patient_versions.pop(patient_id, None)
+            return None
+        self._patient_versions[patient_id] = (row[1], version)
+        return self._patient_from_rows(row[0], [data for (data,) in med_rows])
+
+    def save_patients(self, patients, keys=None):
+        changed, removed = self._changed('patients', patients, keys)
+        if not changed and not removed:
+            return
+        patient_rows = []
+        med_rows = []
+        for patient_id in changed:
+            record = dict(patients[patient_id])
+            for position, med in enumerate(record.pop('medications', [])):
+                med_rows.append((patient_id, med.get('medication_name'),
+                                 med.get('start_date') or med.get('date_prescribed'),
+                                 position, json.dumps(med)))
+            patient_rows.append((patient_id, record.get('name'), json.dumps(record), patient_id))
+        stale = [(k,) for k in list(changed) + removed]
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM patient_medications WHERE patient_id = ?", stale)
+            self.conn.executemany("DELETE FROM patients WHERE patient_id = ?", [(k,) for k in removed])
+            # Each write bumps the row's counter so other processes see it changed
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO patients (patient_id, name, data, updated) VALUES (?, ?, ?, "
+                "COALESCE((SELECT updated FROM patients WHERE patient_id = ?), 0) + 1)", patient_rows)
+            self.conn.executemany(
+                "INSERT INTO patient_medications (patient_id, med_name, date, position, data) "
+                "VALUES (?, ?, ?, ?, ?)", med_rows)
+            updated = {}
+            for patient_id in changed:
+                updated[patient_id] = self.conn.execute(
+                    "SELECT updated FROM patients WHERE patient_id = ?", (patient_id,)).fetchone()[0]
+            # Our own commits don't move data_version, so this stays valid after it
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        for patient_id, counter in updated.items():
+            self._patient_versions[patient_id] = (counter, version)
+        for patient_id in removed:
+            self._patient_versions.pop(patient_id, None)
+        self._commit('patients', changed, removed)
+
+
+def get_backend():
+    """Return the storage backend selected by MEDIMINDER_STORAGE (json or sqlite)"""
+    kind = os.environ.get('MEDIMINDER_STORAGE', 'json').lower()
+    if kind == 'sqlite':
+        return SqliteBackend(os.environ.get('MEDIMINDER_DB', 'mediminder.db'))
+    return JsonBackend(os.environ.get('MEDIMINDER_DATA_DIR', '.'))
+
+
+def migrate_json_to_sqlite(data_dir='.', db_path='mediminder.db'):
+    """Copy every JSON store into a SQLite database, returning row counts"""
+    source = JsonBackend(data_dir)
+    target = SqliteBackend(db_path)
+    try:
+        users = source.load_users()
+        medications = source.load_medications()
+        appointments = source.load_appointments()
+        # Read-only: a legacy patients.json is read as-is rather than resharded
+        patients = source.read_patients()
+
+        target.save_users(users)
+        target.save_medications(medications)
+        target.save_appointments(appointments)
+        target.save_patients(patients)
+    finally:
+        target.close()
+
+    return {
+        'users': len(users),
+        'medications': len(medications),
+        'appointments': sum(len(apts) for days in appointments.values() for apts in days.values()),
+        'patients': len(patients)
+    }
+
+
+if __name__ == '__main__':
+    # Usage: python -m mediminder.storage [data_dir] [db_path]
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else '.'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'mediminder.db'
+    counts = migrate_json_to_sqlite(data_dir, db_path)
+    print(f"Migrated {counts} from {data_dir} into {db_path}")
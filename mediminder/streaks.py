@@ -0,0 +1,100 @@
+"""Medication streaks: consecutive doses taken on time.
+
+A streak is derived state. The journal keeps it up to date with
+next_streak() as each dose event is applied, and it can always be
+recomputed from dose history: it is the number of on-time doses since the
+latest missed one (late and pending doses leave it unchanged).
+
+Usage: python -m mediminder.streaks [--fix]
+  Reports streaks that drifted from their history; --fix rebuilds them.
+"""
+import sys
+
+from .dose_history import STATUS_CODES, DoseHistory
+
+ON_TIME = STATUS_CODES['on_time']
+MISSED = STATUS_CODES['missed']
+
+
+def next_streak(streak, event, status):
+    """Streak after an event: reset by a missed dose, extended by one taken on time"""
+    if event == 'missed':
+        return 0
+    if status == 'on_time':
+        return streak + 1
+    return streak
+
+
+def _newest_segments(history):
+    """Monthly segments of a history, newest first (sealed months read on demand)"""
+    if isinstance(history, DoseHistory):
+        yield history
+    elif hasattr(history, 'months'):
+        for month in reversed(history.months()):
+            segment = history.segment(month)
+            if segment is not None:
+                yield segment
+    else:
+        yield DoseHistory(history)
+
+
+def recompute_streak(history):
+    """Streak implied by a dose history.
+
+    Walks the status columns backwards, newest month first, and stops at
+    the latest missed dose, so sealed months are only read while no dose
+    has been missed since.
+    """
+    streak = 0
+    for segment in _newest_segments(history):
+        statuses = segment.statuses.tobytes()
+        last_missed = statuses.rfind(MISSED)
+        streak += statuses.count(ON_TIME, last_missed + 1)
+        if last_missed >= 0:
+            break
+    return streak
+
+
+def _medications(tracking):
+    for user, user_tracking in tracking.items():
+        if not isinstance(user_tracking, dict):
+            continue  # reserved snapshot keys
+        for med_name, med_tracking in user_tracking.items():
+            yield user, med_name, med_tracking
+
+
+def verify_streaks(tracking):
+    """Every stored streak that differs from its history: [(user, med, stored, recomputed)]"""
+    drift = []
+    for user, med_name, med_tracking in _medications(tracking):
+        recomputed = recompute_streak(med_tracking.get('history', []))
+        if med_tracking.get('streak', 0) != recomputed:
+            drift.append((user, med_name, med_tracking.get('streak', 0), recomputed))
+    return drift
+
+
+def rebuild_streaks(tracking):
+    """Recompute every streak from history in one pass; returns the drift that was fixed"""
+    drift = verify_streaks(tracking)
+    for user, med_name, _, recomputed in drift:
+        tracking[user][med_name]['streak'] = recomputed
+    return drift
+
+
+def main():
+    from .medication_journal import MedicationJournal
+
+    fix = '--fix' in sys.argv[1:]
+    journal = MedicationJournal()
+    tracking = journal.load()
+    drift = rebuild_streaks(tracking) if fix else verify_streaks(tracking)
+    checked = sum(1 for _ in _medications(tracking))
+    for user, med_name, stored, recomputed in drift:
+        print(f"{user} / {med_name}: stored {stored}, history gives {recomputed}")
+    print(f"{len(drift)} of {checked} streaks drifted" + (" (rebuilt)" if fix and drift else ""))
+    if fix and drift:
+        journal.compact(tracking)
+
+
+if __name__ == '__main__':
+    main()
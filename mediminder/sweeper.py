@@ -0,0 +1,197 @@
+import heapq
+from datetime import datetime, timedelta
+
+from .agenda import AgendaBook
+from .clock import system_clock
+
+# Minutes after the scheduled time at which an untaken dose counts as missed
+MISSED_AFTER = timedelta(minutes=20)
+# Furthest back catch_up() looks for doses that were never reminded
+MAX_CATCH_UP = timedelta(days=31)
+
+
+def dose_deadline(date_text, time_text, grace=MISSED_AFTER):
+    """When a pending dose scheduled at date/time becomes missed"""
+    scheduled = datetime.fromisoformat(f"{date_text}T{time_text or '23:59'}")
+    return scheduled + grace
+
+
+class PendingIndex:
+    """Open (pending) doses, by (user, med, date) and by deadline.
+
+    Maintained by the medication journal as events are applied, and stored
+    in its snapshot, so finding expired doses never scans dose history.
+    Resolved doses are left in the heap and skipped when popped.
+    """
+
+    def __init__(self, grace=MISSED_AFTER):
+        self.grace = grace
+        # (user, med, date) -> scheduled times of the doses still pending
+        self.open = {}
+        self.heap = []
+
+    def __len__(self):
+        return sum(len(times) for times in self.open.values())
+
+    def add(self, user, med_name, date_text, time_text):
+        """Open a pending dose; False if that dose is already open"""
+        times = self.open.setdefault((user, med_name, date_text), [])
+        if time_text in times:
+            return False
+        times.append(time_text)
+        heapq.heappush(self.heap, (dose_deadline(date_text, time_text, self.grace),
+                                   user, med_name, date_text, time_text or ''))
+        return True
+
+    def has(self, user, med_name, date_text):
+        return (user, med_name, date_text) in self.open
+
+    def resolve(self, user, med_name, date_text, time_text=None):
+        """Close a pending dose (the latest that day unless time is given); True if one was open"""
+        key = (user, med_name, date_text)
+        times = self.open.get(key)
+        if not times:
+            return False
+        if time_text is None:
+            times.pop()
+        elif time_text in times:
+            times.remove(time_text)
+        else:
+            return False
+        if not times:
+            del self.open[key]
+        return True
+
+    def is_open(self, user, med_name, date_text, time_text):
+        return (time_text or None) in self.open.get((user, med_name, date_text), [])
+
+    def _drop_resolved(self):
+        while self.heap and not self.is_open(*self.heap[0][1:]):
+            heapq.heappop(self.heap)
+
+    def next_deadline(self):
+        self._drop_resolved()
+        return self.heap[0][0] if self.heap else None
+
+    def expired(self, now):
+        """Pop every open dose whose deadline is at or before now, oldest first"""
+        doses = []
+        # A dose re-opened after being resolved can sit in the heap twice
+        seen = set()
+        self._drop_resolved()
+        while self.heap and self.heap[0][0] <= now:
+            _, user, med_name, date_text, time_text = heapq.heappop(self.heap)
+            dose = (user, med_name, date_text, time_text or None)
+            if dose not in seen:
+                seen.add(dose)
+                doses.append(dose)
+            self._drop_resolved()
+        return doses
+
+    def to_list(self):
+        return [[user, med_name, date_text, time_text]
+                for (user, med_name, date_text), times in self.open.items() for time_text in times]
+
+    @classmethod
+    def from_list(cls, rows, grace=MISSED_AFTER):
+        index = cls(grace)
+        for user, med_name, date_text, time_text in rows:
+            index.open.setdefault((user, med_name, date_text), []).append(time_text)
+            index.heap.append((dose_deadline(date_text, time_text, grace),
+                               user, med_name, date_text, time_text or ''))
+        heapq.heapify(index.heap)
+        return index
+
+    @classmethod
+    def from_tracking(cls, tracking, grace=MISSED_AFTER):
+        """Build the index by scanning in-memory history (for snapshots without one)"""
+        rows = []
+        for user, user_tracking in tracking.items():
+            for med_name, med_tracking in user_tracking.items():
+                for entry in med_tracking['history']:
+                    if entry['status'] == 'pending':
+                        rows.append([user, med_name, entry['date'], entry['time']])
+        return cls.from_list(rows, grace)
+
+
+class MissedDoseSweeper:
+    """Marks pending doses as missed once their deadline has passed.
+
+    sweep() retires every expired dose in one pass, in deadline order, so
+    running it at startup catches up on doses that expired while the app
+    was closed, at a cost proportional to the number of expired doses.
+    catch_up() finds doses that were never reminded at all (no process was
+    running), from the compiled schedules. With record_many, each sweep
+    journals its misses in one batch.
+    """
+
+    def __init__(self, journal, record, clock=None, record_many=None):
+        self.journal = journal
+        # record(user, med_name, event, date, time, status) -> journal the event
+        self.record = record
+        # record_many([(user, med_name, event, date, time, status), ...]) -> entries
+        self.record_many = record_many
+        self.clock = clock or system_clock
+        self.now = self.clock.now
+        self.stats = {'sweeps': 0, 'missed': 0, 'caught_up': 0}
+
+    def next_deadline(self):
+        return self.journal.pending.next_deadline()
+
+    def _record_missed(self, events):
+        """Journal missed events, in one batch if possible; returns how many were recorded"""
+        if self.record_many is not None:
+            try:
+                return sum(entry is not None for entry in self.record_many(events))
+            except Exception as e:
+                print(f"Error marking {len(events)} doses missed: {str(e)}")
+                return 0
+        recorded = 0
+        for event in events:
+            try:
+                recorded += self.record(*event) is not None
+            except Exception as e:
+                print(f"Error marking {event[1]} missed for {event[0]}: {str(e)}")
+        return recorded
+
+    def sweep(self, now=None):
+        """Record every expired pending dose as missed; returns how many"""
+        doses = self.journal.pending.expired(now or self.now())
+        if doses:
+            self._record_missed([(user, med_name, 'missed', date_text, time_text, None)
+                                 for user, med_name, date_text, time_text in doses])
+        self.stats['sweeps'] += 1
+        self.stats['missed'] += len(doses)
+        return len(doses)
+
+    def catch_up(self, prescriptions, get_tracking, usernames=None, now=None):
+        """Record doses that came due since the last catch-up and were never reminded or taken.
+
+        Walks the schedule of each patient in usernames (every patient if
+        None; pass only those this process reminds) from their swept_until
+        mark (at most MAX_CATCH_UP back) to the current missed-dose cutoff;
+        doses with nothing recorded are journalled as missed (status
+        'missed'). A patient's first run only sets the mark. Returns how many.
+        """
+        cutoff = (now or self.now()) - self.journal.pending.grace
+        if usernames is None:
+            usernames = [username for username, data in prescriptions.get_users().items()
+                         if data.get('type') == 'patient']
+        book = AgendaBook(prescriptions, get_tracking)
+        events = []
+        for username in usernames:
+            since = self.journal.swept_until.get(username)
+            if since is not None and since < cutoff:
+                since = max(since, cutoff - MAX_CATCH_UP)
+                day = since.date()
+                while day <= cutoff.date():
+                    agenda = book.build(username, day)
+                    for slot in agenda.slots:
+                        if slot.status is None and since < slot.when <= cutoff:
+                            events.append((username, slot.med_name, 'missed', agenda.date_text,
+                                           slot.time_text, 'missed'))
+                    day += timedelta(days=1)
+            self.journal.swept_until[username] = max(cutoff, since or cutoff)
+        recorded = self._record_missed(events) if events else 0
+        self.stats['caught_up'] += recorded
+        return recorded
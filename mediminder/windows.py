@@ -0,0 +1,50 @@
+import heapq
+from datetime import timedelta
+
+from .sweeper import MISSED_AFTER
+
+
+class ReminderWindows:
+    """One reminder window per scheduled dose, forgotten once it expires.
+
+    Windows are keyed by (user, med, scheduled time), so every dose
+    occurrence opens its own window and a dose fired twice (e.g. when a
+    user is re-armed within the scheduler's grace period, or after it was
+    already taken) is recognised as a repeat. Expired windows are evicted
+    from a heap ordered by expiry, so the store only holds doses of the
+    last `ttl` and its size stays flat however long the process runs.
+    """
+
+    def __init__(self, ttl=MISSED_AFTER + timedelta(minutes=5)):
+        self.ttl = ttl
+        # (user, med_name, scheduled datetime) -> expiry
+        self.windows = {}
+        self.heap = []
+        self.stats = {'opened': 0, 'repeats': 0, 'evicted': 0, 'peak': 0}
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __contains__(self, key):
+        return key in self.windows
+
+    def open(self, user, med_name, when):
+        """Open the window of the dose scheduled at when; False if it is already open"""
+        self.evict(when)
+        key = (user, med_name, when)
+        if key in self.windows:
+            self.stats['repeats'] += 1
+            return False
+        expires = when + self.ttl
+        self.windows[key] = expires
+        heapq.heappush(self.heap, (expires, key))
+        self.stats['opened'] += 1
+        self.stats['peak'] = max(self.stats['peak'], len(self.windows))
+        return True
+
+    def evict(self, now):
+        """Forget every window that expired at or before now"""
+        while self.heap and self.heap[0][0] <= now:
+            _, key = heapq.heappop(self.heap)
+            del self.windows[key]
+            self.stats['evicted'] += 1
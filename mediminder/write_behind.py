@@ -0,0 +1,97 @@
+import threading
+from contextlib import contextmanager
+
+
+def _timer_schedule(delay, callback):
+    """Default scheduler: run callback on a daemon timer thread"""
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+
+
+class WriteBehind:
+    """Coalescing write-behind layer for the save_* functions.
+
+    Saving a store only marks it dirty. Each dirty store is written at most
+    once per interval, when the outermost batch completes, or on flush().
+    """
+
+    def __init__(self, interval=2.0, schedule=None):
+        self.interval = interval
+        # schedule(delay_seconds, callback); the GUI swaps in root.after
+        self.schedule = schedule or _timer_schedule
+        self.stores = {}
+        self.dirty = set()
+        self.lock = threading.RLock()
+        self.flush_scheduled = False
+        self.batch_depth = 0
+        self.stats = {'requested': 0, 'written': 0, 'coalesced': 0, 'failed': 0}
+
+    def register(self, name, save_function):
+        """Register a store; save_function returns False on failure"""
+        self.stores[name] = save_function
+
+    def mark_dirty(self, name):
+        """Request a save of the named store"""
+        with self.lock:
+            self.stats['requested'] += 1
+            if name in self.dirty:
+                self.stats['coalesced'] += 1
+            else:
+                self.dirty.add(name)
+            if self.batch_depth == 0 and not self.flush_scheduled:
+                self.flush_scheduled = True
+                self.schedule(self.interval, self._scheduled_flush)
+
+    @contextmanager
+    def batch(self):
+        """Group several saves; dirty stores are flushed when the batch ends"""
+        with self.lock:
+            self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.batch_depth -= 1
+                done = self.batch_depth == 0
+            if done:
+                self.flush()
+
+    def _scheduled_flush(self):
+        with self.lock:
+            self.flush_scheduled = False
+        self.flush()
+
+    def flush(self, name=None):
+        """Write dirty stores now; returns True if every write succeeded"""
+        with self.lock:
+            names = [name] if name is not None else sorted(self.dirty)
+            success = True
+            for store in names:
+                if store not in self.dirty:
+                    continue
+                self.dirty.discard(store)
+                try:
+                    result = self.stores[store]()
+                except Exception as e:
+                    print(f"Error flushing {store}: {e}")
+                    result = False
+                if result is False:
+                    # Keep the store dirty so the next flush retries it
+                    self.dirty.add(store)
+                    self.stats['failed'] += 1
+                    success = False
+                else:
+                    self.stats['written'] += 1
+            if not success and not self.flush_scheduled:
+                # Retry failed stores on the next interval
+                self.flush_scheduled = True
+                self.schedule(self.interval, self._scheduled_flush)
+            return success
+
+    def get_stats(self):
+        """Return a copy of the coalescing counters"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['dirty'] = len(self.dirty)
+            return stats